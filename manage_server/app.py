@@ -1,37 +1,79 @@
+import click
 from flask import Flask
-from flask_migrate import Migrate  # 导入 Migrate
 from flask_cors import CORS  # 导入 CORS
 from config import Config
-from models import User, Project, Task, ArchivedProject, Process  # 导入所有模型
-from extensions import db, mail  # 导入 db 实例
+from models import User, Project, Task, ProjectArchive, Process  # 导入所有模型
+from extensions import db, mail, mail_worker  # 导入 db 实例
+from serializers import init_json_provider
+from archive import archive_worker
+import metrics
+import query_guard
+import routing
+import search
+import events  # noqa: F401 注册提交后发布变更事件的事件
+import cache  # noqa: F401 注册写入时递增版本号的事件
 
 
-migrate = Migrate()
+def init_migrate(app):
+    """
+    注册 flask db 迁移命令；flask_migrate 会导入 alembic，拖慢启动，
+    只在通过 flask 命令行创建应用时加载，gunicorn 和 serve.py 启动的服务进程不加载
+    """
+    if click.get_current_context(silent=True) is None:
+        return
+    from flask_migrate import Migrate
 
+    Migrate(app, db)
 
-def create_app():
+
+def create_app(test_config=None):
     app = Flask(__name__)
     app.config.from_object(Config)
+    if test_config is not None:
+        # 测试时覆盖配置，如 TESTING 和临时数据库地址
+        app.config.from_mapping(test_config)
+    init_json_provider(app)  # 安装了 orjson 时使用更快的 JSON 编码
 
     # 启用 CORS
     CORS(app)
 
+    # 连接池参数，主库和只读副本相同；gevent 模式下协程数量远多于线程，单独限定大小
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = routing.engine_options(app.config)
+    app.config["SQLALCHEMY_BINDS"] = {
+        **routing.replica_binds(app.config["DB_REPLICA_URIS"]),
+        **app.config.get("SQLALCHEMY_BINDS", {}),
+    }
+    routing.init_app(app)
+
     # 初始化数据库和迁移
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_migrate(app)
     mail.init_app(app)
+    mail_worker.init_app(app)
+    archive_worker.init_app(app)
+    search.init_app(app)  # 注册全文索引的增量更新事件和重建命令
+    metrics.init_app(app)  # 记录每个请求的 SQL、哈希和序列化耗时
+    query_guard.init_app(app)  # 调试和测试模式下检查 N+1、慢查询和查询预算
 
     # 导入视图
     from views.login_views import login_bp
     from views.user_views import user_bp  # 导入用户视图
     from views.project_views import project_bp  # 导入项目视图
     from views.task_views import task_bp  # 导入任务视图
+    from views.dashboard_views import dashboard_bp  # 导入首页统计视图
+    from views.search_views import search_bp  # 导入搜索视图
+    from views.event_views import event_bp  # 导入变更事件视图
+    from views.metrics_views import metrics_bp  # 导入监控指标视图
 
     # 注册蓝图
     app.register_blueprint(login_bp)
     app.register_blueprint(user_bp)
     app.register_blueprint(project_bp)
     app.register_blueprint(task_bp)
+    app.register_blueprint(dashboard_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(event_bp)
+    app.register_blueprint(metrics_bp)
 
     return app
 
@@ -0,0 +1,282 @@
+# 归档层：已归档项目的任务和评论分批移出热表，放入 task_archive、comment_archive，
+# 全部移完后删除热表中的项目，列表查询不再扫描这些数据；也支持整体移回
+
+import threading
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+from models import (
+    Comment,
+    CommentArchive,
+    Process,
+    Project,
+    ProjectArchive,
+    ProjectStatus,
+    Task,
+    TaskArchive,
+)
+
+TASK_COLUMNS = [
+    "id",
+    "title",
+    "description",
+    "due_date",
+    "assignee_id",
+    "project_id",
+    "status",
+    "attachmentUrl",
+    "comment_count",
+]
+COMMENT_COLUMNS = ["id", "task_id", "author_name", "content", "created_at"]
+
+
+def _copy(source, target, columns, where):
+    # INSERT INTO target (...) SELECT ... FROM source WHERE ...，数据不经过 Python
+    db.session.execute(
+        insert(target).from_select(
+            columns, select(*[getattr(source, name) for name in columns]).where(where)
+        )
+    )
+
+
+def _delete(model, where):
+    db.session.execute(
+        delete(model).where(where).execution_options(synchronize_session=False)
+    )
+
+
+def archive_project(project):
+    """
+    项目状态改为已归档时调用，在当前事务中写入归档层的项目记录
+    任务和评论由后台分批移动
+    """
+    if db.session.get(ProjectArchive, project.id) is not None:
+        return
+    completion_rate = (
+        db.session.query(Process.completion_rate)
+        .filter(Process.project_id == project.id)
+        .scalar()
+    )
+    db.session.add(
+        ProjectArchive(
+            id=project.id,
+            name=project.name,
+            description=project.description,
+            start_date=project.start_date,
+            end_date=project.end_date,
+            priority=project.priority,
+            manager_id=project.manager_id,
+            completion_rate=completion_rate or 0.0,
+        )
+    )
+
+
+def _lock_if_archived(project_id):
+    """
+    锁住项目及其归档层记录，项目仍是已归档状态时返回 True
+    移动和恢复都先取得这把锁，检查状态和随后的移动、删除在同一事务中，
+    恢复提交后移动线程不会再把任务移走，也不会删掉刚恢复的项目
+    """
+    return (
+        db.session.execute(
+            select(Project.id)
+            .join(ProjectArchive, ProjectArchive.id == Project.id)
+            .where(Project.id == project_id, Project.status == ProjectStatus.ARCHIVED)
+            .with_for_update()
+        ).first()
+        is not None
+    )
+
+
+def _lock_archive_record(project_id):
+    # 锁住归档层的项目记录，已被其它请求恢复完成时返回 None
+    return db.session.execute(
+        select(ProjectArchive)
+        .where(ProjectArchive.id == project_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+
+
+def _move_batch(project_id, batch_size):
+    """把一批任务及其评论移入归档层，返回本批任务数"""
+    task_ids = db.session.scalars(
+        select(Task.id)
+        .where(Task.project_id == project_id)
+        .order_by(Task.id)
+        .limit(batch_size)
+    ).all()
+    if not task_ids:
+        return 0
+    comments = Comment.task_id.in_(task_ids)
+    _copy(Task, TaskArchive, TASK_COLUMNS, Task.id.in_(task_ids))
+    _copy(Comment, CommentArchive, COMMENT_COLUMNS, comments)
+    _delete(Comment, comments)
+    _delete(Task, Task.id.in_(task_ids))
+    return len(task_ids)
+
+
+def move_project(project_id, batch_size):
+    """
+    分批移动一个项目，每批单独提交，事务都很短
+    任务移完后在同一事务中删除热表中的进度和项目，返回移动的任务数
+    """
+    moved = 0
+    while _lock_if_archived(project_id):
+        count = _move_batch(project_id, batch_size)
+        if not count:
+            _delete(Process, Process.project_id == project_id)
+            _delete(Project, Project.id == project_id)
+        db.session.commit()
+        moved += count
+        if not count:
+            break
+    # 项目已被恢复时释放检查状态时加的锁
+    db.session.rollback()
+    return moved
+
+
+def move_pending(batch_size):
+    """移动所有已归档但仍在热表中的项目，返回移动的任务数"""
+    project_ids = db.session.scalars(
+        select(Project.id)
+        .join(ProjectArchive, ProjectArchive.id == Project.id)
+        .where(Project.status == ProjectStatus.ARCHIVED)
+    ).all()
+    moved = 0
+    for project_id in project_ids:
+        try:
+            moved += move_project(project_id, batch_size)
+        except SQLAlchemyError:
+            db.session.rollback()
+            current_app.logger.exception("移动归档项目失败: %s", project_id)
+    return moved
+
+
+def restore_project(archived, batch_size):
+    """
+    把归档层的项目、任务和评论移回热表，每批单独提交
+    项目仍是已归档状态时改回进行中；中途失败后再次调用会从剩余部分继续
+    每批先锁住归档层的项目记录，与后台移动互斥；移回期间项目又被归档时停止，剩余部分留在归档层
+    """
+    project_id = archived.id
+    archived = _lock_archive_record(project_id)
+    if archived is None:
+        db.session.rollback()
+        return
+    project = db.session.execute(
+        select(Project)
+        .where(Project.id == project_id)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    ).scalar_one_or_none()
+    if project is None:
+        db.session.add(
+            Project(
+                id=project_id,
+                name=archived.name,
+                description=archived.description,
+                start_date=archived.start_date,
+                end_date=archived.end_date,
+                status=ProjectStatus.IN_PROGRESS,
+                priority=archived.priority,
+                manager_id=archived.manager_id,
+            )
+        )
+        db.session.flush()
+        db.session.add(
+            Process(project_id=project_id, completion_rate=archived.completion_rate)
+        )
+    elif project.status in (ProjectStatus.ARCHIVED, ProjectStatus.ARCHIVED.name):
+        project.status = ProjectStatus.IN_PROGRESS
+    db.session.commit()
+
+    while True:
+        if _lock_archive_record(project_id) is None or _lock_if_archived(project_id):
+            db.session.rollback()
+            return
+        task_ids = db.session.scalars(
+            select(TaskArchive.id)
+            .where(TaskArchive.project_id == project_id)
+            .order_by(TaskArchive.id)
+            .limit(batch_size)
+        ).all()
+        if not task_ids:
+            break
+        comments = CommentArchive.task_id.in_(task_ids)
+        _copy(TaskArchive, Task, TASK_COLUMNS, TaskArchive.id.in_(task_ids))
+        _copy(CommentArchive, Comment, COMMENT_COLUMNS, comments)
+        _delete(CommentArchive, comments)
+        _delete(TaskArchive, TaskArchive.id.in_(task_ids))
+        db.session.commit()
+
+    # 与最后一次检查在同一事务中删除
+    _delete(ProjectArchive, ProjectArchive.id == project_id)
+    db.session.commit()
+
+
+class ArchiveWorker:
+    """
+    后台归档线程：服务进程处理第一个请求时启动，先继续移动重启前没有移完的项目，
+    之后在项目归档时被唤醒，另外每隔 ARCHIVE_INTERVAL 秒检查一次遗漏的项目
+    多进程部署或需要定时执行时，也可以运行 flask archive-projects
+    """
+
+    def __init__(self):
+        self.app = None
+        self.thread = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+
+    def init_app(self, app):
+        self.app = app
+        app.cli.add_command(archive_projects_command)
+        if not app.testing:
+            # 命令行不处理请求，不会启动线程；测试中直接调用 move_pending
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        # 第一个请求时再启动线程，避免在 fork 之前创建线程
+        if self.thread:
+            return
+        with self._lock:
+            if self.thread:
+                return
+            self.thread = threading.Thread(
+                target=self._run, name="archive-worker", daemon=True
+            )
+            self.thread.start()
+
+    def notify(self):
+        self._ensure_started()
+        self._wakeup.set()
+
+    def _run(self):
+        config = self.app.config
+        while True:
+            with self.app.app_context():
+                try:
+                    move_pending(config["ARCHIVE_BATCH_SIZE"])
+                except Exception:
+                    # 数据库暂时不可用时线程不退出，下一轮重试
+                    self.app.logger.exception("移动归档项目失败")
+                db.session.remove()
+            self._wakeup.wait(config["ARCHIVE_INTERVAL"])
+            self._wakeup.clear()
+
+
+archive_worker = ArchiveWorker()
+
+
+@click.command("archive-projects")
+@click.option("--batch-size", type=int, default=None, help="每批移动的任务数")
+@with_appcontext
+def archive_projects_command(batch_size):
+    """把已归档项目的任务和评论移入归档表"""
+    moved = move_pending(batch_size or current_app.config["ARCHIVE_BATCH_SIZE"])
+    click.echo(f"已移动 {moved} 个任务")
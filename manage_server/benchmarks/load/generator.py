@@ -0,0 +1,218 @@
+"""
+压测数据生成：按固定随机种子通过 models.py 中的模型写入用户、项目、进度、任务和评论，
+相同参数每次生成完全相同的数据，主键也固定，压测脚本不需要再查询数据库
+
+运行方式（在 manage_server 目录下）:
+    python -m benchmarks.load.generator --uri sqlite:///load.db --users 500 --projects 2000 \\
+        --tasks 20000 --comments 60000
+"""
+
+import argparse
+import random
+from collections import Counter, defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from config import Config
+
+PASSWORD = "bench-password"  # 所有压测用户使用同一个密码
+BATCH_SIZE = 1000
+BASE_TIME = datetime(2024, 1, 1, 9, 0, 0)  # 固定时间起点，生成的时间列也可复现
+WORDS = (
+    "需求 评审 接口 联调 测试 上线 部署 回滚 监控 告警 数据库 迁移 缓存 索引 "
+    "前端 后端 文档 会议 预算 风险 合同 客户 报表 统计 权限 通知 附件 进度"
+).split()
+
+# 生成结果：压测脚本按角色挑选登录用户，按用户挑选可操作的任务
+Dataset = namedtuple(
+    "Dataset",
+    ["password", "usernames", "admins", "managers", "members", "tasks_by_user"],
+)
+
+
+def _text(rng, low, high):
+    return "".join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def _insert(db, model, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(model), rows[start : start + BATCH_SIZE])
+    db.session.commit()
+
+
+def build(users, projects, tasks, comments, seed=42, password_hash=None):
+    """
+    生成各表的行数据，不访问数据库，返回 ([(模型, 行列表)], Dataset)
+    第 1 个用户为管理员，约十分之一为经理，其余为成员
+    压测已有数据的服务器时用相同参数调用，得到相同的 Dataset
+    """
+    from models import (
+        AccountStatus,
+        Comment,
+        Process,
+        Project,
+        ProjectPriority,
+        ProjectStatus,
+        Task,
+        TaskStatus,
+        User,
+        UserRoles,
+    )
+
+    rng = random.Random(seed)
+    admins, managers, members = [1], [], []
+    user_rows = []
+    for user_id in range(1, users + 1):
+        if user_id == 1:
+            role = UserRoles.ADMIN
+        elif user_id % 10 == 2:
+            role = UserRoles.MANAGER
+            managers.append(user_id)
+        else:
+            role = UserRoles.MEMBER
+            members.append(user_id)
+        user_rows.append(
+            {
+                "id": user_id,
+                "username": f"user{user_id}",
+                "name": f"用户{user_id}",
+                "password_hash": password_hash,
+                "role": role,
+                "account_status": AccountStatus.ACTIVE,
+                "created_at": BASE_TIME + timedelta(minutes=user_id),
+            }
+        )
+    if not managers or not members:
+        raise ValueError("用户数太少，至少需要一个经理和一个成员")
+
+    project_managers = {}
+    project_rows = []
+    process_rows = []
+    for project_id in range(1, projects + 1):
+        manager_id = rng.choice(managers)
+        project_managers[project_id] = manager_id
+        start_date = BASE_TIME + timedelta(days=rng.randint(0, 365))
+        project_rows.append(
+            {
+                "id": project_id,
+                "name": f"项目{project_id}{_text(rng, 1, 3)}",
+                "description": _text(rng, 5, 20),
+                "start_date": start_date,
+                "end_date": start_date + timedelta(days=rng.randint(30, 180)),
+                "status": rng.choices(
+                    [ProjectStatus.IN_PROGRESS, ProjectStatus.COMPLETED], [4, 1]
+                )[0],
+                "priority": rng.choice(list(ProjectPriority)),
+                "manager_id": manager_id,
+            }
+        )
+        process_rows.append(
+            {
+                "id": project_id,
+                "project_id": project_id,
+                "completion_rate": round(rng.random(), 2),
+                "update_time": start_date,
+            }
+        )
+
+    # 先确定评论所属的任务，任务行中直接写入评论数
+    comment_tasks = [rng.randint(1, tasks) for _ in range(comments)]
+    comment_counts = Counter(comment_tasks)
+
+    tasks_by_user = defaultdict(list)
+    task_rows = []
+    for task_id in range(1, tasks + 1):
+        project_id = rng.randint(1, projects)
+        assignee_id = rng.choice(members)
+        tasks_by_user[assignee_id].append(task_id)
+        tasks_by_user[project_managers[project_id]].append(task_id)
+        task_rows.append(
+            {
+                "id": task_id,
+                "title": f"任务{task_id}{_text(rng, 1, 3)}",
+                "description": _text(rng, 5, 30),
+                "due_date": BASE_TIME + timedelta(days=rng.randint(0, 540)),
+                "assignee_id": assignee_id,
+                "project_id": project_id,
+                "status": rng.choices(
+                    [TaskStatus.IN_PROGRESS, TaskStatus.COMPLETED], [3, 1]
+                )[0],
+                "comment_count": comment_counts[task_id],
+            }
+        )
+
+    comment_rows = [
+        {
+            "id": comment_id,
+            "task_id": task_id,
+            "author_name": f"用户{rng.choice(members)}",
+            "content": _text(rng, 3, 40),
+            "created_at": BASE_TIME + timedelta(seconds=comment_id * 37),
+        }
+        for comment_id, task_id in enumerate(comment_tasks, 1)
+    ]
+
+    tables = [
+        (User, user_rows),
+        (Project, project_rows),
+        (Process, process_rows),
+        (Task, task_rows),
+        (Comment, comment_rows),
+    ]
+    dataset = Dataset(
+        PASSWORD,
+        {user["id"]: user["username"] for user in user_rows},
+        admins,
+        managers,
+        members,
+        dict(tasks_by_user),
+    )
+    return tables, dataset
+
+
+def generate(db, users, projects, tasks, comments, seed=42):
+    """在空数据库中写入生成的数据，需要在应用上下文中调用，返回 Dataset"""
+    from hashing import hash_password
+    from models import User
+
+    if db.session.execute(select(User.id).limit(1)).first() is not None:
+        raise RuntimeError("数据库中已有用户，请使用空数据库")
+
+    # 哈希只计算一次，所有用户共用
+    tables, dataset = build(
+        users, projects, tasks, comments, seed, hash_password(PASSWORD)
+    )
+    for model, rows in tables:
+        _insert(db, model, rows)
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成压测数据")
+    parser.add_argument("--uri", required=True)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--comments", type=int, default=60000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    Config.SQLALCHEMY_DATABASE_URI = args.uri
+    from app import create_app
+    from extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        dataset = generate(
+            db, args.users, args.projects, args.tasks, args.comments, args.seed
+        )
+    print(
+        f"已生成 {args.users} 个用户（{len(dataset.managers)} 个经理）、"
+        f"{args.projects} 个项目、{args.tasks} 个任务、{args.comments} 条评论"
+    )
+
+
+if __name__ == "__main__":
+    main()
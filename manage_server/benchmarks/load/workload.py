@@ -0,0 +1,150 @@
+"""
+压测负载：每个虚拟用户以生成数据中的一个经理或成员登录，之后按权重随机执行操作
+随机序列由种子和用户序号决定，相同参数每次发出的请求序列相同
+"""
+
+import json
+import random
+from collections import namedtuple
+
+Operation = namedtuple("Operation", ["name", "method", "path", "body", "content_type"])
+
+# 各操作的默认权重，可在命令行中用 name=weight 覆盖
+DEFAULT_MIX = {
+    "login": 2,
+    "list_tasks": 15,
+    "list_projects": 10,
+    "list_processes": 8,
+    "member_tasks": 15,
+    "task_comments": 20,
+    "update_status": 12,
+    "submit_comment": 12,
+    "upload": 6,
+}
+MANAGER_ONLY = {"list_tasks", "list_projects", "list_processes"}
+MEMBER_ONLY = {"member_tasks"}
+TASK_OPERATIONS = {"task_comments", "update_status", "submit_comment", "upload"}
+UPLOAD_SIZES = (4 * 1024, 32 * 1024, 256 * 1024)
+BOUNDARY = "----manage-load-boundary"
+
+
+def parse_mix(values):
+    """解析 name=weight 形式的权重覆盖"""
+    mix = dict(DEFAULT_MIX)
+    for value in values or []:
+        name, _, weight = value.partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"未知的操作: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def _json(name, method, path, data):
+    return Operation(
+        name, method, path, json.dumps(data).encode("utf-8"), "application/json"
+    )
+
+
+def _multipart(fields, filename, content):
+    parts = []
+    for key, value in fields.items():
+        parts.append(
+            f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n'
+            f"{value}\r\n".encode("utf-8")
+        )
+    header = (
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="file"; '
+        f'filename="{filename}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+    )
+    parts.append(header.encode("utf-8") + content + b"\r\n")
+    parts.append(f"--{BOUNDARY}--\r\n".encode("utf-8"))
+    return b"".join(parts)
+
+
+class VirtualUser:
+    """一个压测客户端，第偶数个以经理登录，第奇数个以成员登录"""
+
+    def __init__(self, dataset, index, mix, seed=42):
+        self.rng = random.Random(seed * 100003 + index)
+        pool = dataset.managers if index % 2 == 0 else dataset.members
+        self.user_id = pool[(index // 2) % len(pool)]
+        self.is_manager = index % 2 == 0
+        self.username = dataset.usernames[self.user_id]
+        self.password = dataset.password
+        self.tasks = dataset.tasks_by_user.get(self.user_id, [])
+        self.token = None
+        self.uploads = 0
+
+        names = [
+            name
+            for name, weight in mix.items()
+            if weight > 0
+            and not (name in MANAGER_ONLY and not self.is_manager)
+            and not (name in MEMBER_ONLY and self.is_manager)
+            and not (name in TASK_OPERATIONS and not self.tasks)
+        ]
+        self.names = names
+        self.weights = [mix[name] for name in names]
+
+    def login(self):
+        return _json(
+            "login",
+            "POST",
+            "/api/login",
+            {"account": self.username, "password": self.password},
+        )
+
+    def next_operation(self):
+        name = self.rng.choices(self.names, self.weights)[0]
+        if name == "login":
+            return self.login()
+        if name == "list_tasks":
+            return Operation(
+                name, "GET", f"/api/tasks?limit=20&offset={self._offset()}", None, None
+            )
+        if name == "list_projects":
+            return Operation(name, "GET", "/api/projects?limit=20", None, None)
+        if name == "list_processes":
+            return Operation(name, "GET", "/api/processes?limit=20", None, None)
+        if name == "member_tasks":
+            return Operation(name, "GET", "/api/tasks/member?limit=20", None, None)
+
+        task_id = self.rng.choice(self.tasks)
+        if name == "task_comments":
+            return Operation(
+                name, "GET", f"/api/tasks/{task_id}/comments?limit=20", None, None
+            )
+        if name == "update_status":
+            status = self.rng.choice(["IN_PROGRESS", "COMPLETED"])
+            return _json(
+                name, "PUT", f"/api/tasks/{task_id}/status", {"status": status}
+            )
+        if name == "submit_comment":
+            return _json(
+                name,
+                "POST",
+                f"/api/tasks/{task_id}/comments",
+                {"content": f"压测评论 {self.rng.randint(1, 10**9)}"},
+            )
+
+        # 上传：一半内容重复，覆盖按摘要去重的路径
+        self.uploads += 1
+        size = self.rng.choice(UPLOAD_SIZES)
+        if self.rng.random() < 0.5:
+            content = bytes([size % 251]) * size
+        else:
+            content = self.rng.randbytes(size)
+        body = _multipart(
+            {"task_id": task_id}, f"bench-{self.user_id}-{self.uploads}.bin", content
+        )
+        return Operation(
+            name,
+            "POST",
+            "/api/upload",
+            body,
+            f"multipart/form-data; boundary={BOUNDARY}",
+        )
+
+    def _offset(self):
+        # 大多数轮询停在第一页，偶尔翻页
+        return 0 if self.rng.random() < 0.8 else self.rng.randint(1, 5) * 20
@@ -0,0 +1,129 @@
+"""
+登录吞吐基准：持续发送登录请求的同时测量普通 GET 请求的延迟
+
+分别在请求线程内计算哈希（PASSWORD_HASH_WORKERS=0）和使用哈希进程池两种模式下运行，
+输出登录吞吐量和 GET 请求的 p50/p99 延迟
+
+运行方式（在 manage_server 目录下）:
+    python -m benchmarks.login_bench --login-clients 16 --duration 10
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime, timedelta
+
+import jwt
+from werkzeug.serving import make_server
+
+from config import Config
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def request(url, data=None, headers=None):
+    body = json.dumps(data).encode("utf-8") if data is not None else None
+    req = urllib.request.Request(url, data=body, headers=headers or {})
+    if body is not None:
+        req.add_header("Content-Type", "application/json")
+    try:
+        with urllib.request.urlopen(req) as response:
+            response.read()
+    except urllib.error.HTTPError as e:
+        e.read()
+
+
+def run(base_url, token, login_clients, duration):
+    stop = threading.Event()
+    logins = []
+    get_latencies = []
+
+    def login_loop():
+        while not stop.is_set():
+            request(
+                f"{base_url}/api/login",
+                {"account": "bench", "password": "bench-password"},
+            )
+            logins.append(1)
+
+    def get_loop():
+        headers = {"Authorization": f"Bearer {token}"}
+        while not stop.is_set():
+            start = time.perf_counter()
+            request(f"{base_url}/api/user-role", headers=headers)
+            get_latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(login_clients)]
+    threads.append(threading.Thread(target=get_loop))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "logins_per_second": round(len(logins) / duration, 2),
+        "get_requests": len(get_latencies),
+        "get_p50_ms": round(percentile(get_latencies, 50), 2),
+        "get_p99_ms": round(percentile(get_latencies, 99), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录吞吐与混合 GET 延迟基准")
+    parser.add_argument("--login-clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "login_bench.db")
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+    Config.RATE_LIMIT_ENABLED = False  # 所有登录请求来自同一个 IP 和账号
+
+    from app import create_app
+    from extensions import db
+    from models import User, UserRoles
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user = User(username="bench", name="bench", role=UserRoles.ADMIN)
+        user.set_password("bench-password")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    token = jwt.encode(
+        {"user_id": user_id, "exp": datetime.utcnow() + timedelta(hours=1)},
+        Config.SECRET_KEY,
+        algorithm="HS256",
+    )
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = {}
+    for mode, workers in (("inline", 0), ("process_pool", args.workers)):
+        Config.PASSWORD_HASH_WORKERS = workers
+        results[mode] = run(base_url, token, args.login_clients, args.duration)
+        print(mode, results[mode])
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
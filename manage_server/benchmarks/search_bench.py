@@ -0,0 +1,116 @@
+"""
+搜索基准：直接向索引写入生成的中文文档，测量构建耗时和常见查询的 p50/p99 延迟
+
+运行方式（在 manage_server 目录下）:
+    python -m benchmarks.search_bench --docs 1000000 --backend sqlite
+    python -m benchmarks.search_bench --docs 200000 --backend memory
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import search
+
+WORDS = (
+    "项目 任务 进度 数据库 迁移 接口 测试 需求 评审 上线 部署 监控 告警 客户 合同 "
+    "报表 统计 权限 登录 注册 邮件 通知 附件 上传 下载 归档 恢复 搜索 优化 性能 "
+    "缓存 索引 服务器 前端 后端 设计 文档 会议 计划 预算 风险 质量 版本 发布 回滚 "
+    "api mysql redis nginx docker release sprint bug"
+).split()
+# 按词频排名取权重，接近真实文本中常用词多、生僻词少的分布
+WEIGHTS = [1 / rank for rank in range(1, len(WORDS) + 1)]
+BATCH_SIZE = 10000
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def documents(count, users, projects, rng):
+    kinds = ("project", "task", "comment")
+    for i in range(1, count + 1):
+        text = "".join(rng.choices(WORDS, WEIGHTS, k=rng.randint(4, 16)))
+        yield search.Document(
+            (kinds[i % 3], i),
+            text[:50],
+            search.tokenize(text, unigrams=True),
+            rng.randint(1, projects),
+            rng.randint(1, users),
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="全文搜索基准")
+    parser.add_argument("--docs", type=int, default=1000000)
+    parser.add_argument(
+        "--backend", choices=sorted(search.SEARCH_BACKENDS), default="sqlite"
+    )
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--projects", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    if args.backend == "sqlite":
+        index = search.SqliteFtsIndex(
+            os.path.join(tempfile.mkdtemp(), "search_bench.db")
+        )
+    else:
+        index = search.MemoryIndex()
+
+    start = time.perf_counter()
+    batch = []
+    for doc in documents(args.docs, args.users, args.projects, rng):
+        batch.append(doc)
+        if len(batch) == BATCH_SIZE:
+            index.apply(batch, [])
+            batch = []
+    index.apply(batch, [])
+    build_seconds = time.perf_counter() - start
+
+    # 经理只能看到自己负责的项目，约占全部项目的 1/用户数
+    manager_projects = set(
+        rng.sample(range(1, args.projects + 1), args.projects // args.users)
+    )
+    queries = {
+        "common_word": ("项目", None),
+        "rare_word": ("回滚", None),
+        "two_words": ("数据库 迁移", None),
+        "mixed_text": ("mysql 性能优化", None),
+        "manager_scope": ("数据库 迁移", (manager_projects, 1)),
+    }
+    report = {
+        "backend": args.backend,
+        "docs": args.docs,
+        "build_seconds": round(build_seconds, 2),
+        "queries": {},
+    }
+    for name, (text, visible) in queries.items():
+        tokens = list(dict.fromkeys(search.tokenize(text)))
+        latencies = []
+        total = 0
+        for _ in range(args.rounds):
+            begin = time.perf_counter()
+            total, _ = index.search(tokens, None, visible, 20, 0)
+            latencies.append((time.perf_counter() - begin) * 1000)
+        report["queries"][name] = {
+            "matches": total,
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+        result = report["queries"][name]
+        print(
+            f"{name:14s} {total:>9d} 条  p50 {result['p50_ms']:>9.2f} ms"
+            f"  p99 {result['p99_ms']:>9.2f} ms"
+        )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+序列化基准：对比 ORM 对象 + to_dict + 标准库 json 与列投影 + 预编译序列化 + orjson
+
+运行方式（在 manage_server 目录下）:
+    python -m benchmarks.serializer_bench --tasks 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import joinedload
+
+from config import Config
+
+
+def timed(func, rounds):
+    func()  # 预热
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="列表序列化基准")
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "serializer_bench.db")
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{db_path}"
+
+    from app import create_app
+    from extensions import db
+    from models import Project, Task, TaskStatus, User, UserRoles
+    from serializers import orjson, serialize_task, task_rows
+
+    app = create_app()
+    rng = random.Random(42)
+    now = datetime(2024, 1, 1)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(
+            db.insert(User),
+            [
+                {
+                    "id": i,
+                    "username": f"user{i}",
+                    "name": f"用户{i}",
+                    "role": UserRoles.MEMBER,
+                }
+                for i in range(1, args.users + 1)
+            ],
+        )
+        db.session.execute(
+            db.insert(Project),
+            [
+                {
+                    "id": i,
+                    "name": f"项目{i}",
+                    "end_date": now,
+                    "manager_id": rng.randint(1, args.users),
+                }
+                for i in range(1, args.projects + 1)
+            ],
+        )
+        db.session.execute(
+            db.insert(Task),
+            [
+                {
+                    "title": f"任务{i}",
+                    "description": "描述" * 10,
+                    "due_date": now + timedelta(hours=i),
+                    "assignee_id": rng.randint(1, args.users),
+                    "project_id": rng.randint(1, args.projects),
+                    "status": rng.choice(list(TaskStatus)),
+                }
+                for i in range(args.tasks)
+            ],
+        )
+        db.session.commit()
+
+        def orm_to_dict():
+            db.session.expunge_all()
+            tasks = Task.query.options(
+                joinedload(Task.assignee),
+                joinedload(Task.project).joinedload(Project.manager),
+            ).all()
+            return json.dumps({"tasks": [task.to_dict() for task in tasks]})
+
+        def projection():
+            db.session.expunge_all()
+            rows = task_rows().all()
+            payload = {"tasks": [serialize_task(row) for row in rows]}
+            return orjson.dumps(payload) if orjson else json.dumps(payload)
+
+        baseline = timed(orm_to_dict, args.rounds)
+        fast = timed(projection, args.rounds)
+
+    print(f"任务数: {args.tasks}，orjson: {'已安装' if orjson else '未安装'}")
+    print(f"ORM + to_dict + json:       {baseline:10.2f} ms")
+    print(f"列投影 + 预编译序列化:      {fast:10.2f} ms ({baseline / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+启动耗时基准：每次在新进程中导入 app 并调用 create_app，重复多次取中位数，
+再用 python -X importtime 统计导入最慢的包和模块
+
+中位数超过 --budget 毫秒，或者应当按需加载的模块（openpyxl、flask_mail、alembic）
+在启动时就被导入，都以非零状态码退出，可以放在 CI 中防止启动变慢
+
+运行方式（在 manage_server 目录下）:
+    python -m benchmarks.startup_bench --runs 10 --budget 800 --output startup.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只在用到时才导入的模块，启动后出现在 sys.modules 中说明有地方提前导入了
+LAZY_MODULES = ("openpyxl", "flask_mail", "flask_migrate", "alembic")
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"create_app_ms": elapsed,
+                  "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+
+def run_once(uri, importtime=False):
+    """启动一个子进程，返回 (子进程输出, 进程总耗时毫秒, importtime 输出)"""
+    code = CHILD
+    if uri:
+        code = (
+            "import config; config.Config.SQLALCHEMY_DATABASE_URI = %r\n" % uri + code
+        )
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    started = time.perf_counter()
+    result = subprocess.run(
+        command + ["-c", code], cwd=ROOT, capture_output=True, text=True
+    )
+    wall = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(f"启动失败:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1]), wall, result.stderr
+
+
+def parse_importtime(stderr, top):
+    """返回 (按顶层包汇总的自身耗时, 自身耗时最长的模块)，单位毫秒"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        modules.append((int(self_us) / 1000, name.strip()))
+    packages = defaultdict(float)
+    for elapsed, name in modules:
+        packages[name.split(".")[0]] += elapsed
+    by_package = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    by_module = sorted(modules, reverse=True)[:top]
+    return (
+        {name: round(elapsed, 1) for name, elapsed in by_package},
+        {name: round(elapsed, 1) for elapsed, name in by_module},
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用启动耗时基准")
+    parser.add_argument(
+        "--uri", default=None, help="数据库地址，默认使用配置中的地址（启动时不连接）"
+    )
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument(
+        "--budget", type=float, default=None, help="create_app 中位数的上限（毫秒）"
+    )
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+
+    # 第一次运行生成字节码缓存，不计入结果
+    run_once(args.uri)
+    create_times, wall_times, loaded = [], [], set()
+    for _ in range(args.runs):
+        child, wall, _ = run_once(args.uri)
+        create_times.append(child["create_app_ms"])
+        wall_times.append(wall)
+        loaded.update(child["loaded"])
+
+    _, _, stderr = run_once(args.uri, importtime=True)
+    packages, modules = parse_importtime(stderr, args.top)
+
+    report = {
+        "runs": args.runs,
+        "create_app_ms": {
+            "median": round(statistics.median(create_times), 1),
+            "min": round(min(create_times), 1),
+            "max": round(max(create_times), 1),
+        },
+        "process_ms": {
+            "median": round(statistics.median(wall_times), 1),
+            "min": round(min(wall_times), 1),
+        },
+        "eager_lazy_modules": sorted(loaded),
+        "slowest_packages_ms": packages,
+        "slowest_modules_ms": modules,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    if loaded:
+        failures.append(f"启动时导入了应当按需加载的模块: {', '.join(sorted(loaded))}")
+    if args.budget is not None and report["create_app_ms"]["median"] > args.budget:
+        failures.append(
+            f"create_app 中位数 {report['create_app_ms']['median']} ms 超出预算 {args.budget} ms"
+        )
+    for line in failures:
+        print(line)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, request
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from config import Config
+from extensions import db
+from models import EntityVersion
+
+logger = logging.getLogger("manage.cache")
+
+_versions = EntityVersion.__table__
+
+# 只依赖部分列的派生版本号：表名 -> (派生版本名, 列)
+# 任务、项目列表只显示用户姓名，登录时写入 last_login_at 不会让它们的缓存失效
+COLUMN_VERSIONS = {"users": ("user_names", ("name",))}
+
+
+def bump_versions(connection, names):
+    """
+    在 connection 的事务中把各实体的版本号加一
+    """
+    names = sorted(set(names) - {_versions.name})
+    if not names:
+        return
+    result = connection.execute(
+        update(_versions)
+        .where(_versions.c.name.in_(names))
+        .values(version=_versions.c.version + 1)
+    )
+    if result.rowcount == len(names):
+        return
+
+    existing = set(
+        connection.execute(
+            select(_versions.c.name).where(_versions.c.name.in_(names))
+        ).scalars()
+    )
+    for name in names:
+        if name in existing:
+            continue
+        try:
+            with connection.begin_nested():
+                connection.execute(_versions.insert().values(name=name, version=1))
+        except IntegrityError:
+            # 其它请求已插入该实体，退回到加一
+            connection.execute(
+                update(_versions)
+                .where(_versions.c.name == name)
+                .values(version=_versions.c.version + 1)
+            )
+
+
+def _changed_columns(obj, table):
+    derived = COLUMN_VERSIONS.get(table)
+    if derived is None:
+        return None
+    name, columns = derived
+    state = inspect(obj)
+    if any(state.attrs[column].history.has_changes() for column in columns):
+        return name
+    return None
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_tables(session, flush_context, instances):
+    changed = session.info.setdefault("changed_tables", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(type(obj), "__tablename__", None)
+        if not table:
+            continue
+        changed.add(table)
+        if obj in session.deleted:
+            changed.add(COLUMN_VERSIONS.get(table, (table,))[0])
+        elif obj in session.dirty:
+            changed.add(_changed_columns(obj, table) or table)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed_tables(session, flush_context):
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        session.info.setdefault("bump_tables", set()).update(changed)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_statements(orm_execute_state):
+    # 批量 insert/update/delete 不经过 flush，在执行时单独记录
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None:
+        table = mapper.local_table.name
+        tables = orm_execute_state.session.info.setdefault("bump_tables", set())
+        tables.add(table)
+        if not orm_execute_state.is_insert and table in COLUMN_VERSIONS:
+            # 无法确定批量更新了哪些列，派生版本号一起递增
+            tables.add(COLUMN_VERSIONS[table][0])
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session):
+    """
+    提交后在单独的短事务中递增版本号；版本号行是所有写入共用的热点行，
+    放在业务事务中会让并发写入在行锁上排队直到各自提交
+    """
+    if session.in_nested_transaction():
+        # 释放保存点也会触发 after_commit，外层事务提交后再递增
+        return
+    tables = session.info.pop("bump_tables", None)
+    if not tables:
+        return
+    try:
+        with session.get_bind().begin() as connection:
+            bump_versions(connection, tables)
+    except Exception:
+        # 数据已经提交，版本号没有递增时缓存要到下一次写入才失效
+        logger.exception("递增实体版本号失败: %s", ", ".join(sorted(tables)))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bump_tables(session):
+    # 只回滚保存点时外层事务的写入仍会提交，多递增一次只会让缓存提前失效
+    if not session.in_nested_transaction():
+        session.info.pop("bump_tables", None)
+
+
+class ResponseCache:
+    """
+    按条目数和总字节数限制的 LRU 响应缓存，条目记录生成时的实体版本号
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, versions):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] != versions:
+                self._remove(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, versions, body):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (versions, body)
+            self.size += len(body)
+            while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+
+    def _remove(self, key):
+        _, body = self.entries.pop(key)
+        self.size -= len(body)
+
+
+response_cache = ResponseCache(
+    Config.RESPONSE_CACHE_MAX_ENTRIES, Config.RESPONSE_CACHE_MAX_BYTES
+)
+
+
+def cached_response(*entities):
+    """
+    列表接口的响应缓存，按接口、当前用户及其角色和查询参数区分
+
+    entities 为响应依赖的数据表，任一表的版本号变化后缓存失效；
+    客户端带上一致的 If-None-Match 时直接返回 304
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions = dict(
+                db.session.execute(
+                    select(_versions.c.name, _versions.c.version).where(
+                        _versions.c.name.in_(entities)
+                    )
+                ).all()
+            )
+            versions = tuple(versions.get(name, 0) for name in entities)
+
+            user = g.get("current_user")
+            # 角色决定可见范围，角色变化后不能再使用原角色下缓存的列表
+            key = (
+                request.endpoint,
+                (user.id, user.role.name) if user is not None else None,
+                tuple(sorted(request.args.items(multi=True))),
+                tuple(sorted(kwargs.items())),
+            )
+            etag = hashlib.sha1(repr((key, versions)).encode("utf-8")).hexdigest()
+
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                body = response_cache.get(key, versions)
+                if body is None:
+                    response = view(*args, **kwargs)
+                    if (
+                        not isinstance(response, Response)
+                        or response.status_code != 200
+                    ):
+                        return response
+                    response_cache.set(key, versions, response.get_data())
+                else:
+                    response = Response(body, mimetype="application/json")
+
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        return wrapper
+
+    return decorator
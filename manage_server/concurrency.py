@@ -0,0 +1,59 @@
+# 异步部署支持：gevent 模式下请求在协程中处理，PyMySQL 是纯 Python 实现，
+# 打补丁后的 socket 让数据库等待自动让出；CPU 密集和磁盘读写的部分放到原生线程池，
+# 避免阻塞事件循环。同步模式下这些函数直接在当前线程执行
+
+import sys
+
+
+def cooperative():
+    """是否运行在打过补丁的 gevent 事件循环中"""
+    monkey = sys.modules.get("gevent.monkey")
+    return monkey is not None and monkey.is_module_patched("socket")
+
+
+def run_blocking(func, *args, **kwargs):
+    """
+    在原生线程中执行阻塞函数并等待结果，等待期间其它协程继续运行
+    func 中不能访问数据库或请求对象，它们只能在事件循环线程中使用
+    """
+    if not cooperative():
+        return func(*args, **kwargs)
+    import gevent
+
+    return gevent.get_hub().threadpool.apply(func, args, kwargs)
+
+
+def map_blocking(func, *iterables):
+    """并行执行多次阻塞调用，按输入顺序返回结果"""
+    if not cooperative():
+        return list(map(func, *iterables))
+    import gevent
+
+    return list(gevent.get_hub().threadpool.imap(func, *iterables))
+
+
+class SqlitePool:
+    """
+    SQLite 连接池：每次调用在原生线程中独占一个连接，用完放回，同时使用的连接数不超过线程池大小
+    gevent 模式下 sqlite3 的调用不会阻塞事件循环，也不必为每个协程打开一个连接
+    """
+
+    def __init__(self, connect):
+        self._connect = (
+            connect  # 需要以 check_same_thread=False 打开，连接会在不同线程间复用
+        )
+        self._idle = []  # list 的 append 和 pop 是原子操作，不需要加锁
+
+    def run(self, func, *args):
+        """以 func(连接, *args) 执行并返回结果"""
+        return run_blocking(self._call, func, args)
+
+    def _call(self, func, args):
+        try:
+            conn = self._idle.pop()
+        except IndexError:
+            conn = self._connect()
+        try:
+            return func(conn, *args)
+        finally:
+            self._idle.append(conn)
@@ -10,32 +10,153 @@ class Config:
     # SQLAlchemy和数据库的配置
     USERNAME = os.getenv("DB_USERNAME")
     PASSWORD = os.getenv("DB_PASSWORD")
-    HOST = os.getenv("DB_HOST")
-    PORT = os.getenv("DB_PORT")
+    HOST = os.getenv("DB_HOST", "127.0.0.1")
+    PORT = os.getenv("DB_PORT", "3306")
     DATABASE = os.getenv("DB_NAME")
     DB_URI = "mysql+pymysql://{}:{}@{}:{}/{}?charset=utf8".format(
         USERNAME, PASSWORD, HOST, PORT, DATABASE
     )
     SQLALCHEMY_DATABASE_URI = DB_URI
+    DB_REPLICA_URIS = os.getenv(
+        "DB_REPLICA_URIS", ""
+    )  # 只读副本地址，多个用逗号分隔，GET 请求的查询随机选择一个副本
+    REPLICA_STICKY_SECONDS = float(
+        os.getenv("REPLICA_STICKY_SECONDS", 5)
+    )  # 客户端写入后读主库的秒数，应大于副本的复制延迟
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))  # 每个数据库的连接池大小
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))  # 连接池允许额外创建的连接数
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))  # 等待空闲连接的秒数
+    DB_POOL_RECYCLE = int(
+        os.getenv("DB_POOL_RECYCLE", 3600)
+    )  # 连接使用超过该秒数后重建，应小于 MySQL 的 wait_timeout
+    DB_POOL_PRE_PING = (
+        os.getenv("DB_POOL_PRE_PING", "True") == "True"
+    )  # 取出连接时先检测是否可用
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # 动态追踪修改设置，没有设置会有警告
     SQLALCHEMY_ECHO = False  # 查询时显示原始SQL语句
 
+    # 监控配置
+    METRICS_ENABLED = (
+        os.getenv("METRICS_ENABLED", "True") == "True"
+    )  # 记录请求耗时并提供 /metrics
+    SERVER_TIMING_ENABLED = (
+        os.getenv("SERVER_TIMING_ENABLED", "True") == "True"
+    )  # 响应中附带 Server-Timing 头
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")  # 设置后抓取 /metrics 需要携带该 Bearer token
+
+    # 查询检查配置
+    QUERY_GUARD_ENABLED = (
+        os.getenv("QUERY_GUARD_ENABLED", "False") == "True"
+    )  # 检查 N+1 和慢查询，调试和测试模式下自动启用
+    QUERY_GUARD_MODE = os.getenv("QUERY_GUARD_MODE", "log")  # log 只记录日志，raise 抛出异常
+    QUERY_REPEAT_THRESHOLD = int(
+        os.getenv("QUERY_REPEAT_THRESHOLD", 5)
+    )  # 同一请求中相同 SQL 执行达到该次数视为 N+1
+    SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_SECONDS", 0.1))  # 慢查询阈值
+    QUERY_BUDGETS = os.getenv(
+        "QUERY_BUDGETS", ""
+    )  # 覆盖接口的查询数预算，如 task.get_tasks=4,project.get_projects=4
+    QUERY_GUARD_REPORT = os.getenv("QUERY_GUARD_REPORT")  # 进程退出时把检查结果写入该 JSON 文件
+
     # 秘钥配置
     SECRET_KEY = os.getenv("SECRET_KEY") or "flask:manage:server:123123123"
     DEFAULT_PASSWORD = os.getenv("DEFAULT_PASSWORD") or "Xxx@123456"
+    # 密码哈希策略，格式与 werkzeug 一致，修改后用户下次登录时自动升级
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    # 哈希进程数（0 表示在请求线程中计算）、同时排队的任务数以及排队和计算的超时秒数
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 16))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 5))
+
+    # 缓存配置
+    # 列表接口响应缓存的最大条目数和总字节数
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 512))
+    RESPONSE_CACHE_MAX_BYTES = int(
+        os.getenv("RESPONSE_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+    )
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 4096))  # 已验证 token 缓存条数
 
     # 后端配置
     HOST = os.getenv("FLASK_HOST", "0.0.0.0")  # 从环境变量读取 HOST
     PORT = int(os.getenv("FLASK_PORT", 5000))  # 从环境变量读取 PORT
     DEBUG = os.getenv("FLASK_DEBUG", "False") == "True"  # 从环境变量读取 DEBUG
+    SERVER_MODE = os.getenv("SERVER_MODE", "sync")  # sync 为线程模式，gevent 为协程模式
+    SERVER_CONNECTIONS = int(
+        os.getenv("SERVER_CONNECTIONS", 1000)
+    )  # gevent 模式下同时处理的连接数
+    ASYNC_DB_POOL_SIZE = int(
+        os.getenv("ASYNC_DB_POOL_SIZE", 20)
+    )  # gevent 模式下的数据库连接池大小
+    ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", 30))  # 连接池允许额外创建的连接数
+    ASYNC_DB_POOL_TIMEOUT = float(
+        os.getenv("ASYNC_DB_POOL_TIMEOUT", 10)
+    )  # 等待空闲连接的秒数
+    UPLOAD_FOLDER = os.getenv(
+        "UPLOAD_FOLDER",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "uploads"),
+    )  # 附件存储目录
+    # 附件下载方式：为空时由 Flask 发送文件，x-accel-redirect 或 x-sendfile 时交给前置服务器发送
+    ATTACHMENT_SENDFILE = os.getenv("ATTACHMENT_SENDFILE", "").lower()
+    ATTACHMENT_ACCEL_PREFIX = os.getenv(
+        "ATTACHMENT_ACCEL_PREFIX", "/protected-uploads/"
+    )  # nginx 中 internal location 的前缀
+    USE_X_SENDFILE = ATTACHMENT_SENDFILE == "x-sendfile"
+
+    # 归档配置
+    ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", 500))  # 归档时每批移动的任务数
+    ARCHIVE_INTERVAL = float(os.getenv("ARCHIVE_INTERVAL", 300))  # 后台检查待归档项目的间隔秒数
+
+    # 全文搜索配置
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "sqlite")  # 全文索引后端：sqlite 或 memory
+    SEARCH_INDEX_PATH = os.getenv(
+        "SEARCH_INDEX_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_index.db"),
+    )  # SQLite FTS5 索引文件路径
+
+    # 变更推送配置
+    EVENT_BROKER = os.getenv("EVENT_BROKER", "local")  # 变更事件代理
+    EVENT_BUFFER_SIZE = int(os.getenv("EVENT_BUFFER_SIZE", 1000))  # 可按 Last-Event-ID 补发的事件数
+    EVENT_HEARTBEAT = float(os.getenv("EVENT_HEARTBEAT", 15))  # SSE 空闲时发送心跳的间隔秒数
+    EVENT_STREAM_MAX_SECONDS = float(
+        os.getenv("EVENT_STREAM_MAX_SECONDS", 600)
+    )  # 单个 SSE 连接的最长时间，到期后客户端自动重连
+
+    # 限流配置
+    RATE_LIMIT_ENABLED = (
+        os.getenv("RATE_LIMIT_ENABLED", "True") == "True"
+    )  # 登录和验证码接口限流
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")  # 限流存储：sqlite（多进程共享）或 memory
+    RATE_LIMIT_PATH = os.getenv(
+        "RATE_LIMIT_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "rate_limit.db"),
+    )  # SQLite 限流文件路径
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))  # memory 后端最多保存的令牌桶数
+    RATE_LIMIT_TRUSTED_PROXIES = int(
+        os.getenv("RATE_LIMIT_TRUSTED_PROXIES", 0)
+    )  # 前置反向代理的层数，大于 0 时按 X-Forwarded-For 取客户端地址
+    # 各接口的限额，格式为 次数/秒数，按 IP 和按账号分别计算，留空表示不限制
+    RATE_LIMIT_LOGIN_IP = os.getenv("RATE_LIMIT_LOGIN_IP", "30/60")
+    RATE_LIMIT_LOGIN_ACCOUNT = os.getenv("RATE_LIMIT_LOGIN_ACCOUNT", "10/300")
+    RATE_LIMIT_VERIFICATION_IP = os.getenv("RATE_LIMIT_VERIFICATION_IP", "5/60")
+    RATE_LIMIT_VERIFICATION_ACCOUNT = os.getenv("RATE_LIMIT_VERIFICATION_ACCOUNT", "1/60")
+    RATE_LIMIT_CHECK_EMAIL_IP = os.getenv("RATE_LIMIT_CHECK_EMAIL_IP", "30/60")
+    RATE_LIMIT_RECOVER_IP = os.getenv("RATE_LIMIT_RECOVER_IP", "5/60")
+    RATE_LIMIT_RECOVER_ACCOUNT = os.getenv("RATE_LIMIT_RECOVER_ACCOUNT", "5/3600")
 
     # 邮件配置
-    MAIL_SERVER = os.getenv("MAIL_SERVER")  # 邮件服务器
-    MAIL_PORT = int(os.getenv("MAIL_PORT"))  # 邮件端口
-    MAIL_USE_TLS = os.getenv("MAIL_USE_TLS").lower() == "true"  # 是否使用TLS
-    MAIL_USE_SSL = os.getenv("MAIL_USE_SSL").lower() == "true"  # 是否使用SSL
+    MAIL_SERVER = os.getenv("MAIL_SERVER")  # 邮件服务器，未配置时不发送邮件
+    MAIL_PORT = int(os.getenv("MAIL_PORT", 25))  # 邮件端口
+    MAIL_USE_TLS = os.getenv("MAIL_USE_TLS", "false").lower() == "true"  # 是否使用TLS
+    MAIL_USE_SSL = os.getenv("MAIL_USE_SSL", "false").lower() == "true"  # 是否使用SSL
     MAIL_USERNAME = os.getenv("MAIL_USERNAME")  # 邮箱用户名
     MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")  # 邮箱密码
     MAIL_DEFAULT_SENDER = os.getenv(
         "MAIL_DEFAULT_SENDER", "noreply@example.com"
     )  # 默认发件人
+    MAIL_WORKERS = int(os.getenv("MAIL_WORKERS", 2))  # 后台发信线程数
+    MAIL_QUEUE_SIZE = int(os.getenv("MAIL_QUEUE_SIZE", 1000))  # 发信队列容量
+    MAIL_ENQUEUE_TIMEOUT = float(os.getenv("MAIL_ENQUEUE_TIMEOUT", 1))  # 队列满时的等待秒数
+    MAIL_BATCH_SIZE = int(os.getenv("MAIL_BATCH_SIZE", 20))  # 每批最多发送的邮件数
+    MAIL_MAX_RETRIES = int(os.getenv("MAIL_MAX_RETRIES", 3))  # 发送失败的重试次数
+    MAIL_RETRY_BACKOFF = float(os.getenv("MAIL_RETRY_BACKOFF", 1))  # 重试退避的基础秒数
+    MAIL_IDLE_TIMEOUT = float(os.getenv("MAIL_IDLE_TIMEOUT", 30))  # 空闲多久后关闭 SMTP 连接
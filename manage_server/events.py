@@ -0,0 +1,258 @@
+# 变更事件：任务、项目、进度和评论提交后生成精简事件，通过 /api/events 以 SSE 推送
+# 事件在 flush 时根据 ORM 对象生成，提交成功后才发布，回滚时丢弃
+
+import itertools
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+
+from flask import current_app
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from models import Comment, Process, Project, Task
+
+# manager_id、assignee_id 只用于按用户过滤，不发送给客户端
+ChangeEvent = namedtuple(
+    "ChangeEvent", ["id", "type", "data", "manager_id", "assignee_id"]
+)
+
+
+class LocalBroker:
+    """
+    进程内事件代理，最近的事件保存在环形缓冲区中，断线重连时按 Last-Event-ID 补发
+    事件 ID 为 "启动标识:序号"，进程重启后旧 ID 无法续传，客户端会收到 reset
+    多进程部署需要换成共享的代理（如 Redis 发布订阅），接口保持一致
+    """
+
+    def __init__(self, buffer_size):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=buffer_size)
+        self._last_seq = 0
+
+    def publish(self, events):
+        with self._condition:
+            for item in events:
+                self._last_seq += 1
+                self._events.append(
+                    item._replace(id=f"{self.boot_id}:{self._last_seq}")
+                )
+            self._condition.notify_all()
+
+    def position(self, last_event_id):
+        """
+        把客户端的 Last-Event-ID 转换为序号，返回 (序号, 是否需要重新加载)
+        没有 ID 时从当前位置开始，只接收之后的事件
+        """
+        with self._condition:
+            if not last_event_id:
+                return self._last_seq, False
+            boot_id, _, seq = last_event_id.partition(":")
+            if boot_id != self.boot_id or not seq.isdigit():
+                return self._last_seq, True
+            seq = int(seq)
+            first_seq = self._last_seq - len(self._events) + 1
+            if seq > self._last_seq or seq + 1 < first_seq:
+                # 缓冲区已经覆盖了客户端错过的事件
+                return self._last_seq, True
+            return seq, False
+
+    def read(self, after_seq, timeout):
+        """
+        等待序号之后的事件，超时返回空列表；返回 (事件列表, 最新序号, 是否有遗漏)
+        读取跟不上时缓冲区会覆盖还没读到的事件，这时有遗漏为 True
+        """
+        with self._condition:
+            if self._last_seq <= after_seq:
+                self._condition.wait(timeout)
+            first_seq = self._last_seq - len(self._events) + 1
+            gap = after_seq + 1 < first_seq
+            start = max(after_seq + 1 - first_seq, 0)
+            events = list(itertools.islice(self._events, start, None))
+            return events, self._last_seq, gap
+
+
+EVENT_BROKERS = {"local": LocalBroker}
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                config = current_app.config
+                _broker = EVENT_BROKERS[config["EVENT_BROKER"]](
+                    config["EVENT_BUFFER_SIZE"]
+                )
+    return _broker
+
+
+def visible_to(item, user_id, is_admin):
+    # 与列表接口一致：管理员接收全部，其他用户接收自己负责的项目和分配给自己的任务
+    return is_admin or user_id in (item.manager_id, item.assignee_id)
+
+
+def record(session, type, data, manager_id, assignee_id=None):
+    """记录一条事件，随当前事务提交后发布；批量语句等不经过 flush 的写入手动调用"""
+    session.info.setdefault("change_events", []).append(
+        ChangeEvent(None, type, data, manager_id, assignee_id)
+    )
+
+
+def _format_datetime(value):
+    return value.isoformat(" ", "seconds") if value else None
+
+
+def _task_data(task):
+    data = {
+        "id": task.id,
+        "project_id": task.project_id,
+        "title": task.title,
+        "status": getattr(task.status, "name", task.status),
+        "assignee_id": task.assignee_id,
+    }
+    # 评论数按 SQL 表达式加一后需要重新加载，flush 过程中不去读取
+    if "comment_count" not in inspect(task).unloaded:
+        data["comment_count"] = task.comment_count
+    return data
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    objects = [
+        (action, obj)
+        for action, objs in (
+            ("created", session.new),
+            ("updated", session.dirty),
+            ("deleted", session.deleted),
+        )
+        for obj in objs
+        if isinstance(obj, (Task, Project, Process, Comment))
+        and (action != "updated" or session.is_modified(obj))
+    ]
+    if not objects:
+        return
+
+    connection = session.connection()
+    managers = {}
+
+    def manager_of(project_id):
+        if project_id not in managers:
+            managers[project_id] = connection.execute(
+                select(Project.manager_id).where(Project.id == project_id)
+            ).scalar()
+        return managers[project_id]
+
+    for action, obj in objects:
+        if isinstance(obj, Project):
+            record(
+                session,
+                f"project.{action}",
+                {
+                    "id": obj.id,
+                    "name": obj.name,
+                    "status": getattr(obj.status, "name", obj.status),
+                },
+                obj.manager_id,
+            )
+        elif isinstance(obj, Task):
+            record(
+                session,
+                f"task.{action}",
+                _task_data(obj),
+                manager_of(obj.project_id),
+                obj.assignee_id,
+            )
+        elif isinstance(obj, Process):
+            record(
+                session,
+                f"process.{action}",
+                {
+                    "id": obj.id,
+                    "project_id": obj.project_id,
+                    "completion_rate": obj.completion_rate * 100,
+                    "update_time": _format_datetime(obj.update_time),
+                },
+                manager_of(obj.project_id),
+            )
+        elif isinstance(obj, Comment):
+            row = connection.execute(
+                select(Task.project_id, Task.assignee_id).where(Task.id == obj.task_id)
+            ).first()
+            project_id, assignee_id = row if row else (None, None)
+            record(
+                session,
+                f"comment.{action}",
+                {
+                    "id": obj.id,
+                    "task_id": obj.task_id,
+                    "project_id": project_id,
+                    "author_name": obj.author_name,
+                    "created_at": _format_datetime(obj.created_at),
+                },
+                manager_of(project_id),
+                assignee_id,
+            )
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session):
+    if session.in_nested_transaction():
+        # 释放保存点也会触发 after_commit，外层事务提交后再发布
+        return
+    events = session.info.pop("change_events", None)
+    if events:
+        get_broker().publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    # 只回滚保存点时外层事务仍会提交，之前记录的事件保留
+    if not session.in_nested_transaction():
+        session.info.pop("change_events", None)
+
+
+def stream(user_id, is_admin, last_event_id, heartbeat, max_seconds):
+    """
+    返回生成 SSE 文本的迭代器：先补发 Last-Event-ID 之后的事件，之后阻塞等待新事件
+    空闲时定期发送注释行保持连接，超过 max_seconds 后结束，由客户端带着 ID 重连
+    迭代在请求上下文之外进行，代理和 JSON 编码在这里先取好
+    """
+    broker = get_broker()
+    dumps = current_app.json.dumps
+    seq, reset = broker.position(last_event_id)
+
+    def reset_event():
+        # 错过的事件已无法补发，客户端应重新加载列表
+        return f"id: {broker.boot_id}:{seq}\nevent: reset\ndata: {{}}\n\n"
+
+    def generate():
+        nonlocal seq
+        yield f"retry: {int(heartbeat * 1000)}\n\n"
+        if reset:
+            yield reset_event()
+
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            events, seq, gap = broker.read(seq, heartbeat)
+            if gap:
+                # 连接期间写入过快，缓冲区已覆盖未发送的事件，剩下的这批也不再发送
+                yield reset_event()
+                continue
+            sent = False
+            for item in events:
+                if visible_to(item, user_id, is_admin):
+                    yield (
+                        f"id: {item.id}\nevent: {item.type}\n"
+                        f"data: {dumps(item.data)}\n\n"
+                    )
+                    sent = True
+            if not sent:
+                yield ": keep-alive\n\n"
+
+    return generate()
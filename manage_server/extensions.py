@@ -1,32 +1,194 @@
+from flask import current_app
 from flask_sqlalchemy import SQLAlchemy
-from flask_mail import Mail, Message
 from config import Config
+from routing import RoutingSession
+import queue
 import random
-import traceback
+import smtplib
 import threading
-from flask import current_app
+import time
 
-db = SQLAlchemy()
-mail = Mail()
+db = SQLAlchemy(session_options={"class_": RoutingSession})  # GET 请求读副本
 
-def send_email_verification_code(email, verification_code):
-    def send_email(app):
-        with app.app_context():  # 推送应用上下文
-            try:
-                msg = Message(
-                    "您的验证码", sender=Config.MAIL_DEFAULT_SENDER, recipients=[email]
-                )
-                msg.body = (
-                    f"[管理助手] 您的验证码是：{verification_code}。请在10分钟内使用。"
+
+class LazyMail:
+    """
+    flask_mail 的包装：init_app 只保存应用，第一次发信时才导入 flask_mail 并读取邮件配置
+    未配置 MAIL_SERVER 时 configured 为 False，调用方跳过发信
+    """
+
+    def __init__(self):
+        self.app = None
+        self._mail = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+
+    @property
+    def configured(self):
+        return self.app is not None and bool(self.app.config.get("MAIL_SERVER"))
+
+    def connect(self):
+        if self._mail is None:
+            with self._lock:
+                if self._mail is None:
+                    from flask_mail import Mail
+
+                    self._mail = Mail(self.app)
+        return self._mail.connect()
+
+
+mail = LazyMail()
+
+
+class MailWorkerPool:
+    """
+    固定数量的后台发信线程，从有界队列取邮件，复用 SMTP 连接批量发送
+
+    队列满时 submit 在 MAIL_ENQUEUE_TIMEOUT 秒后抛出 queue.Full，由调用方返回错误
+    """
+
+    def __init__(self):
+        self.app = None
+        self.queue = None
+        self.threads = []
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def init_app(self, app):
+        self.app = app
+        self.queue = queue.Queue(maxsize=app.config["MAIL_QUEUE_SIZE"])
+
+    def _ensure_started(self):
+        # 第一次提交邮件时再启动线程，避免在 fork 之前创建线程
+        if self.threads:
+            return
+        with self._lock:
+            if self.threads:
+                return
+            for index in range(self.app.config["MAIL_WORKERS"]):
+                thread = threading.Thread(
+                    target=self._run, name=f"mail-worker-{index}", daemon=True
                 )
-                mail.send(msg)
-            except Exception as e:
-                print(f"发送邮件时出错: {e}")  # 打印错误信息
-                traceback.print_exc()  # 打印详细的错误堆栈信息
-
-    # 创建并启动线程，传递 Flask 应用实例
-    email_thread = threading.Thread(target=send_email, args=(current_app._get_current_object(),))
-    email_thread.start()
+                thread.start()
+                self.threads.append(thread)
+
+    def submit(self, message):
+        self._ensure_started()
+        self.queue.put(
+            (message, time.monotonic()),
+            timeout=self.app.config["MAIL_ENQUEUE_TIMEOUT"],
+        )
+
+    def metrics(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self.queue.qsize() if self.queue else 0,
+                "workers": len(self.threads),
+                "sent": self.sent,
+                "failed": self.failed,
+                "retried": self.retried,
+                "avg_latency": self.total_latency / self.sent if self.sent else 0.0,
+                "max_latency": self.max_latency,
+            }
+
+    def _record(self, enqueued_at, ok):
+        latency = time.monotonic() - enqueued_at
+        with self._stats_lock:
+            if ok:
+                self.sent += 1
+                self.total_latency += latency
+                self.max_latency = max(self.max_latency, latency)
+            else:
+                self.failed += 1
+
+    def _run(self):
+        config = self.app.config
+        connection = None
+        with self.app.app_context():
+            while True:
+                try:
+                    batch = [self.queue.get(timeout=config["MAIL_IDLE_TIMEOUT"])]
+                except queue.Empty:
+                    # 空闲一段时间后关闭连接，下次有邮件时重新建立
+                    connection = self._close(connection)
+                    continue
+
+                while len(batch) < config["MAIL_BATCH_SIZE"]:
+                    try:
+                        batch.append(self.queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                for message, enqueued_at in batch:
+                    try:
+                        connection = self._send(connection, message, enqueued_at)
+                    except Exception:
+                        # 邮件内容有误等意外错误只让这一封失败，线程继续处理队列
+                        self.app.logger.exception(
+                            "发送邮件失败: %s", getattr(message, "recipients", None)
+                        )
+                        self._record(enqueued_at, False)
+                        connection = self._close(connection)
+                    finally:
+                        self.queue.task_done()
+
+    def _send(self, connection, message, enqueued_at):
+        config = self.app.config
+        for attempt in range(config["MAIL_MAX_RETRIES"] + 1):
+            try:
+                if connection is None:
+                    connection = mail.connect()
+                    connection.__enter__()
+                connection.send(message)
+                self._record(enqueued_at, True)
+                return connection
+            except (smtplib.SMTPException, OSError):
+                connection = self._close(connection)
+                if attempt == config["MAIL_MAX_RETRIES"]:
+                    self.app.logger.exception(
+                        "发送邮件失败: %s", ", ".join(message.recipients)
+                    )
+                    break
+                with self._stats_lock:
+                    self.retried += 1
+                time.sleep(config["MAIL_RETRY_BACKOFF"] * 2**attempt)
+        self._record(enqueued_at, False)
+        return connection
+
+    @staticmethod
+    def _close(connection):
+        if connection is not None:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+        return None
+
+
+mail_worker = MailWorkerPool()
+
+
+def send_email_verification_code(email, verification_code):
+    """放入发信队列由后台线程发送，未配置邮件服务时只记录日志，返回是否已放入队列"""
+    if not mail.configured:
+        current_app.logger.warning("未配置 MAIL_SERVER，跳过发送验证码邮件: %s", email)
+        return False
+
+    from flask_mail import Message
+
+    msg = Message("您的验证码", sender=Config.MAIL_DEFAULT_SENDER, recipients=[email])
+    msg.body = f"[管理助手] 您的验证码是：{verification_code}。请在10分钟内使用。"
+    # 放入发信队列，由后台线程发送
+    mail_worker.submit(msg)
+    return True
+
 
 def generate_random_verification_code(length=6):
     return "".join(random.choices("0123456789", k=length))
@@ -0,0 +1,146 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from concurrency import cooperative, map_blocking, run_blocking
+from config import Config
+from metrics import timed
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(Config.PASSWORD_HASH_QUEUE_SIZE)
+
+
+class PasswordHashBusy(Exception):
+    """哈希进程池排队已满或计算超时"""
+
+
+def _get_executor():
+    # 第一次使用时再创建进程池，避免在 fork 之前启动子进程
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=Config.PASSWORD_HASH_WORKERS
+                )
+    return _executor
+
+
+@timed("hash")
+def _run(func, *args):
+    # PASSWORD_HASH_WORKERS 为 0 时在当前线程计算，便于本地调试
+    if Config.PASSWORD_HASH_WORKERS <= 0:
+        return func(*args)
+
+    if not _slots.acquire(timeout=Config.PASSWORD_HASH_TIMEOUT):
+        raise PasswordHashBusy("密码哈希队列已满")
+    if cooperative():
+        # gevent 模式下进程池的管理线程会变成协程，改用原生线程池，哈希计算时释放 GIL
+        try:
+            return run_blocking(func, *args)
+        finally:
+            _slots.release()
+
+    future = _submit([(func, args)])[0]
+    try:
+        return future.result(timeout=Config.PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        raise PasswordHashBusy("密码哈希计算超时")
+
+
+def _submit(calls):
+    """
+    把已占用一个名额的一组计算提交到进程池，全部结束后才释放名额
+    等待超时返回时进程仍在计算，名额继续占用，排队上限反映进程池的实际负载
+    """
+    try:
+        futures = [_get_executor().submit(func, *args) for func, args in calls]
+    except BaseException:
+        _slots.release()
+        raise
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def finished(future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            _slots.release()
+
+    for future in futures:
+        future.add_done_callback(finished)
+    return futures
+
+
+def _hash_chunk(passwords, method):
+    return [generate_password_hash(password, method) for password in passwords]
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, Config.PASSWORD_HASH_METHOD)
+
+
+@timed("hash")
+def hash_passwords(passwords):
+    """
+    批量计算哈希，整批占用一个排队名额，在进程池的所有进程中并行计算
+    """
+    passwords = list(passwords)
+    methods = [Config.PASSWORD_HASH_METHOD] * len(passwords)
+    if Config.PASSWORD_HASH_WORKERS <= 0:
+        return list(map(generate_password_hash, passwords, methods))
+
+    if not passwords:
+        return []
+    if not _slots.acquire(timeout=Config.PASSWORD_HASH_TIMEOUT):
+        raise PasswordHashBusy("密码哈希队列已满")
+    if cooperative():
+        try:
+            return map_blocking(generate_password_hash, passwords, methods)
+        finally:
+            _slots.release()
+
+    # 每个进程分到约 4 批，减少进程间传输的次数
+    method = Config.PASSWORD_HASH_METHOD
+    rounds = -(-len(passwords) // Config.PASSWORD_HASH_WORKERS)
+    chunk_size = max(1, rounds // 4)
+    futures = _submit(
+        [
+            (_hash_chunk, (passwords[start : start + chunk_size], method))
+            for start in range(0, len(passwords), chunk_size)
+        ]
+    )
+    _, pending = wait(futures, timeout=Config.PASSWORD_HASH_TIMEOUT * rounds)
+    if pending:
+        for future in pending:
+            future.cancel()
+        raise PasswordHashBusy("密码哈希计算超时")
+    return [hashed for future in futures for hashed in future.result()]
+
+
+def verify_password(password_hash, password):
+    if not password_hash:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+@lru_cache(maxsize=8)
+def _method_prefix(method):
+    """
+    werkzeug 会补全省略的参数（如 scrypt 保存为 scrypt:32768:8:1），
+    对一个空密码计算一次哈希，取实际保存的方法前缀
+    """
+    return generate_password_hash("", method).split("$", 1)[0]
+
+
+def needs_rehash(password_hash):
+    # 哈希参数与当前策略不一致时需要在下次登录时重新计算
+    if not password_hash:
+        return False
+    return password_hash.split("$", 1)[0] != _method_prefix(Config.PASSWORD_HASH_METHOD)
@@ -0,0 +1,281 @@
+# 请求耗时统计：每个请求记录 SQL 次数和耗时、连接池等待、token 解码、密码哈希和 JSON 编码耗时，
+# 通过 Server-Timing 响应头和结构化日志输出；累计指标由 /metrics 以 Prometheus 文本格式导出
+# 指标保存在当前进程内，多进程部署时每个进程分别被抓取
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+TIMING_NAMES = ("db", "pool", "jwt", "hash", "serialize")
+MAIL_COUNTERS = ("sent", "failed", "retried")
+
+request_logger = logging.getLogger("manage.request")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name, description, label_names, buckets):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} histogram",
+        ]
+        with self.lock:
+            series = [
+                (labels, list(counts), total)
+                for labels, (counts, total) in self.series.items()
+            ]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                label_text = _format_labels((*self.label_names, "le"), (*labels, bound))
+                lines.append(f"{self.name}_bucket{label_text} {cumulative}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, description, label_names):
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def add(self, labels, value=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self.lock:
+            values = sorted(self.values.items())
+        for labels, value in values:
+            lines.append(
+                f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    """可以增减的计数"""
+
+    kind = "gauge"
+
+
+ROUTE_LABELS = ("blueprint", "route", "method")
+REQUEST_DURATION = Histogram(
+    "manage_request_duration_seconds",
+    "请求处理耗时",
+    (*ROUTE_LABELS, "status"),
+    LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "manage_requests_in_flight", "正在处理的请求数", ROUTE_LABELS
+)
+DB_QUERIES = Counter("manage_db_queries_total", "执行的 SQL 语句数", ROUTE_LABELS)
+DB_SECONDS = Counter("manage_db_seconds_total", "SQL 执行总耗时", ROUTE_LABELS)
+POOL_WAIT = Histogram(
+    "manage_db_pool_wait_seconds", "从连接池取得连接的等待时间", (), WAIT_BUCKETS
+)
+
+
+def add_timing(name, seconds):
+    if has_request_context():
+        timings = g.get("request_timings")
+        if timings is not None:
+            timings[name] += seconds
+
+
+@contextmanager
+def timed(name):
+    """把代码块的耗时计入当前请求的 name 项，请求之外调用时不记录"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_timing(name, time.perf_counter() - start)
+
+
+class TimedQueuePool(QueuePool):
+    """记录取得连接的等待时间，包括连接池已满时的排队和新建连接"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+            POOL_WAIT.observe((), wait)
+            add_timing("pool", wait)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None or not has_request_context():
+        return
+    timings = g.get("request_timings")
+    if timings is not None:
+        timings["db"] += time.perf_counter() - started
+        g.db_queries += 1
+
+
+def _route_labels():
+    rule = request.url_rule
+    return (
+        request.blueprint or "",
+        rule.rule if rule is not None else "<unmatched>",
+        request.method,
+    )
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.request_timings = dict.fromkeys(TIMING_NAMES, 0.0)
+    g.db_queries = 0
+    g.metrics_labels = _route_labels()
+    REQUESTS_IN_FLIGHT.add(g.metrics_labels, 1)
+
+
+def _after_request(response):
+    started = g.get("request_started")
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    labels = g.metrics_labels
+    timings = g.request_timings
+
+    REQUEST_DURATION.observe((*labels, str(response.status_code)), duration)
+    if g.db_queries:
+        DB_QUERIES.add(labels, g.db_queries)
+        DB_SECONDS.add(labels, timings["db"])
+
+    if current_app.config["SERVER_TIMING_ENABLED"]:
+        parts = [f'db;dur={timings["db"] * 1000:.2f};desc="{g.db_queries} queries"']
+        parts.extend(
+            f"{name};dur={timings[name] * 1000:.2f}"
+            for name in TIMING_NAMES[1:]
+            if timings[name]
+        )
+        parts.append(f"total;dur={duration * 1000:.2f}")
+        response.headers["Server-Timing"] = ", ".join(parts)
+
+    if request_logger.isEnabledFor(logging.INFO):
+        request_logger.info(
+            json.dumps(
+                {
+                    "method": labels[2],
+                    "route": labels[1],
+                    "status": response.status_code,
+                    "user_id": g.get("current_user_id"),
+                    "duration_ms": round(duration * 1000, 2),
+                    "db_queries": g.db_queries,
+                    **{
+                        f"{name}_ms": round(timings[name] * 1000, 2)
+                        for name in TIMING_NAMES
+                    },
+                },
+                ensure_ascii=False,
+            )
+        )
+    return response
+
+
+def _teardown_request(exc):
+    labels = g.pop("metrics_labels", None)
+    if labels is not None:
+        REQUESTS_IN_FLIGHT.add(labels, -1)
+
+
+def render(engines, mail_metrics):
+    """生成 Prometheus 文本格式的全部指标"""
+    lines = []
+    for metric in (
+        REQUEST_DURATION,
+        REQUESTS_IN_FLIGHT,
+        DB_QUERIES,
+        DB_SECONDS,
+        POOL_WAIT,
+    ):
+        lines.extend(metric.render())
+
+    # 连接池和发信队列的当前状态在抓取时读取
+    pool_gauges = {
+        "manage_db_pool_checked_out": ("已借出的连接数", "checkedout"),
+        "manage_db_pool_size": ("连接池大小", "size"),
+    }
+    for name, (description, method) in pool_gauges.items():
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for key, engine in engines.items():
+            if isinstance(engine.pool, QueuePool):
+                label = _format_labels(("bind",), (key or "default",))
+                lines.append(f"{name}{label} {getattr(engine.pool, method)()}")
+
+    for key, value in mail_metrics.items():
+        if key in MAIL_COUNTERS:
+            name, kind = f"manage_mail_{key}_total", "counter"
+        else:
+            name, kind = f"manage_mail_{key}", "gauge"
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    if not app.config["METRICS_ENABLED"]:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
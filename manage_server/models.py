@@ -1,7 +1,7 @@
 from extensions import db
 from datetime import datetime, timedelta
 from enum import Enum
-from werkzeug.security import generate_password_hash, check_password_hash
+from hashing import hash_password, verify_password, needs_rehash
 
 
 class UserRoles(Enum):
@@ -60,10 +60,13 @@ class User(db.Model):
         return f"<User {self.username}>"
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)  # 在哈希进程池中计算
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)  # 验证密码
+        return verify_password(self.password_hash, password)  # 验证密码
+
+    def password_needs_rehash(self):
+        return needs_rehash(self.password_hash)  # 哈希策略是否已变更
 
     def to_dict(self):
         birthday = self.birthday.strftime("%Y-%m-%d") if self.birthday else None
@@ -92,6 +95,10 @@ class User(db.Model):
 
 class Project(db.Model):
     __tablename__ = "projects"  # 数据库表名
+    __table_args__ = (
+        # 列表按负责人过滤并排除已归档项目
+        db.Index("ix_projects_manager_id_status", "manager_id", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)  # 主键
     name = db.Column(db.String(200), nullable=False)  # 项目名称
@@ -141,6 +148,7 @@ class Project(db.Model):
 
 class Process(db.Model):
     __tablename__ = "process"  # 数据库表名
+    __table_args__ = (db.Index("ix_process_project_id", "project_id"),)
 
     id = db.Column(db.Integer, primary_key=True)  # 主键
     project_id = db.Column(
@@ -172,40 +180,47 @@ class Process(db.Model):
         }
 
 
-class ArchivedProject(db.Model):
-    __tablename__ = "archived_projects"  # 数据库表名
+class ProjectArchive(db.Model):
+    """
+    归档层的项目，主键沿用原项目 ID
+    项目归档时立即写入，任务和评论由后台分批移入 task_archive、comment_archive，
+    全部移完后再删除 projects 中的原记录
+    """
+
+    __tablename__ = "project_archive"  # 数据库表名
+    __table_args__ = (
+        db.Index(
+            "ix_project_archive_manager_id_archived_date",
+            "manager_id",
+            "archived_date",
+        ),
+    )
 
-    id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(
-        db.Integer, db.ForeignKey("projects.id"), nullable=False
-    )  # 外键，设置为不可为空
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 原项目 ID
+    name = db.Column(db.String(200), nullable=False)  # 项目名称
+    description = db.Column(db.Text, nullable=True)  # 项目描述
+    start_date = db.Column(db.DateTime, nullable=False)  # 开始时间
+    end_date = db.Column(db.DateTime, nullable=False)  # 结束时间
+    priority = db.Column(db.Enum(ProjectPriority), nullable=True)  # 优先级
+    manager_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), nullable=False
+    )  # 外键
+    completion_rate = db.Column(db.Float, nullable=False, default=0.0)  # 归档时的完成率
     archived_date = db.Column(
-        db.DateTime, nullable=False, default=datetime.utcnow
-    )  # 归档时间，默认值为当前时间
-
-    project = db.relationship(
-        "Project", backref="archived_projects", lazy=True
-    )  # 反向关系，添加 lazy 加载
-
-    def to_dict(self):
-        manager_name = (
-            self.project.manager.name if self.project.manager else None
-        )  # 根据 manager_id 获取 name
-        return {
-            "id": self.id,
-            "project_id": self.project_id,
-            "manager_name": manager_name,
-            "project_name": self.project.name,
-            "archived_date": (
-                self.archived_date.strftime("%Y-%m-%d %H:%M:%S")
-                if self.archived_date
-                else None
-            ),
-        }
+        db.DateTime,
+        nullable=False,
+        default=lambda: datetime.utcnow() + timedelta(hours=8),
+    )  # 归档时间
 
 
 class Task(db.Model):
     __tablename__ = "tasks"  # 数据库表名
+    __table_args__ = (
+        # 成员任务列表按截止时间排序
+        db.Index("ix_tasks_assignee_id_due_date", "assignee_id", "due_date"),
+        # 按项目关联查询任务并按状态统计
+        db.Index("ix_tasks_project_id_status", "project_id", "status"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)  # 主键
     title = db.Column(db.String(200), nullable=False)  # 任务名称
@@ -224,7 +239,12 @@ class Task(db.Model):
 
     assignee = db.relationship("User", backref="tasks")  # 反向关系
     project = db.relationship("Project", backref="tasks", lazy=True)  # 修改反向关系名称
-    attachmentUrl = db.Column(db.String(255), nullable=True)  # 附件路径
+    attachmentUrl = db.Column(
+        db.String(255), nullable=True
+    )  # 附件地址，格式为 "摘要/原始文件名"
+    comment_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )  # 评论数，提交评论时加一
 
     def to_dict(self):
         due_date = (
@@ -243,11 +263,35 @@ class Task(db.Model):
             "project_manager_name": self.project.manager.name,
             "attachmentUrl": self.attachmentUrl,
             "status": self.status.value,
+            "comment_count": self.comment_count,
         }
 
 
+class Attachment(db.Model):
+    __tablename__ = "attachments"  # 数据库表名
+
+    digest = db.Column(db.String(64), primary_key=True)  # 文件内容的 SHA-256 摘要
+    size = db.Column(db.BigInteger, nullable=False)  # 文件大小（字节）
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # 引用计数
+    created_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=lambda: datetime.utcnow() + timedelta(hours=8),
+    )  # 首次上传时间
+
+
+class EntityVersion(db.Model):
+    __tablename__ = "entity_versions"  # 数据库表名
+
+    name = db.Column(db.String(64), primary_key=True)  # 数据表名
+    version = db.Column(db.BigInteger, nullable=False, default=0)  # 每次写入后加一
+
+
 class Comment(db.Model):
     __tablename__ = "comments"  # 数据库表名
+    __table_args__ = (
+        db.Index("ix_comments_task_id_created_at", "task_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)  # 评论的唯一标识符
     task_id = db.Column(
@@ -274,3 +318,33 @@ class Comment(db.Model):
             "content": self.content,
             "created_at": created_at,
         }
+
+
+class TaskArchive(db.Model):
+    __tablename__ = "task_archive"  # 数据库表名，字段与 tasks 一致
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 原任务 ID
+    title = db.Column(db.String(200), nullable=False)  # 任务名称
+    description = db.Column(db.Text, nullable=True)  # 任务描述
+    due_date = db.Column(db.DateTime, nullable=False)  # 截止时间
+    assignee_id = db.Column(db.Integer, nullable=False)  # 负责人 ID
+    project_id = db.Column(
+        db.Integer, db.ForeignKey("project_archive.id"), nullable=False, index=True
+    )  # 外键，指向归档层的项目
+    status = db.Column(db.Enum(TaskStatus), nullable=False)
+    attachmentUrl = db.Column(db.String(255), nullable=True)  # 附件地址
+    comment_count = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )  # 评论数
+
+
+class CommentArchive(db.Model):
+    __tablename__ = "comment_archive"  # 数据库表名，字段与 comments 一致
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # 原评论 ID
+    task_id = db.Column(
+        db.Integer, db.ForeignKey("task_archive.id"), nullable=False, index=True
+    )  # 外键，指向归档层的任务
+    author_name = db.Column(db.String(80), nullable=False)  # 评论者的名字
+    content = db.Column(db.Text, nullable=False)  # 评论内容
+    created_at = db.Column(db.DateTime, nullable=False)  # 评论创建时间
@@ -0,0 +1,214 @@
+# 开发和测试环境的查询检查：统计每个请求中相同形状 SQL 的重复次数（懒加载造成的 N+1）、
+# 超过时间预算的慢查询以及接口的查询数预算，发现问题时记录日志和触发查询的代码位置
+# QUERY_GUARD_MODE=raise 或 TESTING 时，N+1 和超出预算会抛出 QueryGuardError，让测试失败
+
+import atexit
+import inspect
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("manage.query_guard")
+
+_FILE = os.path.abspath(__file__)
+_ROOT = os.path.dirname(_FILE) + os.sep
+_PLACEHOLDERS = re.compile(
+    r"\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)"
+)
+_SPACES = re.compile(r"\s+")
+
+_report = {}
+_report_lock = threading.Lock()
+_listening = False
+
+
+class QueryGuardError(Exception):
+    """请求出现 N+1 查询或超出查询预算"""
+
+
+def query_budget(limit):
+    """声明视图每个请求最多执行的 SQL 条数，QUERY_BUDGETS 中的配置优先"""
+
+    def decorator(view):
+        view.query_budget = limit
+        return view
+
+    return decorator
+
+
+def _shape(statement):
+    # IN 列表展开后参数个数不同，统一成一个占位符
+    return _SPACES.sub(" ", _PLACEHOLDERS.sub("(?)", statement)).strip()
+
+
+def _location(depth=2):
+    """
+    返回发起查询的项目代码位置，最多 depth 层
+    如 models.py:260 to_dict <- views/task_views.py:85 get_task_by_id
+    """
+    frames = []
+    frame = sys._getframe(1)
+    while frame is not None and len(frames) < depth:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(_ROOT)
+            and filename != _FILE
+            and "site-packages" not in filename
+        ):
+            frames.append(
+                f"{filename[len(_ROOT):]}:{frame.f_lineno} {frame.f_code.co_name}"
+            )
+        frame = frame.f_back
+    return " <- ".join(frames) or "<unknown>"
+
+
+def _state():
+    if not has_request_context():
+        return None
+    return g.get("query_guard")
+
+
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    state = _state()
+    if state is None or context is None:
+        return
+    context._guard_started = time.perf_counter()
+    shape = _shape(statement)
+    state["count"] += 1
+    state["shapes"][shape] += 1
+    # 第二次出现时记录位置，N+1 每次都来自同一行代码
+    if state["shapes"][shape] == 2:
+        state["locations"][shape] = _location()
+
+
+def _finish_query(conn, cursor, statement, parameters, context, executemany):
+    state = _state()
+    started = getattr(context, "_guard_started", None)
+    if state is None or started is None:
+        return
+    elapsed = time.perf_counter() - started
+    if elapsed > current_app.config["SLOW_QUERY_SECONDS"]:
+        state["slow"].append((_shape(statement), elapsed, _location()))
+
+
+def _budget():
+    """返回 (预算, 视图定义位置)，没有预算时为 (None, None)"""
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None:
+        return None, None
+    code = inspect.unwrap(view).__code__
+    location = (
+        f"{code.co_filename.replace(_ROOT, '')}:{code.co_firstlineno} {code.co_name}"
+    )
+    budgets = current_app.extensions["query_guard"]
+    return budgets.get(request.endpoint, getattr(view, "query_budget", None)), location
+
+
+def _record(kind, location, statement, value):
+    key = (kind, request.endpoint, location)
+    with _report_lock:
+        entry = _report.get(key)
+        if entry is None:
+            entry = _report[key] = {
+                "kind": kind,
+                "endpoint": request.endpoint,
+                "route": request.url_rule.rule if request.url_rule else request.path,
+                "location": location,
+                "statement": statement[:300],
+                "requests": 0,
+                "max": 0,
+            }
+        entry["requests"] += 1
+        entry["max"] = max(entry["max"], value)
+
+
+def _before_request():
+    g.query_guard = {"count": 0, "shapes": Counter(), "locations": {}, "slow": []}
+
+
+def _after_request(response):
+    state = g.pop("query_guard", None)
+    if state is None:
+        return response
+
+    problems = []
+    threshold = current_app.config["QUERY_REPEAT_THRESHOLD"]
+    for shape, count in state["shapes"].items():
+        if count >= threshold:
+            location = state["locations"].get(shape, "<unknown>")
+            _record("n+1", location, shape, count)
+            problems.append(
+                f"相同查询执行了 {count} 次，位置 {location}: {shape[:120]}"
+            )
+
+    budget, location = _budget()
+    if budget is not None and state["count"] > budget:
+        _record("budget", location, f"预算 {budget}", state["count"])
+        problems.append(f"执行了 {state['count']} 条 SQL，超出预算 {budget}")
+
+    for shape, elapsed, location in state["slow"]:
+        _record("slow", location, shape, round(elapsed * 1000, 2))
+        logger.warning(
+            "%s %s 慢查询 %.1f ms，位置 %s: %s",
+            request.method,
+            request.path,
+            elapsed * 1000,
+            location,
+            shape[:200],
+        )
+
+    if problems:
+        message = (
+            f"{request.method} {request.path}（{request.endpoint}）: "
+            + "；".join(problems)
+        )
+        logger.warning(message)
+        if current_app.config["QUERY_GUARD_MODE"] == "raise" or current_app.testing:
+            raise QueryGuardError(message)
+    return response
+
+
+def report():
+    """返回检查到的问题，按出现的请求数从多到少排列"""
+    with _report_lock:
+        entries = [dict(entry) for entry in _report.values()]
+    return sorted(entries, key=lambda entry: (-entry["requests"], entry["endpoint"]))
+
+
+def write_report(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report(), f, ensure_ascii=False, indent=2)
+
+
+def _parse_budgets(value):
+    budgets = {}
+    for item in (value or "").split(","):
+        endpoint, _, limit = item.strip().partition("=")
+        if endpoint and limit:
+            budgets[endpoint] = int(limit)
+    return budgets
+
+
+def init_app(app):
+    """QUERY_GUARD_ENABLED、调试模式或测试模式下启用，生产环境不注册任何钩子"""
+    global _listening
+    if not (app.config["QUERY_GUARD_ENABLED"] or app.debug or app.testing):
+        return
+    app.extensions["query_guard"] = _parse_budgets(app.config["QUERY_BUDGETS"])
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    if not _listening:
+        _listening = True
+        event.listen(Engine, "before_cursor_execute", _start_query)
+        event.listen(Engine, "after_cursor_execute", _finish_query)
+        if app.config["QUERY_GUARD_REPORT"]:
+            atexit.register(write_report, app.config["QUERY_GUARD_REPORT"])
@@ -0,0 +1,239 @@
+# 登录和验证码接口的限流：按 IP 和账号分别使用令牌桶，在视图执行前检查，
+# 被拒绝的请求直接返回 429 和 Retry-After，不查询数据库也不计算密码哈希
+# 默认使用 SQLite 文件保存令牌桶，同一台机器上预先 fork 的多个 worker 共享限额
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache, wraps
+
+from flask import current_app, jsonify, request
+
+from concurrency import SqlitePool
+
+logger = logging.getLogger("manage.ratelimit")
+
+PRUNE_INTERVAL = 60  # 清理已回满令牌桶的间隔秒数
+
+
+@lru_cache(maxsize=64)
+def parse_rule(value):
+    """解析 "次数/秒数" 形式的限额，返回 (容量, 每秒补充的令牌数)，空值或 0 表示不限制"""
+    if not value:
+        return None
+    count, _, seconds = value.partition("/")
+    count, seconds = int(count), float(seconds or 1)
+    if count <= 0:
+        return None
+    return count, count / seconds
+
+
+def take(tokens, updated, now, capacity, rate):
+    """
+    从令牌桶取一个令牌，tokens 为 None 表示新桶
+    返回 (剩余令牌, 需要等待的秒数, 桶回满的时间)，等待秒数为 0 表示放行
+    """
+    if tokens is None:
+        tokens = capacity
+    else:
+        tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        tokens -= 1
+        retry_after = 0.0
+    else:
+        retry_after = (1 - tokens) / rate
+    return tokens, retry_after, now + (capacity - tokens) / rate
+
+
+class MemoryLimiter:
+    """进程内的令牌桶，条目数超过上限时淘汰最久未访问的桶，只适用于单进程部署"""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> (令牌, 更新时间, 回满时间)
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def hit(self, key, capacity, rate):
+        now = time.time()
+        with self._lock:
+            tokens, updated, _ = self.buckets.get(key, (None, now, now))
+            tokens, retry_after, expires = take(tokens, updated, now, capacity, rate)
+            self.buckets[key] = (tokens, now, expires)
+            self.buckets.move_to_end(key)
+            if now - self._pruned_at > PRUNE_INTERVAL:
+                self._pruned_at = now
+                for stale in [k for k, v in self.buckets.items() if v[2] <= now]:
+                    del self.buckets[stale]
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        return retry_after
+
+
+class SqliteLimiter:
+    """
+    SQLite 文件中的令牌桶，同一台机器上的多个进程共享
+    每次取令牌在 BEGIN IMMEDIATE 事务中读写，并发的 worker 不会重复使用同一个令牌
+    读写通过连接池在原生线程中执行，gevent 模式下等待文件锁不阻塞事件循环
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pool = SqlitePool(self._connect)
+        self._pruned_at = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._pool.run(self._create_table)
+
+    def _connect(self):
+        # 自行管理事务；限流数据丢失无害，不等待落盘
+        conn = sqlite3.connect(
+            self.path, timeout=5, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=OFF")
+        return conn
+
+    @staticmethod
+    def _create_table(conn):
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, "
+            "tokens REAL NOT NULL, updated REAL NOT NULL, expires REAL NOT NULL) "
+            "WITHOUT ROWID"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_rate_buckets_expires "
+            "ON rate_buckets (expires)"
+        )
+
+    def hit(self, key, capacity, rate):
+        now = time.time()
+        # 已回满的桶与不存在的桶等价，定期删除，文件大小只取决于最近活跃的 key
+        prune = now - self._pruned_at > PRUNE_INTERVAL
+        if prune:
+            self._pruned_at = now
+        return self._pool.run(self._hit, key, capacity, rate, now, prune)
+
+    @staticmethod
+    def _hit(conn, key, capacity, rate, now, prune):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+            ).fetchone()
+            tokens, updated = row if row is not None else (None, now)
+            tokens, retry_after, expires = take(tokens, updated, now, capacity, rate)
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated, expires) "
+                "VALUES (?, ?, ?, ?)",
+                (key, tokens, now, expires),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        if prune:
+            conn.execute("DELETE FROM rate_buckets WHERE expires <= ?", (now,))
+        return retry_after
+
+
+RATE_LIMIT_BACKENDS = {"memory": MemoryLimiter, "sqlite": SqliteLimiter}
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                config = current_app.config
+                backend = RATE_LIMIT_BACKENDS[config["RATE_LIMIT_BACKEND"]]
+                _limiter = (
+                    backend(config["RATE_LIMIT_PATH"])
+                    if backend is SqliteLimiter
+                    else backend(config["RATE_LIMIT_MAX_KEYS"])
+                )
+    return _limiter
+
+
+def client_ip():
+    """
+    限流使用的客户端地址：部署在 RATE_LIMIT_TRUSTED_PROXIES 层反向代理之后时，
+    取 X-Forwarded-For 中倒数第 N 个地址，由最外层的代理写入，客户端无法伪造
+    头中的地址少于代理层数（请求没有经过代理）时使用连接地址
+    """
+    trusted = current_app.config["RATE_LIMIT_TRUSTED_PROXIES"]
+    if trusted > 0:
+        forwarded = [
+            address.strip()
+            for address in request.headers.get("X-Forwarded-For", "").split(",")
+            if address.strip()
+        ]
+        if len(forwarded) >= trusted:
+            return forwarded[-trusted]
+    return request.remote_addr
+
+
+def check(name, account_field=None):
+    """
+    按 RATE_LIMIT_<NAME>_IP 和 RATE_LIMIT_<NAME>_ACCOUNT 检查当前请求
+    账号从 JSON 请求体的 account_field 字段读取，返回需要等待的秒数，0 表示放行
+    """
+    config = current_app.config
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    keys = [(f"{name}:ip:{client_ip()}", config.get(f"{prefix}_IP"))]
+    if account_field:
+        data = request.get_json(silent=True)
+        account = data.get(account_field) if isinstance(data, dict) else None
+        if isinstance(account, str) and account.strip():
+            keys.append(
+                (
+                    f"{name}:account:{account.strip().lower()}",
+                    config.get(f"{prefix}_ACCOUNT"),
+                )
+            )
+
+    limiter = get_limiter()
+    retry_after = 0.0
+    for key, value in keys:
+        rule = parse_rule(value)
+        if rule is None:
+            continue
+        try:
+            retry_after = max(retry_after, limiter.hit(key, *rule))
+        except sqlite3.Error:
+            # 限流存储不可用时放行，不因此拒绝正常登录
+            logger.warning("限流存储不可用，放行请求: %s", key, exc_info=True)
+    return retry_after
+
+
+def rate_limit(name, account_field=None):
+    """
+    视图执行前按 IP 和账号限流，超出限额时返回 429，Retry-After 为需要等待的秒数
+    RATE_LIMIT_ENABLED=False 时不检查
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_app.config["RATE_LIMIT_ENABLED"]:
+                retry_after = check(name, account_field)
+                if retry_after:
+                    seconds = max(1, math.ceil(retry_after))
+                    response = jsonify(
+                        {"error": "请求过于频繁", "message": f"请在 {seconds} 秒后重试"}
+                    )
+                    response.status_code = 429
+                    response.headers["Retry-After"] = str(seconds)
+                    return response
+            return view(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,146 @@
+# 读写分离：GET 请求的查询发往只读副本，写请求、flush 和后台任务使用主库
+# 客户端写入后的一段时间内，它的读请求也走主库，避免读到复制延迟前的旧数据；
+# 截止时间放在签名的 cookie 中，请求落到任何进程都能判断
+
+import math
+import random
+
+from flask import current_app, g, has_request_context, request
+from itsdangerous import BadSignature, TimestampSigner
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Select, event
+from sqlalchemy.engine import make_url
+
+from metrics import TimedQueuePool
+
+REPLICA_PREFIX = "replica_"
+READ_METHODS = ("GET", "HEAD")
+STICKY_COOKIE = "db_sticky"
+
+
+def replica_binds(uris):
+    """把逗号分隔的副本地址转换为 SQLALCHEMY_BINDS 的配置"""
+    return {
+        f"{REPLICA_PREFIX}{index}": uri.strip()
+        for index, uri in enumerate(uris.split(","))
+        if uri.strip()
+    }
+
+
+def engine_options(config):
+    """
+    连接池参数：gevent 模式使用 ASYNC_DB_*，其它情况使用 DB_POOL_*
+    内存 SQLite 使用单连接的 StaticPool，不设置连接池大小
+    其它情况使用记录取连接等待时间的 QueuePool
+    """
+    options = {
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+    }
+    url = make_url(config["SQLALCHEMY_DATABASE_URI"])
+    if not (
+        url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+    ):
+        prefix = "ASYNC_DB" if config["SERVER_MODE"] == "gevent" else "DB"
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=config[f"{prefix}_POOL_SIZE"],
+            max_overflow=config[f"{prefix}_MAX_OVERFLOW"],
+            pool_timeout=config[f"{prefix}_POOL_TIMEOUT"],
+        )
+    return {**options, **config.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+
+
+def _sticky_signer():
+    return TimestampSigner(current_app.secret_key, salt="replica-sticky")
+
+
+def _is_sticky():
+    """请求带有未过期的粘滞 cookie 时返回 True，cookie 中的签名时间即写入时间"""
+    value = request.cookies.get(STICKY_COOKIE)
+    seconds = current_app.config["REPLICA_STICKY_SECONDS"]
+    if not value or seconds <= 0:
+        return False
+    try:
+        _sticky_signer().unsign(value, max_age=seconds)
+    except BadSignature:
+        return False
+    return True
+
+
+def _set_sticky_cookie(response):
+    seconds = current_app.config["REPLICA_STICKY_SECONDS"]
+    if g.get("db_committed_write") and seconds > 0:
+        response.set_cookie(
+            STICKY_COOKIE,
+            _sticky_signer().sign("1").decode(),
+            max_age=math.ceil(seconds),
+            httponly=True,
+            samesite="Lax",
+        )
+    return response
+
+
+class RoutingSession(Session):
+    """按请求方法选择主库或副本的会话，同一请求固定使用一个副本"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _reads_from_replica(clause):
+            replica = _request_replica(self._db.engines)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _reads_from_replica(clause):
+    if not has_request_context() or request.method not in READ_METHODS:
+        return False
+    # 只有 SELECT 发往副本，session.connection() 等没有语句的调用使用主库
+    if not isinstance(clause, Select) or g.get("db_wrote"):
+        return False
+    return not _is_sticky()
+
+
+def _request_replica(engines):
+    if "db_replica" not in g:
+        keys = [key for key in engines if key and key.startswith(REPLICA_PREFIX)]
+        g.db_replica = random.choice(keys) if keys else None
+    return engines[g.db_replica] if g.db_replica else None
+
+
+def _remember_write(session):
+    session.info["wrote"] = True
+    if has_request_context():
+        # 本次请求之后的查询也走主库
+        g.db_wrote = True
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_flush(session, flush_context):
+    _remember_write(session)
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _remember_bulk_write(orm_execute_state):
+    if not orm_execute_state.is_select:
+        _remember_write(orm_execute_state.session)
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _stick_writer(session):
+    if session.in_nested_transaction():
+        # 释放保存点也会触发 after_commit，等外层事务提交
+        return
+    if session.info.pop("wrote", False) and has_request_context():
+        # 响应中写入粘滞 cookie，不要求登录，未登录的写接口同样生效
+        g.db_committed_write = True
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_write(session):
+    if not session.in_nested_transaction():
+        session.info.pop("wrote", None)
+
+
+def init_app(app):
+    app.after_request(_set_sticky_cookie)
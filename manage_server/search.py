@@ -0,0 +1,655 @@
+# 全文搜索：项目名称/描述、任务标题/描述和评论内容的倒排索引
+# 中文按相邻两字切分（bigram），英文和数字按整词切分；写入数据库后通过 SQLAlchemy 事件增量更新索引
+
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import defaultdict, namedtuple
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from concurrency import SqlitePool
+from extensions import db
+from models import Comment, Project, ProjectStatus, Task
+
+KINDS = {Project: "project", Task: "task", Comment: "comment"}
+KIND_CODES = {"project": 1, "task": 2, "comment": 3}
+LOAD_BATCH_SIZE = 500
+REBUILD_BATCH_SIZE = 5000  # 重建时每批写入索引的记录数
+TITLE_LENGTH = 100  # 评论以内容开头作为结果标题
+MAX_TOTAL = 10000  # 匹配总数最多统计到这个值
+INDEX_VERSION = "2"  # 切词方式变化时递增，旧版本的 FTS5 索引文件视为未构建，自动重建
+
+# 一条索引文档，key 为 (类型, ID)；project_id 和 assignee_id 用于权限过滤
+Document = namedtuple(
+    "Document", ["key", "title", "tokens", "project_id", "assignee_id"]
+)
+
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"  # 中日韩统一表意文字
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+_CJK_PATTERN = re.compile(rf"[{_CJK}]")
+
+
+def tokenize(text, unigrams=False):
+    """
+    中文连续片段切成两字词，单独的汉字保留为一个词；其它文字按整词小写
+    unigrams 为 True 时（生成索引文档）另外保留片段中的每个汉字，单字查询也能匹配
+    """
+    tokens = []
+    for run in _TOKEN_PATTERN.findall((text or "").lower()):
+        if _CJK_PATTERN.match(run) and len(run) > 1:
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+            if unigrams:
+                tokens.extend(run)
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def _rowid(key):
+    # 索引中的行号，ID 越大越新
+    return key[1] * 4 + KIND_CODES[key[0]]
+
+
+class MemoryIndex:
+    """
+    纯 Python 倒排索引，按 BM25 打分
+    只在当前进程内有效，适合测试和单进程部署，启动后第一次搜索时从数据库构建
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.ready = False
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.postings = defaultdict(dict)  # 词 -> {key: 词频}
+            self.docs = {}  # key -> (标题, 项目 ID, 负责人 ID, 文档长度, 词集合)
+            self.total_length = 0
+
+    def count(self):
+        return len(self.docs)
+
+    def mark_ready(self):
+        self.ready = True
+
+    def apply(self, upserts, deletes):
+        with self._lock:
+            for key in deletes:
+                self._remove(key)
+            for doc in upserts:
+                self._remove(doc.key)
+                frequencies = defaultdict(int)
+                for token in doc.tokens:
+                    frequencies[token] += 1
+                for token, frequency in frequencies.items():
+                    self.postings[token][doc.key] = frequency
+                self.docs[doc.key] = (
+                    doc.title,
+                    doc.project_id,
+                    doc.assignee_id,
+                    len(doc.tokens),
+                    tuple(frequencies),
+                )
+                self.total_length += len(doc.tokens)
+
+    def _remove(self, key):
+        entry = self.docs.pop(key, None)
+        if entry is None:
+            return
+        self.total_length -= entry[3]
+        for token in entry[4]:
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self.postings[token]
+
+    def search(self, tokens, kinds, visible, limit, offset):
+        with self._lock:
+            postings = [self.postings.get(token) for token in tokens]
+            if not postings or not all(postings):
+                return 0, []
+            # 从最短的倒排表开始求交集
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+                if not candidates:
+                    return 0, []
+
+            doc_count = len(self.docs)
+            average_length = self.total_length / doc_count if doc_count else 0
+            weights = [
+                math.log(1 + (doc_count - len(p) + 0.5) / (len(p) + 0.5))
+                for p in postings
+            ]
+            visible_keys = []
+            for key in candidates:
+                if kinds and key[0] not in kinds:
+                    continue
+                if visible is not None:
+                    project_id, assignee_id = self.docs[key][1:3]
+                    if not (project_id in visible[0] or assignee_id == visible[1]):
+                        continue
+                visible_keys.append(key)
+            # 与 FTS5 后端一致，只对最新的 MAX_TOTAL 条匹配打分
+            if len(visible_keys) > MAX_TOTAL:
+                visible_keys = heapq.nlargest(MAX_TOTAL, visible_keys, key=_rowid)
+
+            scored = []
+            for key in visible_keys:
+                title, project_id, _, length, _ = self.docs[key]
+                norm = self.K1 * (1 - self.B + self.B * length / average_length)
+                score = 0.0
+                for weight, posting in zip(weights, postings):
+                    frequency = posting[key]
+                    score += weight * frequency * (self.K1 + 1) / (frequency + norm)
+                scored.append((score, key, title, project_id))
+
+        top = heapq.nsmallest(
+            offset + limit, scored, key=lambda item: (-item[0], _rowid(item[1]))
+        )
+        return len(scored), top[offset:]
+
+
+class SqliteFtsIndex:
+    """
+    SQLite FTS5 索引文件，同一台机器上的多个进程共享
+    写入前已经按 tokenize 切好词，FTS5 只按空格分词，两个后端的匹配结果一致
+    读写通过连接池在原生线程中执行，gevent 模式下不阻塞事件循环
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pool = SqlitePool(self._connect)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._pool.run(self._create_tables)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _create_tables(conn):
+        with conn:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS search_docs USING fts5("
+                "body, scope, title UNINDEXED, kind UNINDEXED, doc_id UNINDEXED, "
+                "project_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 0')"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_meta "
+                "(name TEXT PRIMARY KEY, value TEXT)"
+            )
+
+    @staticmethod
+    def _scope(doc):
+        # 类型、项目和负责人也写成词，过滤条件和关键词一起走倒排索引
+        scope = f"k{doc.key[0]} p{doc.project_id}"
+        return f"{scope} u{doc.assignee_id}" if doc.assignee_id else scope
+
+    @property
+    def ready(self):
+        return self._pool.run(self._ready)
+
+    @staticmethod
+    def _ready(conn):
+        row = conn.execute(
+            "SELECT value FROM search_meta WHERE name = 'ready'"
+        ).fetchone()
+        return row is not None and row[0] == INDEX_VERSION
+
+    def mark_ready(self):
+        self._pool.run(self._mark_ready)
+
+    @staticmethod
+    def _mark_ready(conn):
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_meta (name, value) VALUES ('ready', ?)",
+                (INDEX_VERSION,),
+            )
+
+    def clear(self):
+        self._pool.run(self._clear)
+
+    @staticmethod
+    def _clear(conn):
+        with conn:
+            conn.execute("DELETE FROM search_docs")
+            conn.execute("DELETE FROM search_meta")
+
+    def count(self):
+        return self._pool.run(self._count)
+
+    @staticmethod
+    def _count(conn):
+        return conn.execute("SELECT count(*) FROM search_docs").fetchone()[0]
+
+    def apply(self, upserts, deletes):
+        deleted = [(_rowid(key),) for key in (*deletes, *(d.key for d in upserts))]
+        inserted = [
+            (
+                _rowid(doc.key),
+                " ".join(doc.tokens),
+                self._scope(doc),
+                doc.title,
+                doc.key[0],
+                doc.key[1],
+                doc.project_id,
+            )
+            for doc in upserts
+        ]
+        self._pool.run(self._apply, deleted, inserted)
+
+    @staticmethod
+    def _apply(conn, deleted, inserted):
+        with conn:
+            conn.executemany("DELETE FROM search_docs WHERE rowid = ?", deleted)
+            conn.executemany(
+                "INSERT INTO search_docs (rowid, body, scope, title, kind, doc_id, "
+                "project_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                inserted,
+            )
+
+    def search(self, tokens, kinds, visible, limit, offset):
+        phrases = " ".join('"{}"'.format(token.replace('"', '""')) for token in tokens)
+        match = f"body : ({phrases})"
+        if kinds:
+            match += " AND scope : ({})".format(
+                " OR ".join(f"k{kind}" for kind in sorted(kinds))
+            )
+        if visible is not None:
+            project_ids, user_id = visible
+            terms = [f"p{project_id}" for project_id in sorted(project_ids)]
+            match += " AND scope : ({})".format(" OR ".join([*terms, f"u{user_id}"]))
+
+        total, rows = self._pool.run(self._search, match, limit, offset)
+        # FTS5 的 bm25 越小越相关，取反后与内存索引一致
+        return total, [
+            (-score, (kind, doc_id), title, project_id)
+            for score, kind, doc_id, title, project_id in rows
+        ]
+
+    @staticmethod
+    def _search(conn, match, limit, offset):
+        total = conn.execute(
+            "SELECT count(*) FROM (SELECT 1 FROM search_docs "
+            "WHERE search_docs MATCH ? LIMIT ?)",
+            (match, MAX_TOTAL),
+        ).fetchone()[0]
+        # 只对最新的 MAX_TOTAL 条匹配计算 BM25，常用词不必给几十万条结果打分
+        rows = conn.execute(
+            "SELECT score, kind, doc_id, title, project_id FROM ("
+            "SELECT rowid, bm25(search_docs, 1.0, 0.0) AS score, kind, doc_id, "
+            "title, project_id FROM search_docs WHERE search_docs MATCH ? "
+            "ORDER BY rowid DESC LIMIT ?) ORDER BY score, rowid LIMIT ? OFFSET ?",
+            (match, MAX_TOTAL, limit, offset),
+        ).fetchall()
+        return total, rows
+
+
+SEARCH_BACKENDS = {"memory": MemoryIndex, "sqlite": SqliteFtsIndex}
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                config = current_app.config
+                backend = SEARCH_BACKENDS[config["SEARCH_BACKEND"]]
+                _index = (
+                    backend(config["SEARCH_INDEX_PATH"])
+                    if backend is SqliteFtsIndex
+                    else backend()
+                )
+    return _index
+
+
+def _project_documents(connection, ids):
+    rows = connection.execute(
+        select(Project.id, Project.name, Project.description, Project.status).where(
+            Project.id.in_(ids)
+        )
+    )
+    for id, name, description, status in rows:
+        if status is not ProjectStatus.ARCHIVED:
+            yield Document(
+                ("project", id), name, tokenize(f"{name} {description or ''}", unigrams=True), id, None
+            )
+
+
+def _task_documents(connection, ids):
+    rows = connection.execute(
+        select(
+            Task.id,
+            Task.title,
+            Task.description,
+            Task.project_id,
+            Task.assignee_id,
+            Project.status,
+        )
+        .join(Project, Task.project_id == Project.id)
+        .where(Task.id.in_(ids))
+    )
+    for id, title, description, project_id, assignee_id, status in rows:
+        if status is not ProjectStatus.ARCHIVED:
+            yield Document(
+                ("task", id),
+                title,
+                tokenize(f"{title} {description or ''}", unigrams=True),
+                project_id,
+                assignee_id,
+            )
+
+
+def _comment_documents(connection, ids):
+    rows = connection.execute(
+        select(
+            Comment.id,
+            Comment.content,
+            Task.project_id,
+            Task.assignee_id,
+            Project.status,
+        )
+        .join(Task, Comment.task_id == Task.id)
+        .join(Project, Task.project_id == Project.id)
+        .where(Comment.id.in_(ids))
+    )
+    for id, content, project_id, assignee_id, status in rows:
+        if status is not ProjectStatus.ARCHIVED:
+            yield Document(
+                ("comment", id),
+                content[:TITLE_LENGTH],
+                tokenize(content, unigrams=True),
+                project_id,
+                assignee_id,
+            )
+
+
+_LOADERS = {
+    "project": _project_documents,
+    "task": _task_documents,
+    "comment": _comment_documents,
+}
+
+
+def load_documents(connection, kind, ids):
+    """
+    读取最新数据生成索引文档，返回 {key: 文档}
+    已删除或属于已归档项目的记录对应 None，提交后从索引中删除
+    """
+    ids = list(ids)
+    changes = {(kind, id): None for id in ids}
+    for start in range(0, len(ids), LOAD_BATCH_SIZE):
+        for doc in _LOADERS[kind](connection, ids[start : start + LOAD_BATCH_SIZE]):
+            changes[doc.key] = doc
+    return changes
+
+
+def _pending(session):
+    return session.info.setdefault("search_changes", {})
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    changes = _pending(session)
+    changed = defaultdict(set)
+    for obj in session.deleted:
+        kind = KINDS.get(type(obj))
+        if kind:
+            changes[(kind, obj.id)] = None
+    for obj in (*session.new, *session.dirty):
+        kind = KINDS.get(type(obj))
+        if kind and obj not in session.deleted:
+            changed[kind].add(obj)
+    if not changed:
+        return
+
+    connection = session.connection()
+    comment_ids = set()
+    for task in changed["task"]:
+        state = inspect(task)
+        if (
+            state.attrs.assignee_id.history.has_changes()
+            or state.attrs.project_id.history.has_changes()
+        ):
+            # 评论继承任务的负责人和项目，用于权限过滤
+            comment_ids.update(
+                connection.execute(
+                    select(Comment.id).where(Comment.task_id == task.id)
+                ).scalars()
+            )
+    for kind, objs in changed.items():
+        ids = {obj.id for obj in objs}
+        if kind == "comment":
+            ids |= comment_ids
+            comment_ids = set()
+        changes.update(load_documents(connection, kind, ids))
+    if comment_ids:
+        changes.update(load_documents(connection, "comment", comment_ids))
+
+
+def _affected_ids(connection, model, statement):
+    query = select(model.id)
+    if statement.whereclause is not None:
+        query = query.where(statement.whereclause)
+    return connection.execute(query).scalars().all()
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_statements(orm_execute_state):
+    # 批量 insert/update/delete 不经过 flush，执行前后自行查出受影响的记录
+    if not (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    kind = KINDS.get(mapper.class_) if mapper is not None else None
+    if kind is None:
+        return None
+
+    model = mapper.class_
+    statement = orm_execute_state.statement
+    session = orm_execute_state.session
+    connection = session.connection()
+
+    if orm_execute_state.is_delete:
+        ids = _affected_ids(connection, model, statement)
+        _pending(session).update({(kind, id): None for id in ids})
+        return None
+
+    if orm_execute_state.is_update:
+        if statement.whereclause is None and orm_execute_state.parameters:
+            # 按主键批量更新
+            ids = [params["id"] for params in orm_execute_state.parameters]
+        else:
+            ids = _affected_ids(connection, model, statement)
+        result = orm_execute_state.invoke_statement()
+        _pending(session).update(load_documents(connection, kind, ids))
+        return result
+
+    # insert ... select 从来源查询中取出 ID；其它批量插入按插入前的最大 ID 查出新记录
+    source = statement.select
+    if source is not None and "id" in source.selected_columns:
+        ids = connection.execute(
+            source.with_only_columns(source.selected_columns["id"])
+        ).scalars().all()
+        result = orm_execute_state.invoke_statement()
+    else:
+        last_id = connection.execute(select(func.max(model.id))).scalar() or 0
+        result = orm_execute_state.invoke_statement()
+        ids = connection.execute(
+            select(model.id).where(model.id > last_id)
+        ).scalars().all()
+    _pending(session).update(load_documents(connection, kind, ids))
+    return result
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    if session.in_nested_transaction():
+        # 释放保存点也会触发 after_commit，外层事务提交后再更新索引
+        return
+    changes = session.info.pop("search_changes", None)
+    if not changes:
+        return
+    upserts = [doc for doc in changes.values() if doc is not None]
+    deletes = [key for key, doc in changes.items() if doc is None]
+    _builder.apply(get_index(), upserts, deletes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session):
+    # 只回滚保存点时外层事务仍会提交，之前记录的变更保留
+    if not session.in_nested_transaction():
+        session.info.pop("search_changes", None)
+
+
+def _load_all(index, batch_size):
+    # 清空索引后按 ID 分批读取全部记录写入，返回文档数
+    index.clear()
+    connection = db.session.connection()
+    total = 0
+    for kind, model in (
+        ("project", Project),
+        ("task", Task),
+        ("comment", Comment),
+    ):
+        ids = connection.execute(select(model.id).order_by(model.id)).scalars().all()
+        for start in range(0, len(ids), batch_size):
+            docs = [
+                doc
+                for doc in load_documents(
+                    connection, kind, ids[start : start + batch_size]
+                ).values()
+                if doc is not None
+            ]
+            index.apply(docs, [])
+            total += len(docs)
+    return total
+
+
+def rebuild_index(index=None, batch_size=REBUILD_BATCH_SIZE):
+    """从数据库重建整个索引，返回文档数"""
+    index = index or get_index()
+    total = _load_all(index, batch_size)
+    index.mark_ready()
+    return total
+
+
+class IndexBuilder:
+    """
+    后台构建线程：索引还没有构建时，第一次搜索启动线程从数据库构建，构建完成前搜索返回 503
+    构建期间提交的增量更新先排队，读完全部记录后按提交顺序补上，避免被清空或被较旧的数据覆盖
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.pending = None  # 构建期间排队的 (upserts, deletes)，不在构建时为 None
+        self._lock = threading.Lock()
+
+    def building(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, app, index):
+        # 第一次搜索时再启动线程，避免在 fork 之前创建线程
+        with self._lock:
+            if self.building():
+                return
+            self.pending = []
+            self.thread = threading.Thread(
+                target=self._run, args=(app, index), name="search-index", daemon=True
+            )
+            self.thread.start()
+
+    def apply(self, index, upserts, deletes):
+        with self._lock:
+            if self.pending is not None:
+                self.pending.append((upserts, deletes))
+                return
+        index.apply(upserts, deletes)
+
+    def _run(self, app, index):
+        try:
+            with app.app_context():
+                total = _load_all(index, REBUILD_BATCH_SIZE)
+        except Exception:
+            # 索引保持未就绪，下一次搜索重新构建
+            app.logger.exception("构建搜索索引失败")
+            with self._lock:
+                self.pending = None
+            return
+        while True:
+            with self._lock:
+                batch, self.pending = self.pending, []
+                if not batch:
+                    # 队列已空时在锁内标记就绪，之后的提交直接写入索引
+                    self.pending = None
+                    index.mark_ready()
+                    break
+            for upserts, deletes in batch:
+                index.apply(upserts, deletes)
+        app.logger.info("搜索索引构建完成，共 %d 条记录", total)
+
+
+_builder = IndexBuilder()
+
+
+def ensure_index():
+    """
+    返回已就绪的索引；还没有构建时在后台开始构建并返回 None
+    内存索引在每个进程第一次搜索时构建，FTS5 索引文件为空时同样构建，也可以预先运行 flask search-reindex
+    """
+    index = get_index()
+    if index.ready:
+        return index
+    _builder.start(current_app._get_current_object(), index)
+    return None
+
+
+def search(query, kinds=None, visible=None, limit=20, offset=0):
+    """
+    返回 (总数, [(得分, (类型, ID), 标题, 项目 ID)])，索引正在构建时返回 None
+    visible 为 None 时不过滤，否则为 (可见的项目 ID 集合, 用户 ID)：
+    项目属于可见项目，或任务/评论的负责人是该用户时可见
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return 0, []
+    index = ensure_index()
+    if index is None:
+        return None
+    return index.search(tokens, kinds, visible, limit, offset)
+
+
+@click.command("search-reindex")
+@with_appcontext
+def search_reindex_command():
+    """从数据库重建全文搜索索引"""
+    total = rebuild_index()
+    click.echo(f"已索引 {total} 条记录")
+
+
+def init_app(app):
+    app.cli.add_command(search_reindex_command)
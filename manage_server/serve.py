@@ -0,0 +1,67 @@
+"""
+生产环境启动入口，按 SERVER_MODE 选择服务器:
+    sync   线程模式，每个请求占用一个线程（Flask 自带服务器）
+    gevent 协程模式，数据库和网络等待时自动让出，适合大量并发连接和 SSE 长连接
+
+运行方式（在 manage_server 目录下）:
+    python serve.py --mode gevent --port 5000
+    SERVER_MODE=gevent gunicorn -k gevent --worker-connections 1000 "app:create_app()"
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动服务器")
+    parser.add_argument(
+        "--mode", choices=("sync", "gevent"), default=os.getenv("SERVER_MODE", "sync")
+    )
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--database-uri", default=None, help="覆盖数据库连接地址")
+    parser.add_argument("--quiet", action="store_true", help="不输出访问日志")
+    args = parser.parse_args()
+
+    if args.mode == "gevent":
+        # 必须在导入应用和数据库驱动之前打补丁
+        from gevent import monkey
+
+        monkey.patch_all()
+    os.environ["SERVER_MODE"] = args.mode
+
+    from config import Config
+
+    if args.database_uri:
+        Config.SQLALCHEMY_DATABASE_URI = args.database_uri
+    from app import create_app
+
+    app = create_app()
+    host = args.host or Config.HOST
+    port = args.port or Config.PORT
+
+    # 收到 SIGTERM 时正常退出，退出时关闭哈希进程池，子进程不会残留并占用端口
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    if args.mode == "gevent":
+        from gevent.pool import Pool
+        from gevent.pywsgi import WSGIServer
+
+        server = WSGIServer(
+            (host, port),
+            app,
+            spawn=Pool(Config.SERVER_CONNECTIONS),
+            log=None if args.quiet else "default",
+        )
+        server.serve_forever()
+    else:
+        if args.quiet:
+            logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        app.run(host=host, port=port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from uuid import uuid4
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from config import Config
+from extensions import db
+from models import Attachment
+
+CHUNK_SIZE = 64 * 1024  # 上传时每次读取的字节数
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def blob_path(digest):
+    # 按摘要前两位分目录，避免单个目录文件过多
+    return os.path.join(Config.UPLOAD_FOLDER, digest[:2], digest)
+
+
+def save_stream(stream):
+    """
+    分块读取上传流，边写临时文件边计算 SHA-256
+    返回 (摘要, 文件大小, 临时文件路径)，引用计数提交后再用 place_blob 放到摘要路径
+    """
+    os.makedirs(Config.UPLOAD_FOLDER, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=Config.UPLOAD_FOLDER, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        return hasher.hexdigest(), size, tmp_path
+    except Exception:
+        discard_temp(tmp_path)
+        raise
+
+
+def place_blob(tmp_path, digest):
+    """
+    引用计数提交后把临时文件移到摘要路径，相同内容的文件已存在时直接覆盖
+    并发的 remove_blob 可能在提交前删掉了旧文件，提交后放置可以保证被引用的文件存在
+    """
+    path = blob_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+
+
+def discard_temp(tmp_path):
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+
+def acquire(digest, size):
+    # 引用计数加一，不存在时创建记录
+    updated = (
+        Attachment.query.filter_by(digest=digest)
+        .update({Attachment.ref_count: Attachment.ref_count + 1})
+    )
+    if updated:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(Attachment(digest=digest, size=size, ref_count=1))
+    except IntegrityError:
+        # 并发上传了相同内容，记录已被其它请求创建
+        Attachment.query.filter_by(digest=digest).update(
+            {Attachment.ref_count: Attachment.ref_count + 1}
+        )
+
+
+def release(digest):
+    """
+    引用计数减一，计数归零时删除记录
+    返回需要在提交后删除的摘要，仍被引用时返回 None
+    """
+    Attachment.query.filter_by(digest=digest).update(
+        {Attachment.ref_count: Attachment.ref_count - 1}
+    )
+    deleted = Attachment.query.filter(
+        Attachment.digest == digest, Attachment.ref_count <= 0
+    ).delete()
+    return digest if deleted else None
+
+
+def release_many(digests):
+    """
+    批量释放引用，同一摘要出现多次时一次减去对应次数
+    返回引用计数归零、需要在提交后删除的摘要列表
+    """
+    counts = Counter(digests)
+    if not counts:
+        return []
+    for digest, count in counts.items():
+        Attachment.query.filter_by(digest=digest).update(
+            {Attachment.ref_count: Attachment.ref_count - count}
+        )
+    orphans = [
+        digest
+        for (digest,) in db.session.query(Attachment.digest).filter(
+            Attachment.digest.in_(counts), Attachment.ref_count <= 0
+        )
+    ]
+    if orphans:
+        Attachment.query.filter(Attachment.digest.in_(orphans)).delete()
+    return orphans
+
+
+def remove_blob(digest):
+    """
+    删除引用计数归零的文件：先改名移开，再确认数据库中已没有该摘要的记录
+    期间有上传提交了相同内容的引用时把文件移回原处，上传方提交后也会重新放置文件
+    """
+    path = blob_path(digest)
+    removing = f"{path}.{uuid4().hex}.removing"
+    try:
+        os.rename(path, removing)
+    except FileNotFoundError:
+        return
+    referenced = (
+        db.session.query(Attachment.digest).filter_by(digest=digest).first()
+        is not None
+    )
+    if referenced:
+        os.replace(removing, path)
+    else:
+        os.remove(removing)
+
+
+def remove_blobs_in_background(digests):
+    # 文件删除放到后台线程，不占用请求时间；删除失败只留下无引用的文件
+    digests = list(digests)
+    if not digests:
+        return
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            for digest in digests:
+                try:
+                    remove_blob(digest)
+                except (OSError, SQLAlchemyError):
+                    db.session.rollback()
+
+    threading.Thread(target=run, name="blob-cleanup", daemon=True).start()
+
+
+def make_attachment_url(digest, filename):
+    # 附件地址为 "摘要/原始文件名"，客户端仍可从最后一段取得文件名
+    filename = filename.replace("\\", "/").rsplit("/", 1)[-1]
+    return f"{digest}/{filename}"
+
+
+def parse_attachment_url(url):
+    # 从附件地址中取出摘要，旧格式的路径返回 None
+    if not url:
+        return None
+    digest = url.split("/", 1)[0]
+    return digest if DIGEST_PATTERN.match(digest) else None
@@ -0,0 +1,154 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from sqlalchemy import event
+
+import cache
+import search
+from app import create_app
+from config import Config
+from extensions import db
+from models import (
+    Comment,
+    Process,
+    Project,
+    ProjectArchive,
+    ProjectPriority,
+    Task,
+    User,
+    UserRoles,
+)
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    """传给 create_app 的覆盖配置，测试模块可以重新定义该 fixture 追加配置"""
+    return {
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "SEARCH_INDEX_PATH": str(tmp_path / "search.db"),
+        "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+        "RATE_LIMIT_ENABLED": False,
+    }
+
+
+@pytest.fixture
+def app(app_config, monkeypatch):
+    app = create_app(app_config)
+    # 响应缓存是进程内的全局对象，每个测试使用新的数据库，也换一个新的缓存
+    monkeypatch.setattr(
+        cache, "response_cache", cache.ResponseCache(1000, 16 * 1024 * 1024)
+    )
+    # 搜索索引同样是全局的，按本次测试的配置重新创建
+    monkeypatch.setattr(search, "_index", None)
+    monkeypatch.setattr(search, "_builder", search.IndexBuilder())
+    with app.app_context():
+        # 只在主库建表；db 是全局对象，其它测试配置过的副本 bind 仍留在 metadatas 中
+        db.create_all(bind_key=None)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def users(app):
+    """管理员、经理、成员各一个，返回 {角色: id}"""
+    with app.app_context():
+        created = {}
+        for role in (UserRoles.ADMIN, UserRoles.MANAGER, UserRoles.MEMBER):
+            user = User(username=role.name.lower(), role=role, name=role.value)
+            user.password_hash = "x"  # 列表接口不校验密码，不计算哈希
+            db.session.add(user)
+            db.session.flush()
+            created[role] = user.id
+        db.session.commit()
+    return created
+
+
+@pytest.fixture
+def auth():
+    """返回生成指定用户授权请求头的函数"""
+
+    def headers(user_id):
+        token = jwt.encode(
+            {"user_id": user_id, "exp": datetime.utcnow() + timedelta(hours=1)},
+            Config.SECRET_KEY,
+            algorithm="HS256",
+        )
+        return {"Authorization": f"Bearer {token}"}
+
+    return headers
+
+
+@pytest.fixture
+def add_projects(app, users):
+    """
+    返回按数量添加数据的函数：每个项目一条进度、三个任务，每个任务两条评论，
+    另外添加同样数量的归档项目和成员
+    """
+
+    def add(count):
+        with app.app_context():
+            offset = db.session.query(db.func.max(Project.id)).scalar() or 0
+            for index in range(count):
+                project = Project(
+                    name=f"项目{offset + index}",
+                    end_date=datetime.now() + timedelta(days=30),
+                    manager_id=users[UserRoles.MANAGER],
+                    priority=ProjectPriority.NORMAL,
+                )
+                db.session.add(project)
+                db.session.flush()
+                db.session.add(Process(project_id=project.id))
+                for number in range(3):
+                    task = Task(
+                        title=f"任务{project.id}-{number}",
+                        due_date=datetime.now() + timedelta(days=7),
+                        assignee_id=users[UserRoles.MEMBER],
+                        project_id=project.id,
+                    )
+                    db.session.add(task)
+                    db.session.flush()
+                    for text in ("评论一", "评论二"):
+                        db.session.add(
+                            Comment(task_id=task.id, content=text, author_name="成员")
+                        )
+                member = User(
+                    username=f"member{project.id}", role=UserRoles.MEMBER, name="成员"
+                )
+                member.password_hash = "x"
+                db.session.add(member)
+                db.session.add(
+                    ProjectArchive(
+                        id=100000 + project.id,
+                        name=f"归档{project.id}",
+                        start_date=datetime.now() - timedelta(days=60),
+                        end_date=datetime.now() - timedelta(days=30),
+                        manager_id=users[UserRoles.MANAGER],
+                    )
+                )
+            db.session.commit()
+
+    return add
+
+
+@pytest.fixture
+def queries(app):
+    """测试期间执行的 SQL 语句，每次请求前清空"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
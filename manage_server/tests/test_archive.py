@@ -0,0 +1,75 @@
+"""
+项目归档：后台分批移动，恢复后移动线程不再移走任务，也不删除恢复的项目
+"""
+
+import time
+
+import archive
+from extensions import db
+from models import Comment, Project, ProjectArchive, ProjectStatus, Task, TaskArchive
+
+
+def archive_first_project():
+    project = db.session.get(Project, 1)
+    project.status = ProjectStatus.ARCHIVED
+    archive.archive_project(project)
+    db.session.commit()
+
+
+def test_move_then_restore(app, add_projects):
+    add_projects(1)
+    with app.app_context():
+        archive_first_project()
+        assert archive.move_pending(batch_size=2) == 3
+        assert db.session.get(Project, 1) is None
+        assert db.session.query(TaskArchive).count() == 3
+
+        archive.restore_project(db.session.get(ProjectArchive, 1), batch_size=2)
+        assert db.session.get(Project, 1).status == ProjectStatus.IN_PROGRESS
+        assert db.session.query(Task).filter_by(project_id=1).count() == 3
+        assert db.session.query(Comment).count() == 6
+        assert db.session.get(ProjectArchive, 1) is None
+
+
+def test_worker_stops_after_restore(app, add_projects, monkeypatch):
+    add_projects(1)
+    with app.app_context():
+        archive_first_project()
+        lock_if_archived = archive._lock_if_archived
+        calls = []
+
+        def restore_between_batches(project_id):
+            calls.append(project_id)
+            if len(calls) == 2:
+                # 第一批提交后、第二批取锁前恢复提交
+                archive.restore_project(db.session.get(ProjectArchive, 1), 10)
+            return lock_if_archived(project_id)
+
+        monkeypatch.setattr(archive, "_lock_if_archived", restore_between_batches)
+        assert archive.move_project(1, batch_size=1) == 1
+
+        # 恢复之后的批次不再执行，项目和全部任务都在热表中
+        assert db.session.get(Project, 1).status == ProjectStatus.IN_PROGRESS
+        assert db.session.query(Task).filter_by(project_id=1).count() == 3
+        assert db.session.query(TaskArchive).count() == 0
+
+
+def test_worker_resumes_on_first_request(app, client, add_projects):
+    add_projects(1)
+    with app.app_context():
+        archive_first_project()
+
+    # 模拟重启：没有新的归档操作，第一个请求启动线程并继续移动
+    worker = archive.ArchiveWorker()
+    app.testing = False
+    worker.init_app(app)
+    client.get("/api/projects")
+    assert worker.thread is not None
+
+    deadline = time.monotonic() + 5
+    with app.app_context():
+        while db.session.get(Project, 1) is not None:
+            assert time.monotonic() < deadline
+            db.session.rollback()
+            time.sleep(0.05)
+        assert db.session.query(TaskArchive).count() == 3
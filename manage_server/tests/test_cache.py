@@ -0,0 +1,90 @@
+"""
+响应缓存的版本号：提交后递增，回滚时不变；登录记录不会让任务、项目列表的缓存失效
+"""
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from hashing import hash_password
+from models import EntityVersion, User, UserRoles
+
+
+def versions():
+    return dict(db.session.query(EntityVersion.name, EntityVersion.version))
+
+
+def test_bumped_once_after_commit(app, users):
+    with app.app_context():
+        before = versions().get("users", 0)
+        db.session.add(User(username="a", role=UserRoles.USER))
+        db.session.flush()
+        db.session.add(User(username="b", role=UserRoles.USER))
+        db.session.flush()
+        assert versions().get("users", 0) == before  # 提交前不递增
+        db.session.commit()
+        assert versions()["users"] == before + 1
+
+
+def test_rollback_discards(app, users):
+    with app.app_context():
+        before = versions().get("users", 0)
+        db.session.add(User(username="a", role=UserRoles.USER))
+        db.session.flush()
+        db.session.rollback()
+        assert versions().get("users", 0) == before
+
+
+def test_savepoint_does_not_bump_early(app, users):
+    with app.app_context():
+        before = versions().get("users", 0)
+        db.session.add(User(username="a", role=UserRoles.USER))
+        with db.session.begin_nested():
+            db.session.add(User(username="b", role=UserRoles.USER))
+        with pytest.raises(IntegrityError):
+            with db.session.begin_nested():
+                db.session.add(User(username="a", role=UserRoles.USER))
+        assert versions().get("users", 0) == before
+        db.session.commit()
+        assert versions()["users"] == before + 1
+
+
+def test_login_keeps_task_list_cached(app, client, users, auth, add_projects):
+    add_projects(1)
+    with app.app_context():
+        admin = db.session.get(User, users[UserRoles.ADMIN])
+        admin.password_hash = hash_password("secret")
+        db.session.commit()
+    headers = auth(users[UserRoles.ADMIN])
+    tasks = client.get("/api/tasks", headers=headers).headers["ETag"]
+    users_list = client.get("/api/users", headers=headers).headers["ETag"]
+
+    response = client.post(
+        "/api/login", json={"account": "admin", "password": "secret"}
+    )
+    assert response.status_code == 200
+    assert client.get("/api/tasks", headers=headers).headers["ETag"] == tasks
+    # 用户列表显示上次登录时间，需要失效
+    assert client.get("/api/users", headers=headers).headers["ETag"] != users_list
+
+    with app.app_context():
+        db.session.get(User, users[UserRoles.MEMBER]).name = "新名字"
+        db.session.commit()
+    assert client.get("/api/tasks", headers=headers).headers["ETag"] != tasks
+
+
+def test_demoted_user_does_not_get_cached_admin_list(client, users, auth, add_projects):
+    add_projects(2)
+    headers = auth(users[UserRoles.ADMIN])
+    response = client.get("/api/tasks", headers=headers)
+    assert len(response.get_json()["tasks"]) == 6
+
+    response = client.put(
+        f"/api/users/{users[UserRoles.ADMIN]}/info",
+        json={"username": "admin", "role": "USER", "name": "管理员"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    # 同一个 token，姓名没有变化，降级后只能看到自己的任务
+    response = client.get("/api/tasks", headers=headers)
+    assert response.get_json()["tasks"] == []
@@ -0,0 +1,32 @@
+"""
+首页统计：已归档的项目按归档层计数，尚未移动完的项目不重复计算
+"""
+
+import archive
+from extensions import db
+from models import Project, ProjectStatus, UserRoles
+
+
+def test_archived_projects_counted_once(app, client, users, auth, add_projects):
+    add_projects(3)  # 3 个进行中的项目，归档层另有 3 个项目
+    with app.app_context():
+        # 刚归档、任务还没移动的项目在热表和归档层中都有记录
+        project = db.session.get(Project, 1)
+        project.status = ProjectStatus.ARCHIVED
+        archive.archive_project(project)
+        db.session.commit()
+
+    # 管理员统计全部项目，经理统计自己负责的项目，这里两者相同
+    for role in (UserRoles.ADMIN, UserRoles.MANAGER):
+        summary = client.get(
+            "/api/dashboard/summary", headers=auth(users[role])
+        ).get_json()
+        assert summary["projects_by_status"] == {"进行中": 2, "已归档": 4}
+        assert summary["total_projects"] == 6
+
+    # 成员不负责任何项目
+    summary = client.get(
+        "/api/dashboard/summary", headers=auth(users[UserRoles.MEMBER])
+    ).get_json()
+    assert summary["projects_by_status"] == {"已归档": 0}
+    assert summary["total_projects"] == 0
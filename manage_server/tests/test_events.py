@@ -0,0 +1,152 @@
+"""
+变更推送：提交后的事件按用户过滤后通过 SSE 发送，断线重连时按 Last-Event-ID 补发，
+补发不了时发送 reset
+"""
+
+from datetime import datetime
+
+import pytest
+
+import events
+from extensions import db
+from models import Process, Project, ProjectPriority, User, UserRoles
+
+
+@pytest.fixture
+def app_config(app_config):
+    return {
+        **app_config,
+        "EVENT_BUFFER_SIZE": 100,
+        "EVENT_HEARTBEAT": 0.05,
+        "EVENT_STREAM_MAX_SECONDS": 0.2,
+    }
+
+
+@pytest.fixture(autouse=True)
+def broker(app, monkeypatch):
+    # 代理是进程内的全局对象，每个测试使用新的代理
+    monkeypatch.setattr(events, "_broker", None)
+    with app.app_context():
+        return events.get_broker()
+
+
+def parse(body):
+    """把 SSE 文本解析为 [(id, event)]，忽略 retry 和心跳"""
+    messages = []
+    for block in body.split("\n\n"):
+        fields = dict(
+            line.split(": ", 1) for line in block.splitlines() if ": " in line
+        )
+        if "event" in fields:
+            messages.append((fields.get("id"), fields["event"]))
+    return messages
+
+
+def receive(client, auth, user_id, last_event_id):
+    response = client.get(
+        "/api/events", headers={**auth(user_id), "Last-Event-ID": last_event_id}
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    return parse(response.get_data(as_text=True))
+
+
+def test_delivery_and_visibility(app, client, users, auth, add_projects, broker):
+    add_projects(1)
+    start = f"{broker.boot_id}:0"
+
+    admin = [event for _, event in receive(client, auth, users[UserRoles.ADMIN], start)]
+    assert admin.count("project.created") == 1
+    assert admin.count("process.created") == 1
+    assert admin.count("task.created") == 3
+    assert admin.count("comment.created") == 6
+
+    # 经理接收自己负责的项目下的全部事件，成员只接收分配给自己的任务和评论
+    manager = receive(client, auth, users[UserRoles.MANAGER], start)
+    assert [event for _, event in manager] == admin
+    member = [
+        event for _, event in receive(client, auth, users[UserRoles.MEMBER], start)
+    ]
+    assert sorted(set(member)) == ["comment.created", "task.created"]
+
+    with app.app_context():
+        other = User.query.filter_by(username="member1").one()
+    assert receive(client, auth, other.id, start) == []
+
+
+def test_last_event_id_replay(client, users, auth, add_projects, broker):
+    add_projects(1)
+    admin = users[UserRoles.ADMIN]
+    first = receive(client, auth, admin, f"{broker.boot_id}:0")
+
+    # 从第五个事件之后重连，只补发之后的事件
+    replayed = receive(client, auth, admin, first[4][0])
+    assert replayed == first[5:]
+    assert receive(client, auth, admin, first[-1][0]) == []
+
+
+@pytest.mark.parametrize(
+    "last_event_id", ["other-boot:1", "{boot_id}:999", "{boot_id}:x"]
+)
+def test_unknown_position_resets(client, users, auth, broker, last_event_id):
+    messages = receive(
+        client,
+        auth,
+        users[UserRoles.ADMIN],
+        last_event_id.format(boot_id=broker.boot_id),
+    )
+    assert messages == [(f"{broker.boot_id}:0", "reset")]
+
+
+def test_overwritten_buffer_resets(app, client, users, auth, add_projects, monkeypatch):
+    monkeypatch.setattr(events, "_broker", events.LocalBroker(5))
+    broker = events._broker
+    add_projects(1)  # 11 个事件，缓冲区只保留最后 5 个
+
+    messages = receive(client, auth, users[UserRoles.ADMIN], f"{broker.boot_id}:2")
+    assert messages[0] == (f"{broker.boot_id}:11", "reset")
+
+
+def test_read_reports_gap():
+    broker = events.LocalBroker(3)
+    item = events.ChangeEvent(None, "task.updated", {}, None, None)
+    broker.publish([item] * 2)
+    assert broker.read(0, 0)[1:] == (2, False)
+
+    # 读取跟不上，序号 3 还没读到就被覆盖
+    broker.publish([item] * 4)
+    items, last_seq, gap = broker.read(2, 0)
+    assert (len(items), last_seq, gap) == (3, 6, True)
+
+
+def test_stream_resets_on_gap(app, monkeypatch):
+    broker = events.LocalBroker(3)
+    monkeypatch.setattr(events, "_broker", broker)
+    with app.app_context():
+        body = events.stream(1, True, None, 0.05, 0.2)
+    assert next(body).startswith("retry:")
+
+    # 连接建立后、读取之前写入了超过缓冲区的事件
+    item = events.ChangeEvent(None, "task.updated", {}, None, None)
+    broker.publish([item] * 5)
+    assert next(body) == f"id: {broker.boot_id}:5\nevent: reset\ndata: {{}}\n\n"
+
+
+def test_published_after_outer_commit(app, users, broker):
+    with app.app_context():
+        project = Project(
+            name="项目",
+            end_date=datetime.now(),
+            manager_id=users[UserRoles.MANAGER],
+            priority=ProjectPriority.NORMAL,
+        )
+        db.session.add(project)
+        db.session.flush()
+        with db.session.begin_nested():
+            db.session.add(Process(project_id=project.id))
+        assert broker.read(0, 0)[0] == []  # 释放保存点时还没有发布
+        db.session.commit()
+    assert [item.type for item in broker.read(0, 0)[0]] == [
+        "project.created",
+        "process.created",
+    ]
@@ -0,0 +1,70 @@
+"""
+needs_rehash：配置的哈希方法省略参数时按 werkzeug 补全后的前缀比较，不会每次登录都重新计算
+进程池：计算超时后名额保留到进程真正算完为止
+"""
+
+import threading
+import time
+
+import pytest
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import hashing
+from config import Config
+
+
+@pytest.mark.parametrize(
+    "method", ["scrypt", "scrypt:32768:8:1", "pbkdf2", "pbkdf2:sha256:600000"]
+)
+def test_current_method_needs_no_rehash(monkeypatch, method):
+    monkeypatch.setattr(Config, "PASSWORD_HASH_METHOD", method)
+    assert not hashing.needs_rehash(generate_password_hash("secret", method))
+
+
+@pytest.mark.parametrize(
+    "stored, configured",
+    [
+        ("pbkdf2:sha256:1000", "scrypt"),
+        ("scrypt:16384:8:1", "scrypt"),
+        ("pbkdf2:sha256:1000", "pbkdf2"),
+    ],
+)
+def test_changed_method_needs_rehash(monkeypatch, stored, configured):
+    monkeypatch.setattr(Config, "PASSWORD_HASH_METHOD", configured)
+    assert hashing.needs_rehash(generate_password_hash("secret", stored))
+
+
+def test_empty_hash():
+    assert not hashing.needs_rehash(None)
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """单进程、单名额的哈希进程池，测试结束后关闭"""
+    monkeypatch.setattr(Config, "PASSWORD_HASH_WORKERS", 1)
+    monkeypatch.setattr(Config, "PASSWORD_HASH_TIMEOUT", 0.2)
+    monkeypatch.setattr(Config, "PASSWORD_HASH_METHOD", "pbkdf2:sha256:1000")
+    monkeypatch.setattr(hashing, "_slots", threading.BoundedSemaphore(1))
+    monkeypatch.setattr(hashing, "_executor", None)
+    yield
+    if hashing._executor is not None:
+        hashing._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def test_timed_out_hash_keeps_slot_until_finished(pool):
+    with pytest.raises(hashing.PasswordHashBusy):
+        hashing._run(time.sleep, 1)
+    # 进程仍在计算，名额没有释放，后续请求排队超时而不是继续堆积
+    assert not hashing._slots.acquire(blocking=False)
+    with pytest.raises(hashing.PasswordHashBusy, match="队列已满"):
+        hashing.hash_password("secret")
+
+    assert hashing._slots.acquire(timeout=5)
+    hashing._slots.release()
+    assert hashing.verify_password(hashing.hash_password("secret"), "secret")
+
+
+def test_batch_releases_slot(pool):
+    hashes = hashing.hash_passwords(["a", "b", "c"])
+    assert [check_password_hash(h, p) for h, p in zip(hashes, "abc")] == [True] * 3
+    assert hashing._slots.acquire(timeout=1)
@@ -0,0 +1,56 @@
+"""
+常用查询的索引：按迁移建好的 SQLite 库执行 EXPLAIN QUERY PLAN，
+迁移或模型中删掉了 0002 等迁移添加的索引时测试失败
+"""
+
+import json
+import logging.config
+import os
+
+import flask_migrate
+import pytest
+
+from app import create_app
+from benchmarks.index_bench import explain, hot_queries
+from extensions import db
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "migrations")
+
+
+@pytest.fixture
+def migrated(app_config, tmp_path, monkeypatch):
+    """按迁移脚本建表的数据库连接"""
+    # env.py 按 alembic.ini 配置日志，会关闭已有的 logger，测试中跳过
+    monkeypatch.setattr(logging.config, "fileConfig", lambda *args, **kwargs: None)
+    app = create_app(
+        {
+            **app_config,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'migrated.db'}",
+        }
+    )
+    flask_migrate.Migrate(app, db, directory=MIGRATIONS)
+    with app.app_context():
+        flask_migrate.upgrade(directory=MIGRATIONS)
+        with db.engine.connect() as conn:
+            yield conn
+        db.engine.dispose()
+
+
+@pytest.fixture
+def created(app):
+    """按模型 create_all 建表的数据库连接，与测试使用的库相同"""
+    with app.app_context():
+        with db.engine.connect() as conn:
+            yield conn
+
+
+QUERIES = hot_queries(users=10, projects=10, tasks=10)
+
+
+@pytest.mark.parametrize("schema", ["migrated", "created"])
+@pytest.mark.parametrize("name", sorted(QUERIES))
+def test_hot_query_uses_index(request, schema, name):
+    conn = request.getfixturevalue(schema)
+    statement, expected_index = QUERIES[name]
+    plan = json.dumps(explain(conn, statement), ensure_ascii=False)
+    assert expected_index in plan, plan
@@ -0,0 +1,35 @@
+"""
+列表接口的 SQL 条数：数据量增加后语句数不变，不会随行数出现 N+1 查询
+"""
+
+import pytest
+
+from models import UserRoles
+
+LIST_ENDPOINTS = [
+    ("/api/tasks", UserRoles.ADMIN, 3),
+    ("/api/tasks/member", UserRoles.MEMBER, 3),
+    ("/api/tasks/1/comments", None, 2),
+    ("/api/projects", UserRoles.MANAGER, 3),
+    ("/api/processes", UserRoles.ADMIN, 3),
+    ("/api/archived-project", UserRoles.ADMIN, 3),
+    ("/api/users", UserRoles.ADMIN, 2),
+    ("/api/users/members", UserRoles.ADMIN, 2),
+]
+
+
+@pytest.mark.parametrize("url, role, expected", LIST_ENDPOINTS)
+def test_list_query_count(
+    client, users, auth, add_projects, queries, url, role, expected
+):
+    headers = auth(users[role]) if role is not None else {}
+
+    counts = []
+    for count in (2, 10):
+        add_projects(count)
+        queries.clear()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        counts.append(len(queries))
+
+    assert counts == [expected, expected], queries
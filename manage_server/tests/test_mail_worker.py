@@ -0,0 +1,106 @@
+"""
+后台发信：通过本地 SMTP 服务器（aiosmtpd）实际发送，出错的邮件只计为失败，线程继续发送后续邮件
+"""
+
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from extensions import MailWorkerPool, mail
+
+controller_module = pytest.importorskip("aiosmtpd.controller")
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append(envelope)
+        return "250 OK"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def inbox():
+    inbox = Inbox()
+    controller = controller_module.Controller(
+        inbox, hostname="127.0.0.1", port=free_port()
+    )
+    controller.start()
+    inbox.port = controller.port
+    yield inbox
+    controller.stop()
+
+
+@pytest.fixture
+def app_config(app_config, inbox):
+    return {
+        **app_config,
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": inbox.port,
+        "MAIL_USE_TLS": False,
+        "MAIL_USE_SSL": False,
+        "MAIL_USERNAME": None,
+        "MAIL_PASSWORD": None,
+        "MAIL_WORKERS": 1,
+        "MAIL_MAX_RETRIES": 0,
+        "MAIL_SUPPRESS_SEND": False,  # flask_mail 在测试模式下默认不发送
+        "MAIL_IDLE_TIMEOUT": 0.1,
+    }
+
+
+@pytest.fixture
+def pool(app, monkeypatch):
+    # flask_mail 实例在第一次发信时按当前应用的配置创建
+    monkeypatch.setattr(mail, "_mail", None)
+    pool = MailWorkerPool()
+    pool.init_app(app)
+    return pool
+
+
+def wait_idle(pool, timeout=5):
+    """等待队列中的邮件都处理完；线程退出时不会等到，超时后测试失败"""
+    deadline = time.monotonic() + timeout
+    while pool.queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.queue.unfinished_tasks == 0
+
+
+def message(recipient):
+    from flask_mail import Message
+
+    msg = Message("测试", sender="noreply@example.com", recipients=[recipient])
+    msg.body = "正文"
+    return msg
+
+
+def test_sends_through_smtp(pool, inbox):
+    pool.submit(message("first@example.com"))
+    pool.submit(message("second@example.com"))
+    wait_idle(pool)
+
+    assert [envelope.rcpt_tos for envelope in inbox.messages] == [
+        ["first@example.com"],
+        ["second@example.com"],
+    ]
+    assert pool.metrics()["sent"] == 2
+
+
+def test_unexpected_error_keeps_worker_alive(pool, inbox):
+    # 不是 SMTP 或网络错误的异常，以前会结束发信线程
+    pool.submit(SimpleNamespace(recipients=["broken@example.com"]))
+    pool.submit(message("after@example.com"))
+    wait_idle(pool)
+
+    assert [envelope.rcpt_tos for envelope in inbox.messages] == [["after@example.com"]]
+    metrics = pool.metrics()
+    assert (metrics["sent"], metrics["failed"]) == (1, 1)
+    assert all(thread.is_alive() for thread in pool.threads)
@@ -0,0 +1,50 @@
+"""
+查询检查：测试模式下请求每个声明了 @query_budget 的接口，超出预算或出现 N+1 时
+QueryGuardError 会让请求失败
+"""
+
+import pytest
+
+from models import UserRoles
+from query_guard import QueryGuardError
+
+# 端点名 -> (请求地址, 请求用户的角色)
+BUDGET_ROUTES = {
+    "task.get_tasks": ("/api/tasks", UserRoles.ADMIN),
+    "task.get_member_tasks": ("/api/tasks/member", UserRoles.MEMBER),
+    "task.get_task_comments": ("/api/tasks/1/comments", None),
+    "project.get_projects": ("/api/projects", UserRoles.MANAGER),
+    "project.get_processes": ("/api/processes", UserRoles.ADMIN),
+    "project.get_archived_projects": ("/api/archived-project", UserRoles.ADMIN),
+    "user.get_users": ("/api/users", UserRoles.ADMIN),
+    "user.get_members": ("/api/users/members", UserRoles.ADMIN),
+}
+
+
+def test_every_budget_route_is_covered(app):
+    # functools.wraps 会把 query_budget 属性复制到外层装饰器
+    budgeted = {
+        endpoint
+        for endpoint, view in app.view_functions.items()
+        if hasattr(view, "query_budget")
+    }
+    assert budgeted == set(BUDGET_ROUTES)
+
+
+@pytest.mark.parametrize("endpoint", sorted(BUDGET_ROUTES))
+def test_budget_route_within_budget(client, users, auth, add_projects, endpoint):
+    url, role = BUDGET_ROUTES[endpoint]
+    add_projects(10)
+    response = client.get(url, headers=auth(users[role]) if role else {})
+    assert response.status_code == 200
+
+
+class TestOverrun:
+    @pytest.fixture
+    def app_config(self, app_config):
+        return {**app_config, "QUERY_BUDGETS": "task.get_tasks=1"}
+
+    def test_overrun_raises(self, client, users, auth, add_projects):
+        add_projects(2)
+        with pytest.raises(QueryGuardError, match="超出预算 1"):
+            client.get("/api/tasks", headers=auth(users[UserRoles.ADMIN]))
@@ -0,0 +1,71 @@
+"""
+登录限流：SQLite 令牌桶在多个线程之间共享连接池，超出限额的请求返回 429
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import ratelimit
+
+
+@pytest.fixture
+def app_config(app_config, tmp_path):
+    return {
+        **app_config,
+        "RATE_LIMIT_ENABLED": True,
+        "RATE_LIMIT_BACKEND": "sqlite",
+        "RATE_LIMIT_PATH": str(tmp_path / "ratelimit.db"),
+        "RATE_LIMIT_LOGIN_IP": "3/60",
+        "RATE_LIMIT_LOGIN_ACCOUNT": "",
+    }
+
+
+@pytest.fixture(autouse=True)
+def limiter(monkeypatch):
+    monkeypatch.setattr(ratelimit, "_limiter", None)
+
+
+def test_login_rejected_after_limit(client):
+    statuses = [
+        client.post("/api/login", json={"account": "nobody", "password": "x"})
+        for _ in range(4)
+    ]
+    assert [response.status_code for response in statuses][-1] == 429
+    assert all(response.status_code != 429 for response in statuses[:3])
+    assert int(statuses[-1].headers["Retry-After"]) >= 1
+
+
+def test_tokens_shared_between_threads(tmp_path):
+    limiter = ratelimit.SqliteLimiter(str(tmp_path / "buckets.db"))
+    with ThreadPoolExecutor(4) as executor:
+        waits = list(executor.map(lambda _: limiter.hit("key", 10, 0.01), range(20)))
+    # 同一个令牌不会被两个线程同时取走
+    assert sum(1 for wait in waits if wait == 0) == 10
+    assert 1 <= len(limiter._pool._idle) <= 4
+
+
+class TestBehindProxy:
+    @pytest.fixture
+    def app_config(self, app_config):
+        return {**app_config, "RATE_LIMIT_TRUSTED_PROXIES": 1}
+
+    def login(self, client, forwarded_for):
+        return client.post(
+            "/api/login",
+            json={"account": "nobody", "password": "x"},
+            headers={"X-Forwarded-For": forwarded_for},
+        )
+
+    def test_clients_limited_separately(self, client):
+        for _ in range(3):
+            assert self.login(client, "10.0.0.1").status_code != 429
+        assert self.login(client, "10.0.0.1").status_code == 429
+        # 同一个代理转发的其它客户端不受影响
+        assert self.login(client, "10.0.0.2").status_code != 429
+
+    def test_client_cannot_spoof_forwarded_for(self, client):
+        # 客户端自带的地址排在前面，只取代理追加的最后一个
+        for index in range(3):
+            self.login(client, f"192.168.0.{index}, 10.0.0.1")
+        assert self.login(client, "192.168.1.1, 10.0.0.1").status_code == 429
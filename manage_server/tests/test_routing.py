@@ -0,0 +1,116 @@
+"""
+读写分离：主库和副本各用一个 SQLite 文件，副本是建好数据后复制的快照，
+GET 请求的 SELECT 发往副本，写请求、flush 之后的查询使用主库
+"""
+
+import shutil
+import time
+
+import pytest
+from itsdangerous import TimestampSigner
+from sqlalchemy import event, select
+
+from extensions import db
+from models import Project, UserRoles
+
+
+@pytest.fixture
+def app_config(app_config, tmp_path):
+    return {**app_config, "DB_REPLICA_URIS": f"sqlite:///{tmp_path / 'replica.db'}"}
+
+
+@pytest.fixture
+def routed(app, add_projects, tmp_path):
+    """建好数据后把主库复制为副本，返回 {"primary": [...], "replica": [...]} 记录各库执行的 SQL"""
+    add_projects(1)
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+        shutil.copyfile(tmp_path / "test.db", tmp_path / "replica.db")
+        engines = {"primary": db.engine, "replica": db.engines["replica_0"]}
+
+    statements = {name: [] for name in engines}
+    listeners = []
+    for name, engine in engines.items():
+
+        def record(conn, cursor, statement, *args, name=name):
+            statements[name].append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        listeners.append((engine, record))
+    yield statements
+    for engine, record in listeners:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def selects(statements):
+    return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+
+def test_get_reads_from_replica(client, users, auth, routed):
+    response = client.get("/api/tasks", headers=auth(users[UserRoles.ADMIN]))
+    assert response.status_code == 200
+    assert selects(routed["replica"])
+    assert routed["primary"] == []
+
+
+def test_write_request_uses_primary(client, users, auth, routed):
+    response = client.put(
+        "/api/projects/1",
+        json={"name": "新名称"},
+        headers=auth(users[UserRoles.MANAGER]),
+    )
+    assert response.status_code == 200
+    assert any(s.lstrip().upper().startswith("UPDATE") for s in routed["primary"])
+    assert routed["replica"] == []
+
+
+def test_reads_after_flush_use_primary(app, routed):
+    with app.test_request_context("/api/projects", method="GET"):
+        db.session.scalar(select(Project.name).where(Project.id == 1))
+        assert len(selects(routed["replica"])) == 1
+
+        db.session.get(Project, 1).name = "新名称"
+        db.session.flush()
+        before = len(selects(routed["replica"]))
+        name = db.session.scalar(select(Project.name).where(Project.id == 1))
+        # flush 之后同一请求内读主库，能读到未提交的写入
+        assert name == "新名称"
+        assert len(selects(routed["replica"])) == before
+        db.session.rollback()
+
+
+def test_write_makes_client_read_primary(app, client, routed):
+    # 更新用户信息的接口不要求登录，以前这类写入不会让后续请求读主库
+    response = client.put(
+        "/api/users/1/info",
+        json={"username": "admin", "role": "ADMIN", "name": "新名字"},
+    )
+    assert response.status_code == 200
+    assert client.get_cookie("db_sticky") is not None
+
+    routed["replica"].clear()
+    response = client.get("/api/users/1")
+    assert response.get_json()["name"] == "新名字"
+    assert routed["replica"] == []
+
+    # 其它客户端（或其它进程收到的其它客户端请求）仍读副本，看到复制前的数据
+    other = app.test_client()
+    assert other.get("/api/users/1").get_json()["name"] == "管理员"
+
+
+def test_forged_or_expired_cookie_reads_replica(app, client, routed, monkeypatch):
+    client.set_cookie("db_sticky", "1.forged.signature")
+    assert client.get("/api/users/1").get_json()["name"] == "管理员"
+
+    # 签名时间早于 REPLICA_STICKY_SECONDS 的 cookie 视为过期
+    now = time.time()
+    with monkeypatch.context() as patch:
+        patch.setattr(TimestampSigner, "get_timestamp", lambda self: int(now) - 60)
+        client.put(
+            "/api/users/1/info",
+            json={"username": "admin", "role": "ADMIN", "name": "新名字"},
+        )
+    assert client.get_cookie("db_sticky") is not None
+    assert client.get("/api/users/1").get_json()["name"] == "管理员"
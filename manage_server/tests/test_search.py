@@ -0,0 +1,159 @@
+"""
+全文索引在后台构建：构建完成前搜索返回 503，构建期间提交的变更排队，构建完成后补上
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+import search
+from extensions import db
+from models import Task, UserRoles
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def app_config(app_config, request):
+    return {**app_config, "SEARCH_BACKEND": request.param}
+
+
+def wait_built(timeout=5):
+    thread = search._builder.thread
+    thread.join(timeout)
+    assert not thread.is_alive()
+
+
+def test_first_search_builds_in_background(client, users, auth, add_projects):
+    add_projects(1)
+    headers = auth(users[UserRoles.ADMIN])
+
+    response = client.get("/api/search?q=任务", headers=headers)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    wait_built()
+
+    response = client.get("/api/search?q=任务&type=task", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["total"] == 3
+
+
+def test_commits_during_build_are_applied_after(
+    app, client, users, auth, add_projects, monkeypatch
+):
+    add_projects(1)
+    loaded = threading.Event()
+    release = threading.Event()
+    load_all = search._load_all
+
+    def slow_load(index, batch_size):
+        total = load_all(index, batch_size)
+        loaded.set()
+        release.wait(5)
+        return total
+
+    monkeypatch.setattr(search, "_load_all", slow_load)
+    headers = auth(users[UserRoles.ADMIN])
+    assert client.get("/api/search?q=新增", headers=headers).status_code == 503
+    assert loaded.wait(5)
+
+    # 构建线程读完数据库之后、标记就绪之前提交的任务
+    with app.app_context():
+        db.session.add(
+            Task(
+                title="新增任务",
+                project_id=1,
+                assignee_id=users[UserRoles.MEMBER],
+                due_date=datetime.now(),
+            )
+        )
+        db.session.commit()
+    assert client.get("/api/search?q=新增", headers=headers).status_code == 503
+    assert search._builder.pending  # 先排队，不写入正在构建的索引
+
+    release.set()
+    wait_built()
+    response = client.get("/api/search?q=新增", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["total"] == 1
+
+
+def test_failed_build_restarts_on_next_search(
+    client, users, auth, add_projects, monkeypatch
+):
+    add_projects(1)
+    load_all = search._load_all
+    calls = []
+
+    def fail_once(index, batch_size):
+        calls.append(batch_size)
+        if len(calls) == 1:
+            raise RuntimeError("数据库不可用")
+        return load_all(index, batch_size)
+
+    monkeypatch.setattr(search, "_load_all", fail_once)
+    headers = auth(users[UserRoles.ADMIN])
+    assert client.get("/api/search?q=任务", headers=headers).status_code == 503
+    wait_built()
+    assert search._builder.pending is None
+
+    assert client.get("/api/search?q=任务", headers=headers).status_code == 503
+    wait_built()
+    assert client.get("/api/search?q=任务", headers=headers).status_code == 200
+    assert len(calls) == 2
+
+
+def test_sqlite_connections_shared_between_threads(tmp_path):
+    index = search.SqliteFtsIndex(str(tmp_path / "fts.db"))
+    docs = [
+        search.Document(
+            ("task", id), f"任务{id}", search.tokenize(f"任务{id}"), 1, None
+        )
+        for id in range(1, 101)
+    ]
+    with ThreadPoolExecutor(4) as executor:
+        list(executor.map(lambda doc: index.apply([doc], []), docs))
+    assert index.count() == 100
+    # 连接用完放回，打开的连接数不超过同时执行的线程数
+    assert 1 <= len(index._pool._idle) <= 4
+
+
+def test_tokenize_indexes_single_characters():
+    assert search.tokenize("项目张三") == ["项目", "目张", "张三"]
+    assert search.tokenize("项目张三", unigrams=True) == [
+        "项目",
+        "目张",
+        "张三",
+        "项",
+        "目",
+        "张",
+        "三",
+    ]
+    assert search.tokenize("张") == ["张"]
+
+
+def test_single_character_query(client, users, auth, add_projects):
+    add_projects(1)
+    headers = auth(users[UserRoles.ADMIN])
+    client.get("/api/search?q=目", headers=headers)
+    wait_built()
+
+    # 「目」只出现在「项目」中，以前只能匹配单独出现的汉字
+    response = client.get("/api/search?q=目&type=project", headers=headers)
+    assert response.get_json()["total"] == 1
+    response = client.get("/api/search?q=评&type=comment", headers=headers)
+    assert response.get_json()["total"] == 6
+
+
+def test_old_sqlite_index_is_rebuilt(tmp_path):
+    index = search.SqliteFtsIndex(str(tmp_path / "fts.db"))
+    index.mark_ready()
+    assert index.ready
+
+    def mark_old_version(conn):
+        with conn:
+            conn.execute("UPDATE search_meta SET value = '1'")
+
+    # 旧版本写入的就绪标记，切词方式不同，需要重建
+    index._pool.run(mark_old_version)
+    assert not index.ready
@@ -0,0 +1,15 @@
+"""
+冷启动：在新进程中调用 create_app，按需加载的模块不应出现在 sys.modules 中
+"""
+
+from benchmarks.startup_bench import LAZY_MODULES, run_once
+
+# 进程总耗时上限（毫秒），只用于发现明显的回退，留出 CI 机器的波动余量
+STARTUP_BUDGET_MS = 10000
+
+
+def test_create_app_skips_lazy_modules(tmp_path):
+    child, wall, _ = run_once(f"sqlite:///{tmp_path / 'startup.db'}")
+    assert {"openpyxl", "flask_mail", "flask_migrate"} <= set(LAZY_MODULES)
+    assert child["loaded"] == []
+    assert wall < STARTUP_BUDGET_MS
@@ -0,0 +1,69 @@
+"""
+附件去重存储：引用计数归零的文件被删除，与并发上传相同内容交错时被引用的文件不会丢失
+"""
+
+import io
+import os
+
+import pytest
+
+import storage
+from config import Config
+from extensions import db
+
+
+@pytest.fixture(autouse=True)
+def upload_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "UPLOAD_FOLDER", str(tmp_path / "uploads"))
+
+
+def upload(content):
+    """模拟上传请求：写临时文件、增加引用并提交，之后放置文件"""
+    digest, size, tmp_path = storage.save_stream(io.BytesIO(content))
+    storage.acquire(digest, size)
+    db.session.commit()
+    storage.place_blob(tmp_path, digest)
+    return digest
+
+
+def test_last_release_removes_blob(app):
+    with app.app_context():
+        digest = upload(b"content")
+        upload(b"content")
+        assert os.listdir(os.path.dirname(storage.blob_path(digest))) == [digest]
+
+        assert storage.release(digest) is None
+        orphan = storage.release(digest)
+        db.session.commit()
+        storage.remove_blob(orphan)
+        assert not os.path.exists(storage.blob_path(digest))
+
+
+def test_upload_between_release_and_remove_keeps_blob(app):
+    with app.app_context():
+        digest = upload(b"shared")
+        orphan = storage.release(digest)
+        db.session.commit()
+
+        # 删除方提交后、删除文件前，另一个请求上传了相同内容并提交了引用
+        upload(b"shared")
+        storage.remove_blob(orphan)
+        with open(storage.blob_path(digest), "rb") as f:
+            assert f.read() == b"shared"
+
+
+def test_remove_before_upload_commit_keeps_blob(app):
+    with app.app_context():
+        digest = upload(b"shared")
+        orphan = storage.release(digest)
+        db.session.commit()
+
+        # 上传方已写好临时文件但还没提交引用时，删除方删掉了文件
+        _, size, tmp_path = storage.save_stream(io.BytesIO(b"shared"))
+        storage.remove_blob(orphan)
+        assert not os.path.exists(storage.blob_path(digest))
+
+        storage.acquire(digest, size)
+        db.session.commit()
+        storage.place_blob(tmp_path, digest)
+        assert os.path.exists(storage.blob_path(digest))
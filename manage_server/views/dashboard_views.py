@@ -0,0 +1,118 @@
+from flask import Blueprint, g, jsonify
+from sqlalchemy import func
+from models import (
+    Project,
+    ProjectArchive,
+    ProjectStatus,
+    Process,
+    Task,
+    User,
+    TaskStatus,
+)
+from datetime import datetime, timedelta
+from extensions import db
+from .utils import login_required
+
+dashboard_bp = Blueprint("dashboard", __name__)
+
+
+@dashboard_bp.route("/api/dashboard/summary", methods=["GET"])
+@login_required
+def get_dashboard_summary():
+    user = g.current_user
+
+    # 与列表接口一致：管理员查看全部，其他用户只统计自己负责的项目
+    def scoped(query):
+        if user.role.value not in ["管理员"]:
+            query = query.filter(Project.manager_id == user.id)
+        return query
+
+    active = Project.status != "ARCHIVED"
+
+    projects_by_status = dict(
+        scoped(
+            db.session.query(Project.status, func.count(Project.id))
+            .filter(active)
+            .group_by(Project.status)
+        ).all()
+    )
+    # 已归档的项目写入归档层后会从热表中删除，按归档层计数；
+    # 还没移动完的项目在两边都有记录，热表中已归档的不再重复计算
+    archived = db.session.query(func.count(ProjectArchive.id))
+    if user.role.value not in ["管理员"]:
+        archived = archived.filter(ProjectArchive.manager_id == user.id)
+    projects_by_status[ProjectStatus.ARCHIVED] = archived.scalar() or 0
+
+    projects_by_priority = scoped(
+        db.session.query(Project.priority, func.count(Project.id))
+        .filter(active)
+        .group_by(Project.priority)
+    ).all()
+
+    tasks_by_status = scoped(
+        db.session.query(Task.status, func.count(Task.id))
+        .join(Project, Task.project_id == Project.id)
+        .filter(active)
+        .group_by(Task.status)
+    ).all()
+
+    now = datetime.utcnow() + timedelta(hours=8)
+    overdue_tasks = scoped(
+        db.session.query(func.count(Task.id))
+        .join(Project, Task.project_id == Project.id)
+        .filter(active, Task.status != TaskStatus.COMPLETED, Task.due_date < now)
+    ).scalar()
+
+    average_completion_rate = scoped(
+        db.session.query(func.avg(Process.completion_rate))
+        .join(Project, Process.project_id == Project.id)
+        .filter(active)
+    ).scalar()
+
+    project_counts = scoped(
+        db.session.query(Project.manager_id, func.count(Project.id))
+        .filter(active)
+        .group_by(Project.manager_id)
+    ).all()
+    task_counts = dict(
+        scoped(
+            db.session.query(Project.manager_id, func.count(Task.id))
+            .join(Task, Task.project_id == Project.id)
+            .filter(active)
+            .group_by(Project.manager_id)
+        ).all()
+    )
+    manager_names = dict(
+        db.session.query(User.id, User.name)
+        .filter(User.id.in_([manager_id for manager_id, _ in project_counts]))
+        .all()
+    )
+
+    return jsonify(
+        {
+            "projects_by_status": {
+                status.value: count for status, count in projects_by_status.items()
+            },
+            "total_projects": sum(projects_by_status.values()),
+            "projects_by_priority": {
+                (priority.value if priority else None): count
+                for priority, count in projects_by_priority
+            },
+            "tasks_by_status": {
+                status.value: count for status, count in tasks_by_status
+            },
+            "overdue_tasks": overdue_tasks or 0,
+            "average_completion_rate": round(
+                float(average_completion_rate or 0) * 100, 2
+            ),
+            "managers": [
+                {
+                    "manager_id": manager_id,
+                    "manager_name": manager_names.get(manager_id),
+                    "projects": count,
+                    "tasks": task_counts.get(manager_id, 0),
+                }
+                for manager_id, count in project_counts
+            ],
+        }
+    )
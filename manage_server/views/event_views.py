@@ -0,0 +1,33 @@
+from flask import Blueprint, Response, current_app, jsonify, request
+from .utils import get_current_user
+import events
+
+event_bp = Blueprint("event", __name__)
+
+
+@event_bp.route("/api/events", methods=["GET"])
+def stream_events():
+    # EventSource 不能设置请求头，允许通过 access_token 查询参数传递 token
+    user, error_message = get_current_user(query_token="access_token")
+    if user is None:
+        return jsonify({"error": "解析授权令牌失败", "message": error_message}), 401
+
+    config = current_app.config
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+        "last_event_id"
+    )
+    body = events.stream(
+        user.id,
+        user.role.value in ["管理员"],
+        last_event_id,
+        config["EVENT_HEARTBEAT"],
+        config["EVENT_STREAM_MAX_SECONDS"],
+    )
+    return Response(
+        body,
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # 关闭 nginx 的响应缓冲
+        },
+    )
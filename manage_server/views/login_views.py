@@ -1,6 +1,6 @@
 import jwt
 import datetime
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, g, jsonify, request
 from models import User, AccountStatus
 from extensions import (
     db,
@@ -8,14 +8,22 @@ from extensions import (
     generate_random_verification_code,
 )
 from config import Config
-from .utils import get_user_id_from_token
+from hashing import PasswordHashBusy
+from ratelimit import rate_limit
+from .utils import login_required
 from datetime import datetime, timedelta
 
 
 login_bp = Blueprint("login", __name__)
 
 
+@login_bp.app_errorhandler(PasswordHashBusy)
+def handle_password_hash_busy(e):
+    return jsonify({"message": "服务繁忙，请稍后再试", "error": str(e)}), 503
+
+
 @login_bp.route("/api/login", methods=["POST"])
+@rate_limit("login", account_field="account")
 def login():
     data = request.get_json()
     account = data.get("account")
@@ -26,6 +34,10 @@ def login():
         if user.account_status == AccountStatus.INACTIVE:
             return jsonify({"message": "账户已禁用"}), 403
 
+        # 哈希策略变更后，在登录时用明文密码重新计算哈希
+        if user.password_needs_rehash():
+            user.set_password(password)
+
         user.last_login_ip = request.remote_addr
         user.last_login_at = datetime.utcnow() + timedelta(hours=8)
         db.session.commit()
@@ -45,6 +57,7 @@ def login():
 
 
 @login_bp.route("/api/send-verification-code", methods=["POST"])
+@rate_limit("verification", account_field="email")
 def send_verification_code():
     data = request.get_json()
     email = data.get("email")
@@ -65,6 +78,7 @@ def send_verification_code():
 
 
 @login_bp.route("/api/check-email-registered", methods=["POST"])
+@rate_limit("check_email")
 def check_email_registered():
     data = request.get_json()
     email = data.get("email")
@@ -91,6 +105,7 @@ def register():
 
 
 @login_bp.route("/api/recover-account", methods=["POST"])
+@rate_limit("recover", account_field="email")
 def recover_account():
     data = request.get_json()
     email = data.get("email")
@@ -109,28 +124,12 @@ def recover_account():
 
 
 @login_bp.route("/api/user-role", methods=["GET"])
+@login_required
 def get_user_role():
-    token = request.headers.get("Authorization").split(" ")[1]
-    user_id, error_message = get_user_id_from_token(token)
-    if user_id is None:
-        return jsonify({"message": error_message}), 401
-
-    user = User.query.get(user_id)
-    if user:
-        return jsonify({"role": user.role.value}), 200
-    else:
-        return jsonify({"message": "用户不存在"}), 404
+    return jsonify({"role": g.current_user.role.value}), 200
 
 
 @login_bp.route("/api/current-user-name", methods=["GET"])
+@login_required
 def get_current_user_name():
-    token = request.headers.get("Authorization").split(" ")[1]
-    user_id, error_message = get_user_id_from_token(token)
-    if user_id is None:
-        return jsonify({"message": error_message}), 401
-
-    user = User.query.get(user_id)
-    if user:
-        return jsonify({"username": user.name}), 200
-    else:
-        return jsonify({"message": "用户不存在"}), 404
+    return jsonify({"username": g.current_user.name}), 200
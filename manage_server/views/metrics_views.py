@@ -0,0 +1,21 @@
+import hmac
+
+from flask import Blueprint, Response, current_app, jsonify, request
+from extensions import db, mail_worker
+import metrics
+
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+def get_metrics():
+    token = current_app.config["METRICS_TOKEN"]
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization") or "", f"Bearer {token}"
+    ):
+        return jsonify({"error": "无权访问监控指标"}), 401
+
+    return Response(
+        metrics.render(db.engines, mail_worker.metrics()),
+        mimetype="text/plain; version=0.0.4",
+    )
@@ -1,46 +1,89 @@
-from flask import Blueprint, jsonify, request
-from models import Project, User, Process, ArchivedProject, Task
+from flask import Blueprint, current_app, g, jsonify, request
+from models import (
+    Comment,
+    CommentArchive,
+    Process,
+    Project,
+    ProjectArchive,
+    ProjectStatus,
+    Task,
+    TaskArchive,
+    User,
+)
 from datetime import datetime, timedelta
 from extensions import db
-from .utils import get_user_id_from_token
+from cache import cached_response
+from query_guard import query_budget
+from serializers import (
+    archived_project_rows,
+    process_rows,
+    project_rows,
+    serialize_archived_project,
+    serialize_process,
+    serialize_project,
+)
+from .utils import login_required, paginate_query
+import archive
+import events
+import storage
 
 project_bp = Blueprint("project", __name__)
 
+# 项目、进度和归档列表支持的过滤和排序参数
+PROJECT_FILTERS = {
+    "status": (Project.status, "eq"),
+    "priority": (Project.priority, "eq"),
+    "manager_id": (Project.manager_id, "eq"),
+    "start_from": (Project.start_date, "ge"),
+    "end_to": (Project.end_date, "le"),
+}
+PROJECT_SORTS = {
+    "start_date": Project.start_date,
+    "end_date": Project.end_date,
+    "name": Project.name,
+}
+PROCESS_FILTERS = {
+    "project_id": (Process.project_id, "eq"),
+    "priority": (Project.priority, "eq"),
+    "updated_from": (Process.update_time, "ge"),
+    "updated_to": (Process.update_time, "le"),
+}
+PROCESS_SORTS = {
+    "update_time": Process.update_time,
+    "completion_rate": Process.completion_rate,
+}
+ARCHIVED_FILTERS = {
+    "project_id": (ProjectArchive.id, "eq"),
+    "archived_from": (ProjectArchive.archived_date, "ge"),
+    "archived_to": (ProjectArchive.archived_date, "le"),
+}
+ARCHIVED_SORTS = {"archived_date": ProjectArchive.archived_date}
+
 
 @project_bp.route("/api/projects", methods=["GET"])
+@login_required
+@cached_response("projects", "user_names")
+@query_budget(4)
 def get_projects():
-    token = request.headers.get("Authorization")
-    user_id = None
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
-    user = User.query.get(user_id)
-    if user.role.value in ["管理员"]:
-        projects = (
-            Project.query.filter(
-                Project.status != "ARCHIVED",
-            ).all()
-            if user_id
-            else Project.query.filter(Project.status != "ARCHIVED").all()
-        )
-    else:
-        projects = (
-            Project.query.filter(
-                Project.status != "ARCHIVED", Project.manager_id == user_id
-            ).all()
-            if user_id
-            else Project.query.filter(Project.status != "ARCHIVED").all()
-        )
-
-    total = len(projects)
-    return jsonify(
-        {"total": total, "projects": [
-            project.to_dict() for project in projects]}
+    user = g.current_user
+    user_id = user.id
+
+    query = project_rows().filter(Project.status != "ARCHIVED")
+    if user.role.value not in ["管理员"]:
+        query = query.filter(Project.manager_id == user_id)
+
+    result, error_message = paginate_query(
+        query,
+        Project,
+        "projects",
+        request.args,
+        filters=PROJECT_FILTERS,
+        sorts=PROJECT_SORTS,
+        serialize=serialize_project,
     )
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
+    return jsonify(result)
 
 
 @project_bp.route("/api/projects/<int:project_id>", methods=["GET"])
@@ -50,18 +93,13 @@ def get_project_details(project_id):
 
 
 @project_bp.route("/api/projects", methods=["POST"])
+@login_required
 def create_project():
     data = request.json
-    token = request.headers.get("Authorization")
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
+    user = g.current_user
+    user_id = user.id
 
-    user = User.query.get(user_id)
-    if not user or user.role.value not in ["经理", "管理员"]:
+    if user.role.value not in ["经理", "管理员"]:
         return jsonify({"error": "该用户没有权限创建项目"}), 403
 
     new_project = Project(
@@ -85,14 +123,9 @@ def create_project():
 
 
 @project_bp.route("/api/projects/<int:project_id>", methods=["PUT"])
+@login_required
 def update_project(project_id):
-    token = request.headers.get("Authorization")
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
+    user_id = g.current_user.id
 
     project = Project.query.get_or_404(project_id)
     if user_id != project.manager_id:
@@ -106,71 +139,97 @@ def update_project(project_id):
     project.status = data.get("status", project.status)
     project.priority = data.get("priority", project.priority)
 
-    if project.status == "ARCHIVED":
-        archived_project = ArchivedProject(
-            project_id=project.id, archived_date=datetime.utcnow() + timedelta(hours=8)
-        )
-        db.session.add(archived_project)
+    archived = db.session.get(ProjectArchive, project.id)
+    archiving = project.status in ("ARCHIVED", ProjectStatus.ARCHIVED)
+    if archiving:
+        # 先写入归档层的项目记录，任务和评论由后台分批移动
+        archive.archive_project(project)
 
     try:
         db.session.commit()
-        return jsonify({"id": project.id, "message": "项目更新成功"})
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "数据库错误", "message": str(e)}), 500
 
+    if archiving:
+        archive.archive_worker.notify()
+    elif archived is not None:
+        # 归档尚未完成时状态被改回，把已经移走的部分移回来
+        archive.restore_project(archived, current_app.config["ARCHIVE_BATCH_SIZE"])
+    return jsonify({"id": project.id, "message": "项目更新成功"})
+
 
 @project_bp.route("/api/projects/<int:project_id>", methods=["DELETE"])
+@login_required
 def delete_project(project_id):
-    token = request.headers.get("Authorization")
+    user_id = g.current_user.id
 
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
-    project = Project.query.get_or_404(project_id)
+    # 已经完全移入归档层的项目在热表中不存在
+    project = db.session.get(Project, project_id) or ProjectArchive.query.get_or_404(
+        project_id
+    )
     if user_id != project.manager_id:
         return jsonify({"error": "该用户没有权限删除此项目"}), 403
 
-    process = Process.query.filter_by(project_id=project.id).first()
-    tasks = Task.query.filter_by(project_id=project.id).all()
-    for task in tasks:
-        db.session.delete(task)
-    db.session.delete(process)
-    db.session.delete(project)
+    # 按项目批量删除热表和归档层中的评论、任务、进度和项目，不逐条加载任务
+    digests = [
+        digest
+        for model in (Task, TaskArchive)
+        for (url,) in db.session.query(model.attachmentUrl).filter(
+            model.project_id == project_id, model.attachmentUrl.isnot(None)
+        )
+        if (digest := storage.parse_attachment_url(url))
+    ]
+    orphans = storage.release_many(digests)
+    statements = [
+        db.delete(Comment).where(
+            Comment.task_id.in_(db.select(Task.id).where(Task.project_id == project_id))
+        ),
+        db.delete(CommentArchive).where(
+            CommentArchive.task_id.in_(
+                db.select(TaskArchive.id).where(TaskArchive.project_id == project_id)
+            )
+        ),
+        db.delete(Task).where(Task.project_id == project_id),
+        db.delete(TaskArchive).where(TaskArchive.project_id == project_id),
+        db.delete(Process).where(Process.project_id == project_id),
+        db.delete(ProjectArchive).where(ProjectArchive.id == project_id),
+        db.delete(Project).where(Project.id == project_id),
+    ]
+    for statement in statements:
+        db.session.execute(statement.execution_options(synchronize_session=False))
+    events.record(
+        db.session, "project.deleted", {"id": project_id}, project.manager_id
+    )
     db.session.commit()
+    storage.remove_blobs_in_background(orphans)
     return jsonify({"result": True, "message": "项目删除成功"})
 
 
 @project_bp.route("/api/processes", methods=["GET"])
+@login_required
+@cached_response("process", "projects")
+@query_budget(4)
 def get_processes():
-    token = request.headers.get("Authorization")
+    user_id = g.current_user.id
 
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
-    processes = Process.query.join(Project).filter(
-        Project.status != "ARCHIVED")
-
-    if user_id:
-        user = User.query.get(user_id)
-        if user.role.value in ["管理员"]:
-            processes = processes.all()
-        else:
-            processes = processes.filter(Project.manager_id == user_id).all()
-    else:
-        processes = processes.all()
-
-    total = len(processes)
-    return jsonify(
-        {"total": total, "processes": [
-            process.to_dict() for process in processes]}
+    processes = process_rows().filter(Project.status != "ARCHIVED")
+
+    if g.current_user.role.value not in ["管理员"]:
+        processes = processes.filter(Project.manager_id == user_id)
+
+    result, error_message = paginate_query(
+        processes,
+        Process,
+        "processes",
+        request.args,
+        filters=PROCESS_FILTERS,
+        sorts=PROCESS_SORTS,
+        serialize=serialize_process,
     )
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
+    return jsonify(result)
 
 
 @project_bp.route("/api/processes/<int:process_id>", methods=["GET"])
@@ -180,14 +239,9 @@ def get_process_by_id(process_id):
 
 
 @project_bp.route("/api/processes/<int:id>", methods=["PUT"])
+@login_required
 def update_process(id):
-    token = request.headers.get("Authorization")
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
+    user_id = g.current_user.id
 
     process = Process.query.get_or_404(id)
     if user_id != process.project.manager_id:
@@ -207,35 +261,44 @@ def update_process(id):
 
 
 @project_bp.route("/api/archived-project", methods=["GET"])
+@login_required
+@cached_response("project_archive", "user_names")
+@query_budget(4)
 def get_archived_projects():
-    token = request.headers.get("Authorization")
+    user = g.current_user
+    user_id = user.id
+
+    # 从归档层读取，不再关联热表中的项目
+    query = archived_project_rows()
+    if user.role.value not in ["管理员"]:
+        query = query.filter(ProjectArchive.manager_id == user_id)
+
+    result, error_message = paginate_query(
+        query,
+        ProjectArchive,
+        "projects",
+        request.args,
+        filters=ARCHIVED_FILTERS,
+        sorts=ARCHIVED_SORTS,
+        serialize=serialize_archived_project,
+    )
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
+    return jsonify(result)
+
+
+@project_bp.route("/api/archived-project/<int:project_id>/restore", methods=["POST"])
+@login_required
+def restore_archived_project(project_id):
+    user = g.current_user
+
+    archived = ProjectArchive.query.get_or_404(project_id)
+    if user.role.value not in ["管理员"] and user.id != archived.manager_id:
+        return jsonify({"error": "该用户没有权限恢复此项目"}), 403
 
     try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
+        archive.restore_project(archived, current_app.config["ARCHIVE_BATCH_SIZE"])
     except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-    user = User.query.get(user_id)
-    if user.role.value in ["管理员"]:
-        archived_projects = (
-            ArchivedProject.query.join(Project).all()
-            if user_id
-            else ArchivedProject.query.all()
-        )
-    else:
-        archived_projects = (
-            ArchivedProject.query.join(Project).filter(
-                Project.manager_id == user_id).all()
-            if user_id
-            else ArchivedProject.query.all()
-        )
-
-    total = len(archived_projects)
-    return jsonify(
-        {
-            "total": total,
-            "projects": [
-                archived_project.to_dict() for archived_project in archived_projects
-            ],
-        }
-    )
+        db.session.rollback()
+        return jsonify({"error": "数据库错误", "message": str(e)}), 500
+    return jsonify({"id": project_id, "message": "项目恢复成功"})
@@ -0,0 +1,66 @@
+from flask import Blueprint, g, jsonify, request
+from models import Project, ProjectStatus
+from extensions import db
+from .utils import login_required
+import search
+
+search_bp = Blueprint("search", __name__)
+
+SEARCH_MAX_LIMIT = 100
+SEARCH_RETRY_AFTER = 5  # 索引构建期间建议客户端等待的秒数
+
+
+@search_bp.route("/api/search", methods=["GET"])
+@login_required
+def search_documents():
+    user = g.current_user
+
+    query = request.args.get("q", "").strip()
+    if not search.tokenize(query):
+        return jsonify({"error": "搜索关键词不能为空"}), 400
+
+    kinds = None
+    if request.args.get("type"):
+        kinds = set(request.args["type"].split(","))
+        if not kinds <= set(search.KIND_CODES):
+            return jsonify({"error": "查询参数无效", "message": "不支持的搜索类型"}), 400
+
+    limit = request.args.get("limit", 20, type=int)
+    offset = request.args.get("offset", 0, type=int)
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
+    offset = max(0, offset)
+
+    # 与列表接口一致：管理员查看全部，其他用户只能看到自己负责的项目和分配给自己的任务
+    visible = None
+    if user.role.value not in ["管理员"]:
+        project_ids = db.session.scalars(
+            db.select(Project.id).where(
+                Project.manager_id == user.id,
+                Project.status != ProjectStatus.ARCHIVED,
+            )
+        )
+        visible = (set(project_ids), user.id)
+
+    result = search.search(query, kinds, visible, limit, offset)
+    if result is None:
+        response = jsonify({"error": "搜索索引正在构建", "message": "请稍后重试"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(SEARCH_RETRY_AFTER)
+        return response
+    total, hits = result
+    return jsonify(
+        {
+            "total": total,
+            "results": [
+                {
+                    "type": kind,
+                    "id": id,
+                    "title": title,
+                    "project_id": project_id,
+                    "score": round(score, 4),
+                }
+                for score, (kind, id), title, project_id in hits
+            ],
+            "has_more": offset + len(hits) < total,
+        }
+    )
@@ -1,63 +1,86 @@
-from flask import Blueprint, jsonify, request, send_file
-from models import Task, User, Project, Comment
+from flask import Blueprint, g, jsonify, request
+from models import Task, User, Project, Comment, TaskStatus
+from datetime import datetime
+from sqlalchemy import insert
 from extensions import db
-from .utils import get_user_id_from_token
+from config import Config
+from werkzeug.security import safe_join
+from cache import cached_response
+from query_guard import query_budget
+from concurrency import run_blocking
+from serializers import comment_rows, serialize_comment, serialize_task, task_rows
+from .utils import (
+    login_required,
+    paginate_query,
+    paginate_timeline,
+    send_attachment,
+)
 import os
+import events
+import storage
+from collections import Counter
 
 task_bp = Blueprint("task", __name__)
 
+# 任务列表支持的过滤和排序参数
+TASK_FILTERS = {
+    "status": (Task.status, "eq"),
+    "priority": (Project.priority, "eq"),
+    "assignee_id": (Task.assignee_id, "eq"),
+    "project_id": (Task.project_id, "eq"),
+    "due_from": (Task.due_date, "ge"),
+    "due_to": (Task.due_date, "le"),
+}
+TASK_SORTS = {"due_date": Task.due_date, "title": Task.title}
+
 
 @task_bp.route("/api/tasks", methods=["GET"])
+@login_required
+@cached_response("tasks", "projects", "user_names")
+@query_budget(4)
 def get_tasks():
-    token = request.headers.get("Authorization")
-    user_id = None
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
-    user = User.query.get(user_id)
-    if user.role.value in ["管理员"]:
-        tasks = (
-            Task.query.join(Project)
-            .filter(
-                (Project.status != "ARCHIVED")
-                if user_id
-                else True
-            )
-            .all()
-        )
-    else:
-        tasks = (
-            Task.query.join(Project)
-            .filter(
-                (Project.status != "ARCHIVED") & (
-                    Project.manager_id == user_id)
-                if user_id
-                else True
-            )
-            .all()
-        )
-    total = len(tasks)
-    return jsonify({"total": total, "tasks": [task.to_dict() for task in tasks]})
+    user = g.current_user
+    user_id = user.id
+
+    query = task_rows().filter(Project.status != "ARCHIVED")
+    if user.role.value not in ["管理员"]:
+        query = query.filter(Project.manager_id == user_id)
+
+    result, error_message = paginate_query(
+        query,
+        Task,
+        "tasks",
+        request.args,
+        filters=TASK_FILTERS,
+        sorts=TASK_SORTS,
+        serialize=serialize_task,
+    )
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
+    return jsonify(result)
 
 
 @task_bp.route("/api/tasks/member", methods=["GET"])
+@login_required
+@cached_response("tasks", "projects", "user_names")
+@query_budget(4)
 def get_member_tasks():
-    token = request.headers.get("Authorization")
-    user_id = None
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
-    tasks = Task.query.filter_by(assignee_id=user_id).all()
-    total = len(tasks)
-    return jsonify({"total": total, "tasks": [task.to_dict() for task in tasks]})
+    user_id = g.current_user.id
+
+    query = task_rows().filter(Task.assignee_id == user_id)
+
+    result, error_message = paginate_query(
+        query,
+        Task,
+        "tasks",
+        request.args,
+        filters=TASK_FILTERS,
+        sorts=TASK_SORTS,
+        serialize=serialize_task,
+    )
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
+    return jsonify(result)
 
 
 @task_bp.route("/api/tasks/<int:task_id>", methods=["GET"])
@@ -67,6 +90,7 @@ def get_task_by_id(task_id):
 
 
 @task_bp.route("/api/tasks", methods=["POST"])
+@login_required
 def create_task():
     data = request.get_json()
     title = data.get("title")
@@ -75,17 +99,9 @@ def create_task():
     assignee_id = data.get("assignee_id")
     project_id = data.get("project_id")
     status = data.get("status")
-    token = request.headers.get("Authorization")
-    try:
-        token = token.split(" ")[1]
-        user_id, error_message = get_user_id_from_token(token)
-    except Exception as e:
-        user_id = None
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
-    user = User.query.get(user_id)
+    user = g.current_user
     print(user.role.value)
-    if not user or user.role.value not in ["经理", "管理员", "成员"]:
+    if user.role.value not in ["经理", "管理员", "成员"]:
         return jsonify({"error": "该用户没有权限创建项目"}), 403
 
     new_task = Task(
@@ -102,7 +118,126 @@ def create_task():
     return jsonify({"id": new_task.id, "message": "任务创建成功"}), 201
 
 
+BULK_BATCH_SIZE = 500  # 批量插入时每条 INSERT 语句包含的行数
+
+
+def _to_id(value):
+    """关联 id 接受整数和数字字符串（与 create_task 一致），其它类型返回 None"""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+def _validate_task_rows(rows):
+    """
+    批量创建前逐行校验任务数据，关联的用户和项目各用一次查询确认存在
+    返回 (可插入的行, 错误列表)
+    """
+    # 先把 id 转成整数，列表、对象等无法比较的值在逐行校验时报告为该行的错误
+    ids = [
+        (_to_id(row.get("assignee_id")), _to_id(row.get("project_id"))) for row in rows
+    ]
+    assignee_ids = {assignee_id for assignee_id, _ in ids if assignee_id is not None}
+    project_ids = {project_id for _, project_id in ids if project_id is not None}
+    existing_users = {
+        user_id
+        for (user_id,) in db.session.query(User.id).filter(User.id.in_(assignee_ids))
+    }
+    existing_projects = {
+        project_id
+        for (project_id,) in db.session.query(Project.id).filter(
+            Project.id.in_(project_ids)
+        )
+    }
+
+    values, errors = [], []
+    for index, (row, (assignee_id, project_id)) in enumerate(zip(rows, ids), 1):
+        row_errors = []
+        title = row.get("title")
+        if not title:
+            row_errors.append("任务名称不能为空")
+        elif not isinstance(title, str):
+            row_errors.append("任务名称必须是文本")
+        description = row.get("description")
+        if description is not None and not isinstance(description, str):
+            row_errors.append("任务描述必须是文本")
+        due_date = row.get("due_date")
+        try:
+            due_date = datetime.fromisoformat(due_date)
+        except (TypeError, ValueError):
+            due_date = None
+            row_errors.append("截止时间格式无效")
+        if assignee_id is None:
+            row_errors.append("负责人 id 必须是整数")
+        elif assignee_id not in existing_users:
+            row_errors.append("负责人不存在")
+        if project_id is None:
+            row_errors.append("项目 id 必须是整数")
+        elif project_id not in existing_projects:
+            row_errors.append("项目不存在")
+        status = row.get("status") or TaskStatus.IN_PROGRESS.name
+        if not isinstance(status, str) or status not in TaskStatus.__members__:
+            row_errors.append("任务状态无效")
+
+        if row_errors:
+            errors.append({"row": index, "errors": row_errors})
+            continue
+        values.append(
+            {
+                "title": title,
+                "description": description,
+                "due_date": due_date,
+                "assignee_id": assignee_id,
+                "project_id": project_id,
+                "status": TaskStatus[status],
+            }
+        )
+    return values, errors
+
+
+@task_bp.route("/api/tasks/bulk", methods=["POST"])
+@login_required
+def create_tasks_bulk():
+    user = g.current_user
+    if user.role.value not in ["经理", "管理员", "成员"]:
+        return jsonify({"error": "该用户没有权限创建项目"}), 403
+
+    rows = (request.get_json() or {}).get("tasks") or []
+    if not rows or not all(isinstance(row, dict) for row in rows):
+        return jsonify({"error": "任务列表不能为空"}), 400
+
+    values, errors = _validate_task_rows(rows)
+    if errors:
+        return jsonify({"error": "数据校验失败", "errors": errors}), 400
+
+    # 所有批次在同一个事务中插入
+    for start in range(0, len(values), BULK_BATCH_SIZE):
+        db.session.execute(insert(Task), values[start : start + BULK_BATCH_SIZE])
+
+    # 批量插入不经过 flush，按项目和负责人汇总成一条事件
+    groups = Counter((row["project_id"], row["assignee_id"]) for row in values)
+    managers = dict(
+        db.session.query(Project.id, Project.manager_id).filter(
+            Project.id.in_({project_id for project_id, _ in groups})
+        )
+    )
+    for (project_id, assignee_id), count in groups.items():
+        events.record(
+            db.session,
+            "task.bulk_created",
+            {"project_id": project_id, "assignee_id": assignee_id, "count": count},
+            managers.get(project_id),
+            assignee_id,
+        )
+    db.session.commit()
+
+    return jsonify({"created": len(values), "message": "任务批量创建成功"}), 201
+
+
 @task_bp.route("/api/tasks/<int:task_id>", methods=["PUT"])
+@login_required
 def update_task(task_id):
     data = request.get_json()
     title = data.get("title")
@@ -110,14 +245,7 @@ def update_task(task_id):
     due_date = data.get("due_date")
     project_id = data.get("project_id")
     status = data.get("status")
-    token = request.headers.get("Authorization")
-
-    try:
-        token = token.split(" ")[1]
-        user_id, error_message = get_user_id_from_token(token)
-    except Exception as e:
-        user_id = None
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
+    user_id = g.current_user.id
 
     task = Task.query.get_or_404(task_id)
     if user_id != task.project.manager_id:
@@ -135,20 +263,20 @@ def update_task(task_id):
 
 
 @task_bp.route("/api/tasks/<int:task_id>", methods=["DELETE"])
+@login_required
 def delete_task(task_id):
-    token = request.headers.get("Authorization")
-    try:
-        token = token.split(" ")[1]
-        user_id, error_message = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
+    user_id = g.current_user.id
 
     task = Task.query.get_or_404(task_id)
     if user_id != task.assignee_id:
         return jsonify({"error": "该用户没有权限删除此任务"}), 403
 
+    digest = storage.parse_attachment_url(task.attachmentUrl)
+    orphan = storage.release(digest) if digest else None
     db.session.delete(task)
     db.session.commit()
+    if orphan:
+        storage.remove_blob(orphan)
 
     return jsonify({"result": True, "message": "任务删除成功"}), 200
 
@@ -158,17 +286,24 @@ def upload_file():
     try:
         file = request.files["file"]
         task_id = request.form.get("task_id")
-
-        upload_dir = "static/uploads"
-        if not os.path.exists(upload_dir):
-            os.makedirs(upload_dir)
-
-        file_path = os.path.join(upload_dir, file.filename).replace("\\", "/")
-        file.save(file_path)
-
         task = Task.query.get_or_404(task_id)
-        task.attachmentUrl = file_path
-        db.session.commit()
+
+        # 按内容摘要存储，相同文件只保存一份
+        digest, size, tmp_path = run_blocking(storage.save_stream, file.stream)
+        try:
+            storage.acquire(digest, size)
+            old_digest = storage.parse_attachment_url(task.attachmentUrl)
+            orphan = storage.release(old_digest) if old_digest else None
+
+            file_path = storage.make_attachment_url(digest, file.filename)
+            task.attachmentUrl = file_path
+            db.session.commit()
+            # 引用提交之后再放置文件，并发删除相同内容的文件时不会丢失
+            storage.place_blob(tmp_path, digest)
+        finally:
+            storage.discard_temp(tmp_path)
+        if orphan:
+            storage.remove_blob(orphan)
 
         return jsonify({"message": "文件上传成功", "file_path": file_path}), 201
 
@@ -177,28 +312,26 @@ def upload_file():
 
 
 @task_bp.route("/api/download/<path:filename>", methods=["GET"])
+@login_required
 def download_file(filename):
-    token = request.headers.get("Authorization")
-    user_id = None
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
     # 在这里进行权限检查，例如检查用户角色
-    user = User.query.get(user_id)
-    if not user or user.role.value not in [
+    user = g.current_user
+    if user.role.value not in [
         "管理员",
         "经理",
         "成员",
     ]:
         return jsonify({"error": "没有权限访问该文件"}), 403
 
-    file_path = filename
-    if os.path.exists(file_path):
-        return send_file(file_path)
+    # 内容寻址的附件直接用摘要作为强 ETag
+    digest = storage.parse_attachment_url(filename)
+    if digest:
+        file_path = storage.blob_path(digest)
+    else:
+        # 兼容旧格式的附件路径，只允许访问上传目录内的文件
+        file_path = safe_join(Config.UPLOAD_FOLDER, filename.split("/")[-1])
+    if file_path and os.path.exists(file_path):
+        return send_attachment(file_path, filename.split("/")[-1], etag=digest)
     else:
         return jsonify({"error": "文件不存在"}), 404
 
@@ -222,37 +355,38 @@ def update_task_status(id):
 
 
 @task_bp.route("/api/tasks/<int:id>/comments", methods=["GET"])
+@query_budget(2)
 def get_task_comments(id):
     task = Task.query.get_or_404(id)
-    comments = task.task_comments
+
+    # 按 (created_at, id) 排序，since 增量获取新评论，before 向前翻页
+    result, error_message = paginate_timeline(
+        comment_rows().filter(Comment.task_id == task.id),
+        Comment,
+        Comment.created_at,
+        "comments",
+        request.args,
+        serialize=serialize_comment,
+    )
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
     return jsonify(
-        {
-            "message": "获取评论信息成功",
-            "comments": [comment.to_dict() for comment in comments],
-        }
+        {"message": "获取评论信息成功", "comment_count": task.comment_count, **result}
     )
 
 
 @task_bp.route("/api/tasks/<int:id>/comments", methods=["POST"])
+@login_required
 def submit_task_comment(id):
     data = request.get_json()
     content = data.get("content")
-    token = request.headers.get("Authorization")
-    user_id = None
-
-    try:
-        token = token.split(" ")[1]
-        user_id, _ = get_user_id_from_token(token)
-    except Exception as e:
-        return jsonify({"error": "解析授权令牌失败", "message": str(e)}), 401
-
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({"error": "用户不存在"}), 404
+    user = g.current_user
 
     task = Task.query.get_or_404(id)
     comment = Comment(task_id=task.id, content=content, author_name=user.name)
     db.session.add(comment)
+    # 在数据库中原子加一，并发提交评论时计数不会丢失
+    task.comment_count = Task.comment_count + 1
     db.session.commit()
 
     return jsonify({"message": "评论提交成功", "comment": comment.to_dict()}), 201
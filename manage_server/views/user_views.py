@@ -1,36 +1,74 @@
-from flask import Blueprint, jsonify, request, send_file
-from models import User, AccountStatus
+from flask import (
+    Blueprint,
+    Response,
+    g,
+    jsonify,
+    request,
+    send_file,
+    stream_with_context,
+)
+from models import User, AccountStatus, UserRoles
 from extensions import db
-import openpyxl
-from io import BytesIO
+from hashing import hash_passwords
+from datetime import datetime
+from sqlalchemy import insert
+import csv
+import tempfile
+from io import StringIO, TextIOWrapper
+from urllib.parse import quote
 from config import Config
-import jwt
+from cache import cached_response
+from query_guard import query_budget
+from concurrency import run_blocking
+from serializers import serialize_user, user_rows
+from .utils import login_required, paginate_query
 
 user_bp = Blueprint("user", __name__)
 
+# 用户列表支持的过滤和排序参数
+USER_FILTERS = {
+    "role": (User.role, "eq"),
+    "account_status": (User.account_status, "eq"),
+    "created_from": (User.created_at, "ge"),
+    "created_to": (User.created_at, "le"),
+}
+USER_SORTS = {"created_at": User.created_at, "username": User.username}
+
 
 @user_bp.route("/api/users", methods=["GET"])
+@cached_response("users")
+@query_budget(3)
 def get_users():
-    users = User.query.all()
-    total = User.query.count()
-    return jsonify(
-        {
-            "total": total,
-            "users": [user.to_dict() for user in users],
-        }
+    result, error_message = paginate_query(
+        user_rows(),
+        User,
+        "users",
+        request.args,
+        filters=USER_FILTERS,
+        sorts=USER_SORTS,
+        serialize=serialize_user,
     )
-    
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
+    return jsonify(result)
+
+
 @user_bp.route("/api/users/members", methods=["GET"])
+@cached_response("users")
+@query_budget(3)
 def get_members():
-    members = User.query.filter(User.role == "MEMBER").all()
-    total = len(members)
-    return jsonify(
-        {
-            "total": total,
-            "members": [member.to_dict() for member in members],
-        }
+    result, error_message = paginate_query(
+        user_rows().filter(User.role == "MEMBER"),
+        User,
+        "members",
+        request.args,
+        filters=USER_FILTERS,
+        sorts=USER_SORTS,
+        serialize=serialize_user,
     )
-
+    if result is None:
+        return jsonify({"error": "查询参数无效", "message": error_message}), 400
+    return jsonify(result)
 
 
 @user_bp.route("/api/users/<int:user_id>", methods=["GET"])
@@ -65,6 +103,133 @@ def create_user():
     return jsonify({"message": "用户添加成功"}), 201
 
 
+# 导入文件的表头，兼容导出文件的中文表头和英文字段名
+IMPORT_COLUMNS = {
+    "用户名": "username",
+    "姓名": "name",
+    "性别": "gender",
+    "出生日期": "birthday",
+    "角色": "role",
+    "username": "username",
+    "name": "name",
+    "gender": "gender",
+    "birthday": "birthday",
+    "role": "role",
+}
+ROLE_LABELS = {role.value: role for role in UserRoles}
+IMPORT_BATCH_SIZE = 500  # 批量插入时每条 INSERT 语句包含的行数
+
+
+def _read_import_rows(file):
+    # xlsx 使用只读模式逐行读取，其它文件按 UTF-8 CSV 处理
+    if file.filename.lower().endswith(".xlsx"):
+        import openpyxl  # 导入较慢，只在处理 xlsx 时加载
+
+        wb = openpyxl.load_workbook(file.stream, read_only=True, data_only=True)
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+    else:
+        rows = csv.reader(TextIOWrapper(file.stream, encoding="utf-8-sig"))
+
+    header = None
+    for values in rows:
+        if header is None:
+            header = [IMPORT_COLUMNS.get(str(value).strip()) for value in values]
+            continue
+        if not any(values):
+            continue
+        yield {
+            key: (str(value).strip() if value is not None else "")
+            for key, value in zip(header, values)
+            if key
+        }
+
+
+def _validate_user_rows(rows):
+    """
+    导入前逐行校验用户数据，用户名是否已存在用一次查询确认
+    返回 (可插入的行, 错误列表)
+    """
+    usernames = [row.get("username") for row in rows]
+    existing = {
+        username
+        for (username,) in db.session.query(User.username).filter(
+            User.username.in_(usernames)
+        )
+    }
+
+    values, errors, seen = [], [], set()
+    for index, row in enumerate(rows, 2):  # 第 1 行是表头
+        row_errors = []
+        username = row.get("username")
+        if not username:
+            row_errors.append("用户名不能为空")
+        elif username in existing or username in seen:
+            row_errors.append("用户名已存在")
+        seen.add(username)
+
+        role_value = row.get("role") or UserRoles.USER.name
+        role = UserRoles.__members__.get(role_value) or ROLE_LABELS.get(role_value)
+        if role is None:
+            row_errors.append("角色无效")
+
+        birthday = None
+        if row.get("birthday"):
+            try:
+                birthday = datetime.fromisoformat(row["birthday"]).date()
+            except ValueError:
+                row_errors.append("出生日期格式无效")
+
+        if row_errors:
+            errors.append({"row": index, "errors": row_errors})
+            continue
+        values.append(
+            {
+                "username": username,
+                "name": row.get("name") or None,
+                "gender": row.get("gender") or None,
+                "birthday": birthday,
+                "role": role,
+            }
+        )
+    return values, errors
+
+
+@user_bp.route("/api/users/import", methods=["POST"])
+@login_required
+def import_users():
+    # 导入可以指定任意角色，包括管理员，只允许管理员操作
+    if g.current_user.role.value not in ["管理员"]:
+        return jsonify({"error": "该用户没有权限导入用户"}), 403
+
+    file = request.files.get("file")
+    if file is None:
+        return jsonify({"error": "请上传 xlsx 或 csv 文件"}), 400
+
+    try:
+        # 解析 xlsx 是 CPU 密集操作，gevent 模式下放到线程池
+        rows = run_blocking(lambda: list(_read_import_rows(file)))
+    except Exception as e:
+        return jsonify({"error": "文件解析失败", "message": str(e)}), 400
+    if not rows:
+        return jsonify({"error": "文件中没有用户数据"}), 400
+
+    values, errors = _validate_user_rows(rows)
+    if errors:
+        return jsonify({"error": "数据校验失败", "errors": errors}), 400
+
+    # 默认密码的哈希在进程池中并行计算
+    hashes = hash_passwords([Config.DEFAULT_PASSWORD] * len(values))
+    for row, password_hash in zip(values, hashes):
+        row["password_hash"] = password_hash
+
+    # 所有批次在同一个事务中插入
+    for start in range(0, len(values), IMPORT_BATCH_SIZE):
+        db.session.execute(insert(User), values[start : start + IMPORT_BATCH_SIZE])
+    db.session.commit()
+
+    return jsonify({"created": len(values), "message": "用户导入成功"}), 201
+
+
 @user_bp.route("/api/users/<int:user_id>/info", methods=["PUT"])
 def update_user_info(user_id):
     user = User.query.get_or_404(user_id)
@@ -105,52 +270,100 @@ def delete_user(user_id):
     return jsonify({"result": True, "message": "用户删除成功"})
 
 
+EXPORT_HEADERS = [
+    "ID",
+    "用户名",
+    "姓名",
+    "性别",
+    "出生日期",
+    "角色",
+    "账户状态",
+    "创建时间",
+    "上次登录时间",
+    "上次登录IP",
+]
+EXPORT_CHUNK_SIZE = 1000  # 导出时每批从数据库读取的行数
+
+
+def _append_rows(ws, rows):
+    for row in rows:
+        ws.append(row)
+
+
+def _export_rows(user_ids):
+    # 按批次读取用户，避免一次性把所有行加载到内存
+    users = db.session.scalars(
+        db.select(User)
+        .filter(User.id.in_(user_ids))
+        .order_by(User.id)
+        .execution_options(yield_per=EXPORT_CHUNK_SIZE)
+    )
+    for user in users:
+        yield [
+            user.id,
+            user.username,
+            user.name,
+            user.gender,
+            user.birthday.strftime("%Y-%m-%d") if user.birthday else None,
+            user.role.value,
+            "正常" if user.account_status == AccountStatus.ACTIVE else "禁用",
+            user.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            (
+                user.last_login_at.strftime("%Y-%m-%d %H:%M:%S")
+                if user.last_login_at
+                else None
+            ),
+            user.last_login_ip,
+        ]
+
+
 @user_bp.route("/api/users/export", methods=["POST"])
 def export_users():
     data = request.json
     user_ids = data.get("userIds", [])
+    export_format = data.get("format", "xlsx")
 
-    users = User.query.filter(User.id.in_(user_ids)).all()
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "用户列表"
-
-    headers = [
-        "ID",
-        "用户名",
-        "姓名",
-        "性别",
-        "出生日期",
-        "角色",
-        "账户状态",
-        "创建时间",
-        "上次登录时间",
-        "上次登录IP",
-    ]
-    ws.append(headers)
+    if export_format == "csv":
+        # CSV 边查询边输出，第一批数据立即发送给客户端
+        def generate():
+            buffer = StringIO()
+            writer = csv.writer(buffer)
+            buffer.write("\ufeff")  # BOM，保证 Excel 正确识别 UTF-8
+            writer.writerow(EXPORT_HEADERS)
+            for index, row in enumerate(_export_rows(user_ids), 1):
+                writer.writerow(row)
+                if index % EXPORT_CHUNK_SIZE == 0:
+                    yield buffer.getvalue().encode("utf-8")
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue().encode("utf-8")
 
-    for user in users:
-        ws.append(
-            [
-                user.id,
-                user.username,
-                user.name,
-                user.gender,
-                user.birthday.strftime("%Y-%m-%d") if user.birthday else None,
-                user.role.value,
-                "正常" if user.account_status == AccountStatus.ACTIVE else "禁用",
-                user.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                (
-                    user.last_login_at.strftime("%Y-%m-%d %H:%M:%S")
-                    if user.last_login_at
-                    else None
-                ),
-                user.last_login_ip,
-            ]
+        return Response(
+            stream_with_context(generate()),
+            mimetype="text/csv",
+            headers={
+                "Content-Disposition": "attachment; filename*=UTF-8''"
+                + quote("用户列表.csv")
+            },
         )
 
-    output = BytesIO()
-    wb.save(output)
+    import openpyxl  # 导入较慢，只在导出 xlsx 时加载
+
+    # 只写模式下行数据直接落到临时文件，内存占用不随行数增长
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("用户列表")
+    ws.append(EXPORT_HEADERS)
+    # 数据库读取留在当前协程，写入 xlsx 按批放到线程池
+    chunk = []
+    for row in _export_rows(user_ids):
+        chunk.append(row)
+        if len(chunk) == EXPORT_CHUNK_SIZE:
+            run_blocking(_append_rows, ws, chunk)
+            chunk = []
+    run_blocking(_append_rows, ws, chunk)
+
+    output = tempfile.TemporaryFile()
+    run_blocking(wb.save, output)
     output.seek(0)
 
     return send_file(
@@ -162,18 +375,7 @@ def export_users():
 
 
 @user_bp.route("/api/protected-route", methods=["GET"])
+@login_required
 def protected_route():
-    token = request.headers.get("Authorization").split(" ")[1]  # 获取 token
-    try:
-        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-        user_id = payload["user_id"]
-        user = User.query.get(user_id)
-        if user:
-            # 根据用户角色执行相应操作
-            return jsonify({"role": user.role.value}), 200
-        else:
-            return jsonify({"message": "用户不存在"}), 404
-    except jwt.ExpiredSignatureError:
-        return jsonify({"message": "Token 已过期"}), 401
-    except jwt.InvalidTokenError:
-        return jsonify({"message": "无效的 Token"}), 401
+    # 根据用户角色执行相应操作
+    return jsonify({"role": g.current_user.role.value}), 200
@@ -1,12 +1,393 @@
 from config import Config
+from collections import OrderedDict
+from datetime import date, datetime
+from functools import wraps
+from flask import Response, g, jsonify, request, send_file
+from sqlalchemy import and_, or_, text
+from extensions import db
+from models import User
+from metrics import timed
+from urllib.parse import quote
+from uuid import uuid4
+import base64
+import json
+import mimetypes
+import os
+import threading
+import time
 import jwt
 
 
-def get_user_id_from_token(token):
+# 已验证 token 的 LRU 缓存：token -> (payload, exp)
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+
+
+def decode_token(token):
+    """
+    验证 token 并返回 payload，验证结果按 token 缓存到过期时间为止
+    返回 (payload, 错误信息)
+    """
+    now = time.time()
+    with _token_cache_lock:
+        cached = _token_cache.get(token)
+        if cached is not None:
+            payload, exp = cached
+            if exp is None or exp > now:
+                _token_cache.move_to_end(token)
+                return payload, "成功获取id"
+            del _token_cache[token]
+
     try:
-        payload = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
-        return payload["user_id"], "成功获取id"
+        with timed("jwt"):
+            payload = jwt.decode(token, Config.SECRET_KEY, algorithms=["HS256"])
     except jwt.ExpiredSignatureError:
         return None, "Token 已过期"
     except jwt.InvalidTokenError:
         return None, "无效的 Token"
+
+    with _token_cache_lock:
+        _token_cache[token] = (payload, payload.get("exp"))
+        _token_cache.move_to_end(token)
+        while len(_token_cache) > Config.TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return payload, "成功获取id"
+
+
+def get_user_id_from_token(token):
+    payload, message = decode_token(token)
+    if payload is None:
+        return None, message
+    return payload["user_id"], message
+
+
+def get_current_user(query_token=None):
+    """
+    解析请求头中的 token 并加载当前用户，同一请求内只查询一次
+    query_token: 请求头中没有 token 时改从该查询参数读取，用于无法设置请求头的 EventSource
+    返回 (用户, 错误信息)
+    """
+    if "current_user" in g:
+        return g.current_user, None
+
+    header = request.headers.get("Authorization") or ""
+    parts = header.split(" ")
+    if len(parts) != 2 and query_token and request.args.get(query_token):
+        parts = ["Bearer", request.args[query_token]]
+    if len(parts) != 2:
+        return None, "缺少授权令牌"
+
+    user_id, error_message = get_user_id_from_token(parts[1])
+    if user_id is None:
+        return None, error_message
+
+    g.current_user_id = user_id  # 请求日志中记录用户
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None, "用户不存在"
+    g.current_user = user
+    return user, None
+
+
+def login_required(view):
+    """
+    统一的鉴权装饰器，通过后当前用户保存在 g.current_user
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        user, error_message = get_current_user()
+        if user is None:
+            return jsonify({"error": "解析授权令牌失败", "message": error_message}), 401
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _convert_value(column, value):
+    # 按列类型把查询参数转换成可比较的值
+    enum_class = getattr(column.type, "enum_class", None)
+    if enum_class is not None:
+        return enum_class[value]
+    python_type = column.type.python_type
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    return python_type(value)
+
+
+def _encode_cursor(value, row_id):
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor, column):
+    value, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    return _convert_value(column, value), int(row_id)
+
+
+def _estimate_total(query, model):
+    # MySQL 直接读取表统计信息作为估算值，其它数据库退回精确计数
+    if db.session.get_bind().dialect.name == "mysql":
+        estimate = db.session.execute(
+            text(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :name"
+            ),
+            {"name": model.__tablename__},
+        ).scalar()
+        if estimate is not None:
+            return int(estimate)
+    return query.order_by(None).count()
+
+
+def paginate_query(
+    query, model, key, args, filters=None, sorts=None, serialize=None
+):
+    """
+    列表接口通用的过滤、排序和游标分页
+
+    filters: {参数名: (列, 操作)}，操作为 "eq"、"ge" 或 "le"，eq 支持逗号分隔的多个值
+    sorts: {参数名: 列}，排序列必须非空，id 作为并列时的次序
+    serialize: 把查询结果的一行转换为字典，默认调用 to_dict
+    不传 limit 时返回全部结果，保持原有接口行为
+    返回 (结果字典, 错误信息)
+    """
+    filters = filters or {}
+    serialize = serialize or (lambda item: item.to_dict())
+    sorts = dict(sorts or {})
+    sorts.setdefault("id", model.id)
+
+    try:
+        for name, (column, op) in filters.items():
+            raw = args.get(name)
+            if raw in (None, ""):
+                continue
+            if op == "eq":
+                values = [_convert_value(column, v) for v in raw.split(",")]
+                query = query.filter(
+                    column == values[0] if len(values) == 1 else column.in_(values)
+                )
+            elif op == "ge":
+                query = query.filter(column >= _convert_value(column, raw))
+            elif op == "le":
+                query = query.filter(column <= _convert_value(column, raw))
+
+        sort_name = args.get("sort", "id")
+        if sort_name not in sorts:
+            return None, f"不支持的排序字段: {sort_name}"
+        sort_column = sorts[sort_name]
+        descending = args.get("order", "asc") == "desc"
+
+        limit = args.get("limit", type=int)
+        cursor = args.get("cursor")
+        if cursor:
+            value, last_id = _decode_cursor(cursor, sort_column)
+            if descending:
+                query = query.filter(
+                    or_(
+                        sort_column < value,
+                        and_(sort_column == value, model.id < last_id),
+                    )
+                )
+            else:
+                query = query.filter(
+                    or_(
+                        sort_column > value,
+                        and_(sort_column == value, model.id > last_id),
+                    )
+                )
+    except (KeyError, ValueError, TypeError) as e:
+        return None, f"查询参数无效: {e}"
+
+    total_mode = args.get("total", "exact" if limit is None else "none")
+    total = None
+    if total_mode == "exact" and limit is not None:
+        total = query.order_by(None).count()
+    elif total_mode == "estimate":
+        total = _estimate_total(query, model)
+
+    if descending:
+        query = query.order_by(sort_column.desc(), model.id.desc())
+    else:
+        query = query.order_by(sort_column.asc(), model.id.asc())
+
+    if limit is None:
+        items = query.all()
+        return {
+            "total": len(items) if total is None else total,
+            key: [serialize(item) for item in items],
+        }, None
+
+    limit = max(1, min(limit, 500))
+    items = query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = _encode_cursor(getattr(last, sort_column.key), last.id)
+
+    return {
+        "total": total,
+        key: [serialize(item) for item in items],
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }, None
+
+
+def paginate_timeline(query, model, column, key, args, serialize=None):
+    """
+    按 (column, id) 升序排列的时间线分页，用于评论这类只追加的列表
+
+    since: 只返回游标之后的记录，刷新时增量获取新内容
+    before: 返回游标之前最近的 limit 条，向前翻页
+    都不传时返回最新的 limit 条；不传 limit 时返回全部
+    结果总是按时间升序，first_cursor/last_cursor 用于下次请求
+    返回 (结果字典, 错误信息)
+    """
+    serialize = serialize or (lambda item: item.to_dict())
+    since = args.get("since")
+    before = args.get("before")
+    if since and before:
+        return None, "since 和 before 不能同时使用"
+
+    try:
+        limit = args.get("limit", type=int)
+        if since:
+            value, last_id = _decode_cursor(since, column)
+            query = query.filter(
+                or_(column > value, and_(column == value, model.id > last_id))
+            )
+        if before:
+            value, first_id = _decode_cursor(before, column)
+            query = query.filter(
+                or_(column < value, and_(column == value, model.id < first_id))
+            )
+    except (KeyError, ValueError, TypeError) as e:
+        return None, f"查询参数无效: {e}"
+
+    has_more = False
+    if limit is None:
+        items = query.order_by(column.asc(), model.id.asc()).all()
+    else:
+        limit = max(1, min(limit, 500))
+        if since:
+            items = query.order_by(column.asc(), model.id.asc()).limit(limit + 1).all()
+            has_more = len(items) > limit
+            items = items[:limit]
+        else:
+            # 取最近的 limit 条再倒回升序
+            items = (
+                query.order_by(column.desc(), model.id.desc()).limit(limit + 1).all()
+            )
+            has_more = len(items) > limit
+            items = items[:limit][::-1]
+
+    def cursor(item):
+        return _encode_cursor(getattr(item, column.key), item.id)
+
+    return {
+        key: [serialize(item) for item in items],
+        "has_more": has_more,
+        "first_cursor": cursor(items[0]) if items else None,
+        "last_cursor": cursor(items[-1]) if items else None,
+    }, None
+
+
+def _multipart_byteranges(path, ranges, download_name, etag):
+    # 多个 Range 时按 multipart/byteranges 格式逐段读取文件返回
+    stat = os.stat(path)
+    length = stat.st_size
+    parts = []
+    for start, stop in ranges:
+        if start < 0:
+            start, stop = max(length + start, 0), length
+        else:
+            stop = length if stop is None else min(stop, length)
+        if start < stop:
+            parts.append((start, stop))
+    if not parts:
+        return Response(status=416, headers={"Content-Range": f"bytes */{length}"})
+
+    boundary = uuid4().hex
+    mimetype = mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+    part_headers = [
+        (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {mimetype}\r\n"
+            f"Content-Range: bytes {start}-{stop - 1}/{length}\r\n\r\n"
+        ).encode("ascii")
+        for start, stop in parts
+    ]
+    closing = f"\r\n--{boundary}--\r\n".encode("ascii")
+    content_length = (
+        sum(len(header) for header in part_headers)
+        + sum(stop - start for start, stop in parts)
+        + len(closing)
+    )
+
+    def generate():
+        with open(path, "rb") as f:
+            for header, (start, stop) in zip(part_headers, parts):
+                yield header
+                f.seek(start)
+                remaining = stop - start
+                while remaining > 0:
+                    chunk = f.read(min(64 * 1024, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+        yield closing
+
+    response = Response(
+        generate(),
+        status=206,
+        content_type=f"multipart/byteranges; boundary={boundary}",
+    )
+    response.content_length = content_length
+    response.accept_ranges = "bytes"
+    response.last_modified = stat.st_mtime
+    response.set_etag(etag)
+    return response
+
+
+def send_attachment(path, download_name, etag=None):
+    """
+    发送附件，支持 ETag、If-None-Match/If-Modified-Since 条件请求以及单个或多个 Range
+    ATTACHMENT_SENDFILE 为 x-accel-redirect 时只返回内部跳转头，由前置 nginx 发送文件
+    """
+    if Config.ATTACHMENT_SENDFILE == "x-accel-redirect":
+        relative = os.path.relpath(path, Config.UPLOAD_FOLDER).replace(os.sep, "/")
+        response = Response(
+            mimetype=mimetypes.guess_type(download_name)[0]
+            or "application/octet-stream"
+        )
+        response.headers["X-Accel-Redirect"] = (
+            Config.ATTACHMENT_ACCEL_PREFIX.rstrip("/") + "/" + relative
+        )
+        response.headers["Content-Disposition"] = "attachment; filename*=UTF-8''" + quote(
+            download_name
+        )
+        return response
+
+    # 单个 Range 和条件请求由 send_file 处理，多个 Range 在这里处理
+    byte_range = request.range
+    if (
+        etag is not None
+        and byte_range is not None
+        and byte_range.units == "bytes"
+        and len(byte_range.ranges) > 1
+        and not request.if_none_match.contains(etag)
+        and (request.if_range.etag is None or request.if_range.etag == etag)
+        and request.if_range.date is None
+    ):
+        return _multipart_byteranges(path, byte_range.ranges, download_name, etag)
+
+    return send_file(
+        path, download_name=download_name, etag=etag if etag is not None else True
+    )